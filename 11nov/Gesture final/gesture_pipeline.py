@@ -0,0 +1,144 @@
+# gesture_pipeline.py
+# Camera-free pieces of the gesture → Spotify chain, shared by the live
+# controller (maintesting_spotify.py) and the replay harness (replay_gestures.py):
+#   landmarks → 42-dim features → classifier → smoothing → action mapping
+
+import time
+from collections import deque
+
+import numpy as np
+
+# ======== Features ========
+def points_from_landmarks(hand_landmarks):
+    """MediaPipe hand landmarks → float32 array of shape (21, 3)."""
+    return np.array([(lm.x, lm.y, lm.z) for lm in hand_landmarks.landmark], dtype=np.float32)
+
+def to_feature_vec(hand_landmarks):
+    return features_from_points(points_from_landmarks(hand_landmarks))
+
+def features_from_points(points):
+    # wrist-relative x,y for the 21 landmarks → (1,42)
+    pts = np.asarray(points, dtype=np.float64)
+    rel = pts[:, :2] - pts[0, :2]
+    return rel.astype(np.float32).reshape(1, -1)
+
+# ======== Classification ========
+def classify(model, scaler, feat, classes=None):
+    """Returns (probs, labels) for one feature row."""
+    feat_s = scaler.transform(feat)
+    if hasattr(model, "predict_proba"):
+        return model.predict_proba(feat_s)[0], model.classes_
+    pred = model.predict(feat_s)[0]
+    labels = np.array(classes if classes is not None else model.classes_)
+    probs = np.ones(len(labels)) / len(labels)
+    probs[labels.tolist().index(pred)] = 1.0
+    return probs, labels
+
+# ======== Confidence + Smoothing ========
+class StableDecider:
+    """A label fires only after STABLE_FRAMES identical confident predictions."""
+
+    def __init__(self, conf_threshold: float, stable_frames: int):
+        self.conf_threshold = conf_threshold
+        self.stable_frames = stable_frames
+        self.history = deque(maxlen=stable_frames)
+
+    def decide(self, probs, labels):
+        top_idx = int(np.argmax(probs))
+        top_label = labels[top_idx]
+        top_prob  = float(probs[top_idx])
+
+        if top_prob < self.conf_threshold or top_label == "none":
+            self.history.append("none")
+            return "none", top_prob
+
+        self.history.append(top_label)
+        if self.history.count(top_label) == self.stable_frames:
+            return top_label, top_prob
+        return "none", top_prob
+
+    def reset(self):
+        self.history.clear()
+
+# ======== Spotify Actions ========
+def build_actions(sp, cooldown_sec: float = 1.0, clock=time.time):
+    """
+    Gesture label → zero-arg callable issuing the Spotify command on `sp`.
+    `clock` drives the action cooldown; replay passes the recorded frame clock
+    so the same stream always fires the same actions.
+    """
+    last_action_at = [0.0]
+
+    def cooldown_ok():
+        now = clock()
+        if now - last_action_at[0] >= cooldown_sec:
+            last_action_at[0] = now
+            return True
+        return False
+
+    def get_device_id():
+        devs = sp.devices().get("devices", [])
+        if not devs:
+            return None
+        active = [d for d in devs if d.get("is_active")]
+        return (active[0] if active else devs[0]).get("id")
+
+    def do_play():
+        if cooldown_ok():
+            sp.start_playback(device_id=get_device_id())
+
+    def do_pause():
+        if cooldown_ok():
+            sp.pause_playback(device_id=get_device_id())
+
+    def do_next():
+        if cooldown_ok():
+            sp.next_track(device_id=get_device_id())
+
+    def do_prev():
+        if cooldown_ok():
+            sp.previous_track(device_id=get_device_id())
+
+    def do_volume_change(delta=+10):
+        if not cooldown_ok():
+            return
+        devs = sp.devices().get("devices", [])
+        if not devs: return
+        cur = [x for x in devs if x.get("is_active")]
+        cur = (cur[0] if cur else devs[0])
+        v = cur.get("volume_percent", 50)
+        new_v = max(0, min(100, v + delta))
+        sp.volume(new_v, device_id=cur.get("id"))
+
+    def do_like_current():
+        if not cooldown_ok():
+            return
+        pb = sp.current_playback()
+        if pb and pb.get("item"):
+            tid = pb["item"]["id"]
+            if tid:
+                sp.current_user_saved_tracks_add([tid])
+
+    def do_seek_forward(ms=30000):
+        if not cooldown_ok():
+            return
+        pb = sp.current_playback()
+        if not pb or not pb.get("item"):
+            return
+        pos = pb.get("progress_ms", 0)
+        dur = pb["item"].get("duration_ms", 0)
+        new_pos = min(max(0, pos + ms), max(0, dur - 1000))
+        sp.seek_track(new_pos, device_id=get_device_id())
+
+    return {
+        # Right hand
+        "play_right":       do_play,
+        "pause_right":      do_pause,
+        "next_right":       do_next,
+        "previous_right":   do_prev,
+        # Left hand
+        "volume_up_left":    lambda: do_volume_change(+10),
+        "volume_down_left":  lambda: do_volume_change(-10),
+        "like_left":         do_like_current,
+        "skip30_left":       lambda: do_seek_forward(30000),
+    }
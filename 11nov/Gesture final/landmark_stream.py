@@ -0,0 +1,82 @@
+# landmark_stream.py
+# Compact recorder/reader for timestamped hand-landmark streams.
+#
+# File layout (little endian):
+#   header : b"LMKS" + uint8 version
+#   frame  : float64 timestamp (s) + uint8 point count (0 = no hand)
+#            + count * 3 float32 (x, y, z)
+# One frame with a hand is 262 bytes; a 30 fps minute is ~470 KB.
+#
+# Usage:
+#   rec = LandmarkRecorder("session.lmks")
+#   rec.write(time.time(), hand_landmarks)   # or None when no hand
+#   rec.close()
+#   for ts, points in read_stream("session.lmks"): ...
+
+import struct
+import threading
+
+import numpy as np
+
+MAGIC = b"LMKS"
+VERSION = 1
+_FRAME_HEAD = struct.Struct("<dB")
+
+class LandmarkRecorder:
+    def __init__(self, path: str, flush_every: int = 30):
+        self.path = path
+        self.flush_every = max(1, flush_every)
+        self.frames = 0
+        self._lock = threading.Lock()  # backend writes from request threads
+        self._fh = open(path, "wb")
+        self._fh.write(MAGIC + bytes([VERSION]))
+
+    def write(self, ts: float, hand_landmarks=None):
+        """`hand_landmarks` may be a MediaPipe landmark list, an (N,3) array, or None."""
+        if hand_landmarks is None:
+            pts = np.empty((0, 3), dtype=np.float32)
+        elif hasattr(hand_landmarks, "landmark"):
+            pts = np.array([(lm.x, lm.y, lm.z) for lm in hand_landmarks.landmark], dtype=np.float32)
+        else:
+            pts = np.asarray(hand_landmarks, dtype=np.float32).reshape(-1, 3)
+        with self._lock:
+            if self._fh is None:
+                return
+            self._fh.write(_FRAME_HEAD.pack(float(ts), len(pts)))
+            self._fh.write(pts.astype("<f4").tobytes())
+            self.frames += 1
+            if self.frames % self.flush_every == 0:
+                self._fh.flush()
+
+    def close(self):
+        with self._lock:
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def read_stream(path: str):
+    """Yields (timestamp, points) with points an (N,3) float32 array or None."""
+    with open(path, "rb") as fh:
+        head = fh.read(len(MAGIC) + 1)
+        if head[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a landmark stream")
+        if head[len(MAGIC)] != VERSION:
+            raise ValueError(f"Unsupported landmark stream version {head[len(MAGIC)]}")
+        while True:
+            raw = fh.read(_FRAME_HEAD.size)
+            if len(raw) < _FRAME_HEAD.size:
+                break  # EOF (or a frame cut off by a crash)
+            ts, n = _FRAME_HEAD.unpack(raw)
+            body = fh.read(n * 12)
+            if len(body) < n * 12:
+                break
+            if n == 0:
+                yield ts, None
+            else:
+                yield ts, np.frombuffer(body, dtype="<f4").reshape(n, 3)
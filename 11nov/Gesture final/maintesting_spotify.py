@@ -13,17 +13,19 @@
 #   GESTURE_CONF_THRESHOLD=0.75
 #   GESTURE_STABLE_FRAMES=5
 #   SPOTIFY_CACHE_PATH=.cache-gesture-session
+#   GESTURE_RECORD_PATH=session.lmks   (record landmarks for replay_gestures.py)
 
 import os, sys, time
-from collections import deque
 
 import cv2
 import joblib
 import mediapipe as mp
-import numpy as np
 import spotipy
 from spotipy.oauth2 import SpotifyOAuth
 
+from gesture_pipeline import to_feature_vec, classify, StableDecider, build_actions
+from landmark_stream import LandmarkRecorder
+
 # ======== Camera / Platform ========
 IS_MAC = (sys.platform == "darwin")
 CAM_INDEX = int(os.getenv("GESTURE_CAM_INDEX", "0"))
@@ -66,15 +68,6 @@ hands = mp_hands.Hands(
 )
 draw = mp.solutions.drawing_utils
 
-def to_feature_vec(hand_landmarks):
-    base_x = hand_landmarks.landmark[0].x
-    base_y = hand_landmarks.landmark[0].y
-    vec = []
-    for lm in hand_landmarks.landmark:
-        vec.append(lm.x - base_x)
-        vec.append(lm.y - base_y)
-    return np.array(vec, dtype=np.float32).reshape(1, -1)  # (1,42)
-
 # ======== Spotify Auth ========
 SPOTIPY_CLIENT_ID     = os.getenv("SPOTIPY_CLIENT_ID")
 SPOTIPY_CLIENT_SECRET = os.getenv("SPOTIPY_CLIENT_SECRET")
@@ -93,108 +86,18 @@ sp = spotipy.Spotify(auth_manager=SpotifyOAuth(
     cache_path=SPOTIFY_CACHE_PATH,
 ))
 
-def get_device_id():
-    devs = sp.devices().get("devices", [])
-    if not devs:
-        return None
-    active = [d for d in devs if d.get("is_active")]
-    return (active[0] if active else devs[0]).get("id")
-
 # ======== Spotify Actions ========
 ACTION_COOLDOWN_SEC = float(os.getenv("GESTURE_ACTION_COOLDOWN", "1.0"))
-_last_action_at = 0.0
-def cooldown_ok():
-    global _last_action_at
-    now = time.time()
-    if now - _last_action_at >= ACTION_COOLDOWN_SEC:
-        _last_action_at = now
-        return True
-    return False
-
-def do_play():
-    if cooldown_ok():
-        did = get_device_id()
-        sp.start_playback(device_id=did)
-
-def do_pause():
-    if cooldown_ok():
-        did = get_device_id()
-        sp.pause_playback(device_id=did)
-
-def do_next():
-    if cooldown_ok():
-        did = get_device_id()
-        sp.next_track(device_id=did)
-
-def do_prev():
-    if cooldown_ok():
-        did = get_device_id()
-        sp.previous_track(device_id=did)
-
-def do_volume_change(delta=+10):
-    if not cooldown_ok():
-        return
-    devs = sp.devices().get("devices", [])
-    if not devs: return
-    cur = [x for x in devs if x.get("is_active")]
-    cur = (cur[0] if cur else devs[0])
-    v = cur.get("volume_percent", 50)
-    new_v = max(0, min(100, v + delta))
-    sp.volume(new_v, device_id=cur.get("id"))
-
-def do_like_current():
-    if not cooldown_ok():
-        return
-    pb = sp.current_playback()
-    if pb and pb.get("item"):
-        tid = pb["item"]["id"]
-        if tid:
-            sp.current_user_saved_tracks_add([tid])
-
-def do_seek_forward(ms=30000):
-    if not cooldown_ok():
-        return
-    pb = sp.current_playback()
-    if not pb or not pb.get("item"):
-        return
-    pos = pb.get("progress_ms", 0)
-    dur = pb["item"].get("duration_ms", 0)
-    new_pos = min(max(0, pos + ms), max(0, dur - 1000))
-    sp.seek_track(new_pos, device_id=get_device_id())
-
-ACTIONS = {
-    # Right hand
-    "play_right":       do_play,
-    "pause_right":      do_pause,
-    "next_right":       do_next,
-    "previous_right":   do_prev,
-    # Left hand
-    "volume_up_left":    lambda: do_volume_change(+10),
-    "volume_down_left":  lambda: do_volume_change(-10),
-    "like_left":         do_like_current,
-    "skip30_left":       lambda: do_seek_forward(30000),
-}
+ACTIONS = build_actions(sp, ACTION_COOLDOWN_SEC)
 
 # ======== Confidence + Smoothing ========
 CONF_THRESHOLD = float(os.getenv("GESTURE_CONF_THRESHOLD", "0.75"))
 STABLE_FRAMES  = int(os.getenv("GESTURE_STABLE_FRAMES",  "5"))
-history = deque(maxlen=STABLE_FRAMES)
+decider = StableDecider(CONF_THRESHOLD, STABLE_FRAMES)
+stable_decision = decider.decide
 
-def stable_decision(probs, labels):
-    top_idx = int(np.argmax(probs))
-    top_label = labels[top_idx]
-    top_prob  = float(probs[top_idx])
-
-    if top_prob < CONF_THRESHOLD or top_label == "none":
-        history.append("none")
-        if history.count("none") == STABLE_FRAMES:
-            return "none", top_prob
-        return "none", top_prob
-
-    history.append(top_label)
-    if history.count(top_label) == STABLE_FRAMES:
-        return top_label, top_prob
-    return "none", top_prob
+# ======== Recording ========
+RECORD_PATH = os.getenv("GESTURE_RECORD_PATH")
 
 # ======== Main Loop ========
 def main():
@@ -202,6 +105,9 @@ def main():
     print("🎵 Gesture→Spotify running. Press 'q' to quit.")
     print(f"Classes: {CLASSES}")
     print(f"Mirror:{MIRROR_FEED}  Thr:{CONF_THRESHOLD}  Stable:{STABLE_FRAMES}")
+    recorder = LandmarkRecorder(RECORD_PATH) if RECORD_PATH else None
+    if recorder:
+        print(f"⏺  Recording landmarks to {RECORD_PATH}")
 
     while True:
         ok, img = cap.read()
@@ -213,6 +119,8 @@ def main():
 
         rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
         res = hands.process(rgb)
+        if recorder:
+            recorder.write(time.time(), res.multi_hand_landmarks[0] if res.multi_hand_landmarks else None)
 
         overlay = img.copy()
         shown_label, shown_prob = "none", 0.0
@@ -222,16 +130,7 @@ def main():
             draw.draw_landmarks(overlay, hand_lms, mp_hands.HAND_CONNECTIONS)
 
             feat = to_feature_vec(hand_lms)
-            feat_s = scaler.transform(feat)
-
-            if hasattr(model, "predict_proba"):
-                probs = model.predict_proba(feat_s)[0]
-                labels = model.classes_
-            else:
-                pred = model.predict(feat_s)[0]
-                labels = np.array(CLASSES)
-                probs = np.ones(len(labels)) / len(labels)
-                probs[labels.tolist().index(pred)] = 1.0
+            probs, labels = classify(model, scaler, feat, CLASSES)
 
             stable_label, top_prob = stable_decision(probs, labels)
             shown_label, shown_prob = stable_label, top_prob
@@ -253,6 +152,9 @@ def main():
 
     cap.release()
     cv2.destroyAllWindows()
+    if recorder:
+        recorder.close()
+        print(f"⏹  Saved {recorder.frames} frames to {RECORD_PATH}")
 
 if __name__ == "__main__":
     main()
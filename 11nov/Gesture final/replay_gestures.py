@@ -0,0 +1,167 @@
+# replay_gestures.py
+# Headless replay of a recorded landmark stream through the gesture decision
+# loop (features → classifier → smoothing → action mapping) against a stubbed
+# Spotify client. No camera, MediaPipe or Spotify account needed.
+#
+# Record a stream first:
+#   GESTURE_RECORD_PATH=session.lmks python3 maintesting_spotify.py
+#   (or set GESTURE_RECORD_PATH in backend/.env for the /api/gesture/predict path)
+#
+# Then:
+#   python3 replay_gestures.py session.lmks
+#   python3 replay_gestures.py session.lmks --repeat 20 --json report.json
+#
+# The fired actions and their decision latency are computed on the recorded
+# clock, so they are identical run to run; only the per-frame processing times
+# and throughput depend on the machine.
+
+import os, sys, json, time, argparse
+
+import joblib
+import numpy as np
+
+from gesture_pipeline import features_from_points, classify, StableDecider, build_actions
+from landmark_stream import read_stream
+
+# ======== Stub Spotify ========
+class StubSpotify:
+    """Records every call; answers reads with a fixed device and track."""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.calls = []
+        self.volume_percent = 50
+        self.progress_ms = 60000
+
+    def _log(self, name, *args, **kwargs):
+        self.calls.append({"t": round(self.clock(), 6), "call": name,
+                           "args": list(args), "kwargs": kwargs})
+
+    def devices(self):
+        self._log("devices")
+        return {"devices": [{"id": "stub-device", "name": "Replay", "is_active": True,
+                             "volume_percent": self.volume_percent}]}
+
+    def current_playback(self):
+        self._log("current_playback")
+        return {"is_playing": True, "progress_ms": self.progress_ms,
+                "item": {"id": "stubtrack0000000000000", "duration_ms": 200000}}
+
+    def start_playback(self, device_id=None, **kw):  self._log("start_playback", device_id=device_id, **kw)
+    def pause_playback(self, device_id=None):        self._log("pause_playback", device_id=device_id)
+    def next_track(self, device_id=None):            self._log("next_track", device_id=device_id)
+    def previous_track(self, device_id=None):        self._log("previous_track", device_id=device_id)
+    def current_user_saved_tracks_add(self, tracks): self._log("current_user_saved_tracks_add", tracks)
+
+    def volume(self, volume_percent, device_id=None):
+        self.volume_percent = volume_percent
+        self._log("volume", volume_percent, device_id=device_id)
+
+    def seek_track(self, position_ms, device_id=None):
+        self.progress_ms = position_ms
+        self._log("seek_track", position_ms, device_id=device_id)
+
+# ======== Replay ========
+def _percentile(xs, q):
+    return round(float(np.percentile(xs, q)), 3) if xs else 0.0
+
+def replay(frames, model, scaler, conf_threshold=0.75, stable_frames=5, cooldown_sec=1.0):
+    """
+    frames: list of (ts, points|None). Returns a report dict.
+    decision_latency_ms = recorded time from the first frame of the winning
+    run of predictions to the frame that fired the action.
+    """
+    now = [frames[0][0] if frames else 0.0]
+    clock = lambda: now[0]
+    sp = StubSpotify(clock)
+    actions = build_actions(sp, cooldown_sec=cooldown_sec, clock=clock)
+    decider = StableDecider(conf_threshold, stable_frames)
+    classes = list(model.classes_) if hasattr(model, "classes_") else None
+
+    fired, proc_ms = [], []
+    run_label, run_start = None, None
+    hand_frames = 0
+
+    for ts, points in frames:
+        now[0] = ts
+        t0 = time.perf_counter()
+        if points is None:
+            run_label, run_start = None, None
+            proc_ms.append((time.perf_counter() - t0) * 1000.0)
+            continue
+        hand_frames += 1
+        probs, labels = classify(model, scaler, features_from_points(points), classes)
+        top = labels[int(np.argmax(probs))]
+        if top != run_label:
+            run_label, run_start = top, ts
+
+        stable_label, top_prob = decider.decide(probs, labels)
+        n_calls = len(sp.calls)
+        if stable_label != "none":
+            action = actions.get(stable_label)
+            if action:
+                action()
+        proc_ms.append((time.perf_counter() - t0) * 1000.0)
+
+        issued = [c["call"] for c in sp.calls[n_calls:] if c["call"] not in ("devices", "current_playback")]
+        if issued:
+            fired.append({
+                "t": round(ts - frames[0][0], 6),
+                "gesture": str(stable_label),
+                "prob": round(top_prob, 4),
+                "calls": issued,
+                "decision_latency_ms": round((ts - run_start) * 1000.0, 3),
+            })
+
+    total_s = sum(proc_ms) / 1000.0
+    latencies = [f["decision_latency_ms"] for f in fired]
+    return {
+        "frames": len(frames),
+        "hand_frames": hand_frames,
+        "stream_seconds": round(frames[-1][0] - frames[0][0], 3) if frames else 0.0,
+        "actions": fired,
+        "action_counts": {g: sum(1 for f in fired if f["gesture"] == g) for g in sorted({f["gesture"] for f in fired})},
+        "decision_latency_ms": {"p50": _percentile(latencies, 50), "p95": _percentile(latencies, 95),
+                                "max": max(latencies) if latencies else 0.0},
+        "processing_ms": {"p50": _percentile(proc_ms, 50), "p95": _percentile(proc_ms, 95),
+                          "max": round(max(proc_ms), 3) if proc_ms else 0.0},
+        "throughput_fps": round(len(frames) / total_s, 1) if total_s > 0 else 0.0,
+        "spotify_calls": len(sp.calls),
+    }
+
+def main():
+    ap = argparse.ArgumentParser(description="Replay a landmark stream through the gesture decision loop.")
+    ap.add_argument("stream")
+    ap.add_argument("--model", default="gesture_model.pkl")
+    ap.add_argument("--scaler", default="scaler.pkl")
+    ap.add_argument("--conf", type=float, default=float(os.getenv("GESTURE_CONF_THRESHOLD", "0.75")))
+    ap.add_argument("--stable", type=int, default=int(os.getenv("GESTURE_STABLE_FRAMES", "5")))
+    ap.add_argument("--cooldown", type=float, default=float(os.getenv("GESTURE_ACTION_COOLDOWN", "1.0")))
+    ap.add_argument("--repeat", type=int, default=1, help="replay N times; timings use the best run")
+    ap.add_argument("--json", help="write the report here instead of stdout")
+    args = ap.parse_args()
+
+    model  = joblib.load(args.model)
+    scaler = joblib.load(args.scaler)
+    frames = list(read_stream(args.stream))
+    if not frames:
+        print("❌ Empty stream.")
+        sys.exit(1)
+
+    best = None
+    for _ in range(max(1, args.repeat)):
+        rep = replay(frames, model, scaler, args.conf, args.stable, args.cooldown)
+        if best is None or rep["throughput_fps"] > best["throughput_fps"]:
+            best = rep
+    best["config"] = {"conf_threshold": args.conf, "stable_frames": args.stable,
+                      "cooldown_sec": args.cooldown, "repeat": args.repeat}
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(best, f, indent=2)
+        print(f"✅ Report written to {args.json}")
+    else:
+        print(json.dumps(best, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,17 @@
 # dj_queue_20_after_10_dedupe_tags_menu.py
 # pip install spotipy
 
-import os, sys, time, re, random
+import os, sys, re, random
 from typing import List, Optional, Set, Iterable, Dict
 import spotipy
 from spotipy.oauth2 import SpotifyOAuth
-from spotipy.exceptions import SpotifyException
-from requests.exceptions import ReadTimeout, ConnectionError as ReqConnErr
+from device_registry import get_registry
+from spotify_scheduler import ScheduledSpotify, lane_client
+from playback_start import start_tracks, append_tracks
+from playback_watcher import get_watcher
+from session_events import publish
+from next_batch import NextBatch
+from spotify_async import HAS_ASYNC, AsyncSpotify, gather_bounded, run_async, MAX_CONCURRENCY
 
 # ====== CREDENTIALS ======
 CLIENT_ID     = os.getenv("SPOTIPY_CLIENT_ID",     "0c91f9e84c8648188f943938a28ae765")
@@ -33,16 +38,15 @@ EXCLUDE_WORDS = re.compile(r"(?i)\b(cover|karaoke)\b")
 
 MAX_PAGES_ARTIST = 5
 MAX_PAGES_RANDOM = 5
-API_SLEEP = 0.10
 
 INITIAL_BATCH     = 50
 CHANGES_PER_TOPUP = 10
 TOPUP_BATCH       = 20
-POLL_SECS         = 2.0
 
 # ====== Auth ======
 def spotify_client() -> spotipy.Spotify:
-    return spotipy.Spotify(
+    # pacing / 429 / retries are handled by the shared scheduler
+    return ScheduledSpotify(
         auth_manager=SpotifyOAuth(
             client_id=CLIENT_ID,
             client_secret=CLIENT_SECRET,
@@ -54,14 +58,8 @@ def spotify_client() -> spotipy.Spotify:
     )
 
 def ensure_active_device(sp: spotipy.Spotify) -> Optional[str]:
-    devices = sp.devices().get("devices", [])
-    if not devices: return None
-    for d in devices:
-        if d.get("is_active"): return d.get("id")
-    target = devices[0]
-    sp.transfer_playback(device_id=target["id"], force_play=True)
-    time.sleep(0.4)
-    return target["id"]
+    # cached per user; transfers to the first device if none is active
+    return get_registry().active_device_id(sp, transfer_if_idle=True)
 
 # ====== Tag selection menu ======
 def choose_tags_menu() -> List[str]:
@@ -109,14 +107,8 @@ def keep_track(t: dict, tag_rx: re.Pattern, seen_uris: Set[str], seen_keys: Set[
     return uri
 
 def sp_search_safe(sp, **kwargs):
-    tries = 0
-    while True:
-        try:
-            return sp.search(**kwargs)
-        except (ReadTimeout, ReqConnErr, SpotifyException):
-            tries += 1
-            time.sleep(min(2.0, 0.25 * (2 ** tries)))
-            if tries >= 5: raise
+    # Timeouts, 5xx and 429 (Retry-After) are retried by the scheduler behind ScheduledSpotify
+    return sp.search(**kwargs)
 
 # ====== Artist / Random ======
 def _artist_gen(sp, artist_name: str, tag_rx: re.Pattern, seen_uris: Set[str], seen_keys: Set[str], tags: List[str]) -> Iterable[str]:
@@ -134,7 +126,6 @@ def _artist_gen(sp, artist_name: str, tag_rx: re.Pattern, seen_uris: Set[str], s
             for t in items:
                 uri = keep_track(t, tag_rx, seen_uris, seen_keys)
                 if uri: yield uri
-            time.sleep(API_SLEEP)
 
 def search_by_artists(sp, artists: List[str], max_tracks: int,
                       seen_uris: Set[str], seen_keys: Set[str], tags: List[str]) -> List[str]:
@@ -152,6 +143,60 @@ def search_by_artists(sp, artists: List[str], max_tracks: int,
                 order.remove(a)
     return out[:max_tracks]
 
+def _round_robin(per_artist: Dict[str, list], max_tracks: int, tag_rx: re.Pattern,
+                 seen_uris: Set[str], seen_keys: Set[str]) -> List[str]:
+    # same order as search_by_artists: one keeper per artist per round, each artist's tracks in (tag, page) order
+    streams = {a: (t for _, _, items in sorted(pages, key=lambda p: p[:2]) for t in items)
+               for a, pages in per_artist.items()}
+    out, order = [], list(streams)
+    while order and (max_tracks <= 0 or len(out) < max_tracks):
+        for a in list(order):
+            if max_tracks > 0 and len(out) >= max_tracks: break
+            for t in streams[a]:
+                uri = keep_track(t, tag_rx, seen_uris, seen_keys)
+                if uri:
+                    out.append(uri)
+                    break
+            else:
+                order.remove(a)
+    return out[:max_tracks] if max_tracks > 0 else out
+
+async def search_by_artists_async(sp, artists: List[str], max_tracks: int,
+                                  seen_uris: Set[str], seen_keys: Set[str], tags: List[str],
+                                  concurrency: int = MAX_CONCURRENCY) -> List[str]:
+    """
+    search_by_artists with the artists searched concurrently: each wave fetches the
+    next (tag, page) of every artist at once, until the picks are covered.
+    """
+    tag_rx = re.compile(r"(?i)\b(" + "|".join(re.escape(t) for t in tags) + r")\b")
+    per_artist: Dict[str, list] = {a: [] for a in artists}
+    cursor = {a: (0, 0) for a in artists}   # artist -> next (tag index, page)
+    async with AsyncSpotify.from_sync(sp) as asp:
+        while cursor:
+            wave = list(cursor.items())
+            results = await gather_bounded(
+                [lambda a=a, ti=ti, page=page: asp.search(q=f'artist:"{a}" {tags[ti]}', type="track",
+                                                          limit=50, offset=page*50, market=MARKET)
+                 for a, (ti, page) in wave], concurrency)
+            for (a, (ti, page)), res in zip(wave, results):
+                failed = isinstance(res, Exception)
+                items = [] if failed else (res.get("tracks", {}).get("items", []) or [])
+                random.shuffle(items)
+                if items:
+                    per_artist[a].append((ti, page, items))
+                # same walk as _artist_gen: a failed page is skipped, an empty one ends the tag
+                if (failed or items) and page + 1 < MAX_PAGES_ARTIST:
+                    cursor[a] = (ti, page + 1)
+                elif ti + 1 < len(tags):
+                    cursor[a] = (ti + 1, 0)
+                else:
+                    del cursor[a]
+            # dry run on copies: stop once the picks are covered
+            if max_tracks > 0 and len(_round_robin(per_artist, max_tracks, tag_rx,
+                                                   set(seen_uris), set(seen_keys))) >= max_tracks:
+                break
+    return _round_robin(per_artist, max_tracks, tag_rx, seen_uris, seen_keys)
+
 def search_random(sp, max_tracks: int,
                   seen_uris: Set[str], seen_keys: Set[str], tags: List[str]) -> List[str]:
     uris = []
@@ -171,27 +216,25 @@ def search_random(sp, max_tracks: int,
                 if uri:
                     uris.append(uri)
                     if 0 < max_tracks <= len(uris): return uris
-            time.sleep(API_SLEEP)
     return uris[:max_tracks]
 
 # ====== Queue ======
-def start_and_queue(sp, device_id: str, uris: List[str]) -> None:
-    if not uris: return
-    sp.start_playback(device_id=device_id, uris=[uris[0]])
-    for u in uris[1:]:
-        try:
-            sp.add_to_queue(u, device_id=device_id); time.sleep(API_SLEEP)
-        except SpotifyException:
-            break
-    print(f"▶ Started playback + queued {len(uris)-1} tracks.")
+def start_and_queue(sp, device_id: str, uris: List[str]):
+    if not uris: return None
+    # one start for the whole batch; anything that does not fit is queued in the background
+    started = start_tracks(sp, device_id, uris, label="artgig")
+    print(f"▶ Started playback of {len(uris)} tracks ({started['mode']} mode).")
+    return started["queue_job"]
 
 # ====== Pump Loop ======
 def pump_loop(sp, device_id: str, mode: str, artists: List[str], tags: List[str]):
     managed_uris, managed_keys = set(), set()
-    last_uri, change_count = None, 0
+    change_count = 0
 
     def fetch(n: int) -> List[str]:
         if mode == "artist":
+            if HAS_ASYNC:
+                return run_async(search_by_artists_async(sp, artists, n, managed_uris, managed_keys, tags))
             return search_by_artists(sp, artists, n, managed_uris, managed_keys, tags)
         return search_random(sp, n, managed_uris, managed_keys, tags)
 
@@ -200,33 +243,29 @@ def pump_loop(sp, device_id: str, mode: str, artists: List[str], tags: List[str]
     start_and_queue(sp, device_id, seed)
     managed_uris.update(seed)
 
-    print(f"🔁 Rule: after 10 changes → add 20 (with dedupe). Active tags: {', '.join(tags)}")
+    # From here on it is top-ups: background lane (fetch() uses it too)
+    sp = lane_client(sp, "background")
 
-    while True:
-        time.sleep(POLL_SECS)
-        try:
-            pb = sp.current_playback()
-        except Exception:
-            continue
-        cur_uri = ((pb or {}).get("item") or {}).get("uri")
-
-        if cur_uri and last_uri and cur_uri != last_uri:
+    print(f"🔁 Rule: after 10 changes → add 20 (with dedupe). Active tags: {', '.join(tags)}")
+    # the next top-up is prebuilt in the background, ahead of the change that triggers it
+    nxt = NextBatch(lambda: fetch(TOPUP_BATCH), label="artgig")
+
+    # track changes come from the user's shared playback watcher
+    with get_watcher(sp).subscribe(types=("track_changed", "skipped")) as changes:
+        while True:
+            ev = changes.get()
+            if not ev.previous or ev.item.get("uri") == ev.previous.get("uri"):
+                continue   # same track restarted
             change_count += 1
             if change_count >= CHANGES_PER_TOPUP:
-                more = fetch(TOPUP_BATCH)
+                more = nxt.take()
                 random.shuffle(more)
-                added = 0
-                for u in more:
-                    try:
-                        sp.add_to_queue(u, device_id=device_id)
-                        managed_uris.add(u)
-                        added += 1
-                        time.sleep(API_SLEEP)
-                    except SpotifyException:
-                        break
-                print(f"✅ {CHANGES_PER_TOPUP} changes → added {added} tracks.")
+                added = append_tracks(sp, device_id, more, label="artgig top-up")
+                managed_uris.update(more)
+                publish("artgig", "top_up", added=len(more), mode=added["mode"])
+                print(f"✅ {CHANGES_PER_TOPUP} changes → added {len(more)} tracks ({added['mode']}).")
                 change_count = 0
-        last_uri = cur_uri
+            nxt.plan_from(ev.playback, CHANGES_PER_TOPUP - change_count)
 
 # ====== Main ======
 def main():
@@ -0,0 +1,124 @@
+# device_registry.py
+# One cached view of a user's Spotify devices, shared by every engine and
+# backend endpoint instead of each of them calling sp.devices() and re-running
+# the "active device, else first device" loop before every playback command.
+#
+# The cached list is refreshed when:
+#   - it is older than DEVICE_TTL_SECS,
+#   - playback is transferred through the registry,
+#   - a command run through run_on_device() fails with a device error.
+#
+# Usage:
+#   reg = get_registry()                     # per-user registry
+#   device_id = reg.active_device_id(sp)
+#   reg.run_on_device(sp, lambda did: sp.start_playback(device_id=did, uris=uris))
+
+import time, threading
+from typing import Callable, Dict, List, Optional
+
+from spotipy.exceptions import SpotifyException
+
+DEVICE_TTL_SECS = 15.0
+
+def is_device_error(e: Exception) -> bool:
+    if not isinstance(e, SpotifyException):
+        return False
+    text = f"{getattr(e, 'reason', '') or ''} {getattr(e, 'msg', '') or ''}".lower()
+    return e.http_status == 404 or "device" in text
+
+class DeviceRegistry:
+    def __init__(self, ttl: float = DEVICE_TTL_SECS):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._devices: List[dict] = []
+        self._fetched_at = 0.0
+        self.fetches = 0
+        self.hits = 0
+
+    # ---------- cache ----------
+    def invalidate(self):
+        with self._lock:
+            self._fetched_at = 0.0
+
+    def devices(self, sp, force: bool = False) -> List[dict]:
+        with self._lock:
+            if not force and self._fetched_at and time.time() - self._fetched_at < self.ttl:
+                self.hits += 1
+                return list(self._devices)
+        devs = sp.devices().get("devices", []) or []
+        with self._lock:
+            self._devices = devs
+            self._fetched_at = time.time()
+            self.fetches += 1
+        return list(devs)
+
+    def active_device(self, sp, transfer_if_idle: bool = False, force: bool = False) -> Optional[dict]:
+        """Active device, else the first one (optionally transferring playback to it)."""
+        devs = self.devices(sp, force=force)
+        if not devs:
+            return None
+        for d in devs:
+            if d.get("is_active"):
+                return d
+        target = devs[0]
+        if transfer_if_idle:
+            self.transfer(sp, target["id"])
+            time.sleep(0.4)
+        return target
+
+    def active_device_id(self, sp, transfer_if_idle: bool = False) -> Optional[str]:
+        d = self.active_device(sp, transfer_if_idle=transfer_if_idle)
+        return d.get("id") if d else None
+
+    # ---------- updates from local commands ----------
+    def transfer(self, sp, device_id: str, force_play: bool = True):
+        sp.transfer_playback(device_id=device_id, force_play=force_play)
+        with self._lock:
+            # Mirror what Spotify will report; the next real fetch confirms it
+            for d in self._devices:
+                d["is_active"] = (d.get("id") == device_id)
+            if not any(d.get("id") == device_id for d in self._devices):
+                self._fetched_at = 0.0
+
+    def note_volume(self, device_id: str, volume_percent: int):
+        with self._lock:
+            for d in self._devices:
+                if d.get("id") == device_id:
+                    d["volume_percent"] = volume_percent
+
+    def run_on_device(self, sp, command: Callable[[Optional[str]], object],
+                      transfer_if_idle: bool = False) -> Optional[str]:
+        """
+        Run command(device_id) on the cached active device. On a device error
+        (device gone, no active device) refresh the list and retry once.
+        Returns the device id the command ran on.
+        """
+        device_id = self.active_device_id(sp, transfer_if_idle=transfer_if_idle)
+        try:
+            command(device_id)
+            return device_id
+        except SpotifyException as e:
+            if not is_device_error(e):
+                raise
+            self.invalidate()
+            device = self.active_device(sp, transfer_if_idle=transfer_if_idle, force=True)
+            if not device:
+                raise
+            command(device.get("id"))
+            return device.get("id")
+
+    def stats(self) -> dict:
+        with self._lock:
+            age = time.time() - self._fetched_at if self._fetched_at else None
+            return {"devices": len(self._devices), "fetches": self.fetches, "hits": self.hits,
+                    "age_secs": round(age, 1) if age is not None else None}
+
+_REGISTRIES: Dict[str, DeviceRegistry] = {}
+_REGISTRIES_LOCK = threading.Lock()
+
+def get_registry(user_key: str = "default") -> DeviceRegistry:
+    with _REGISTRIES_LOCK:
+        reg = _REGISTRIES.get(user_key)
+        if reg is None:
+            reg = _REGISTRIES[user_key] = DeviceRegistry()
+        return reg
@@ -0,0 +1,279 @@
+# mood_index.py
+# Popularity-binned track index for the mood mixer. Instead of re-splitting
+# and reshuffling every playlist pool on every build, each playlist's rows are
+# binned once per pool entry (i.e. once per snapshot_id, see playlist_pool.py)
+# into array-backed "high" / "mid" lists of row positions. Builds then sample
+# by index arithmetic:
+#
+#   - rows live in one process-wide table; a URI gets one integer id, shared by
+#     every playlist that lists it
+#   - seen / already-picked tracks are a bytearray bitmap over URI ids
+#     (Exclusion), built once per build from seen_uris
+#   - a bin is walked in a random order without shuffling it: start at a random
+#     offset and step by a random stride coprime with its length, skipping
+#     excluded ids
+#
+# A pool entry that gained pages is extended with just those pages; a playlist
+# whose snapshot changed is re-binned on its own (rows for (playlist, uri)
+# pairs already in the table keep their position); the other playlists' bins
+# are untouched. MoodIndex is the (mood, language) view the
+# mixer builds from; playlists shared by several moods share one set of bins.
+#
+# Bins go when the playlist pool replaces or evicts the entry they were built
+# from (playlist_pool.on_drop), and a re-bin leaves the rows of tracks the new
+# snapshot no longer lists behind. Once such dead rows outnumber the live ones
+# (and COMPACT_MIN_ROWS), the table is compacted: live rows and their URIs are
+# renumbered and every bin remapped. Positions and URI ids are only stable
+# inside sampling(), so compaction waits for the last sampler to leave.
+#
+# Usage:
+#   index = get_mood_index()
+#   with index.sampling():
+#       view = index.view(mood_key, language, {pl: pool_entry, ...}, tier)
+#       excl = index.exclusion(seen_uris)
+#       positions = index.take(view.bins[pl].high, 5, excl)
+#       rows = [index.row(p) for p in positions]
+
+import math, random, threading
+from array import array
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from playlist_pool import get_playlist_pool
+
+COMPACT_MIN_ROWS = 2000     # dead rows tolerated before compacting, however few are live
+
+class PlaylistBins:
+    __slots__ = ("source", "pages", "loaded", "high", "mid", "members")
+
+    def __init__(self, source):
+        self.source = source        # the pool entry these bins were built from
+        self.pages = frozenset()    # its page offsets binned so far
+        self.loaded = 0             # rows on those pages, eligible or not
+        self.high = array("l")      # row positions, popularity >= HIGH_POP_MIN
+        self.mid = array("l")       # row positions, MID_POP_MIN <= popularity < HIGH_POP_MIN
+        self.members = frozenset()  # URI ids in high + mid
+
+    def estimate(self, excl: "Exclusion") -> int:
+        """Eligible tracks in the whole playlist, scaled up from the pages loaded so far."""
+        have = excl.eligible(self)
+        total = self.source.total or self.loaded
+        if not self.loaded or self.loaded >= total:
+            return have if self.loaded else total
+        return int(have * total / self.loaded)
+
+class MoodIndex:
+    """The bins of one mood's playlists for one language, in playlist order."""
+    def __init__(self, mood_key: str, language: str, bins: Dict[str, PlaylistBins]):
+        self.mood_key = mood_key
+        self.language = language
+        self.bins = bins
+
+class Exclusion:
+    """URI ids a build must not pick: seen before, or already picked in this build."""
+    def __init__(self, size: int, ids: Iterable[int]):
+        self.bitmap = bytearray(size)
+        self.ids = set()
+        for i in ids:
+            self.add(i)
+
+    def __contains__(self, uid: int) -> bool:
+        return uid < len(self.bitmap) and self.bitmap[uid] == 1
+
+    def add(self, uid: int):
+        if uid >= len(self.bitmap):
+            self.bitmap.extend(bytes(uid + 1 - len(self.bitmap)))
+        self.bitmap[uid] = 1
+        self.ids.add(uid)
+
+    def eligible(self, bins: PlaylistBins) -> int:
+        return len(bins.high) + len(bins.mid) - len(self.ids & bins.members)
+
+class TrackIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.rows: List[dict] = []
+        self.row_uid = array("l")                       # row position -> URI id
+        self._uri_ids: Dict[str, int] = {}
+        self._positions: Dict[Tuple[str, str], int] = {}  # (playlist uri, track uri) -> row position
+        self._bins: Dict[str, PlaylistBins] = {}
+        self._samplers = 0
+        self._compact_due = False
+        self.rebuilds = 0
+        self.extends = 0
+        self.reuses = 0
+        self.dropped = 0
+        self.compactions = 0
+
+    # ---------- building ----------
+    def bins(self, playlist_uri: str, entry, tier: Callable[[dict], Optional[str]]) -> PlaylistBins:
+        """Bins for the playlist's current pool entry: extended with pages loaded
+        since the last call, re-binned from scratch only for a new entry (snapshot)."""
+        with self._lock:
+            bins = self._bins.get(playlist_uri)
+            pages = entry.pages
+            if bins is not None and bins.source is entry:
+                new = [off for off in pages if off not in bins.pages]
+                if not new:
+                    self.reuses += 1
+                    return bins
+                self.extends += 1
+            else:
+                self._maybe_compact_locked()    # before binning, so the bins returned stay valid
+                bins = PlaylistBins(entry)
+                if get_playlist_pool().holds(entry):
+                    self._bins[playlist_uri] = bins
+                else:
+                    self._bins.pop(playlist_uri, None)   # evicted mid-build: binned for this build only
+                new = list(pages)
+                self.rebuilds += 1
+            members = set(bins.members)
+            for off in new:
+                for tr in pages[off]:
+                    bins.loaded += 1
+                    t = tier(tr)
+                    if t is None:
+                        continue
+                    uid = self._uri_ids.setdefault(tr["uri"], len(self._uri_ids))
+                    if uid in members:
+                        continue        # listed twice in the same playlist
+                    key = (playlist_uri, tr["uri"])
+                    pos = self._positions.get(key)
+                    if pos is None:
+                        pos = self._positions[key] = len(self.rows)
+                        self.rows.append(tr)
+                        self.row_uid.append(uid)
+                    else:
+                        self.rows[pos] = tr     # metadata (e.g. popularity) from the new snapshot
+                    # appended in place: take() walks a random permutation, so order does not matter
+                    (bins.high if t == "high" else bins.mid).append(pos)
+                    members.add(uid)
+            bins.members = frozenset(members)
+            bins.pages = bins.pages | frozenset(new)
+            return bins
+
+    def forget(self, entry):
+        """The pool dropped `entry`: free the bins built from it (their rows go at the next compaction)."""
+        with self._lock:
+            for pl in [pl for pl, b in self._bins.items() if b.source is entry]:
+                del self._bins[pl]
+                self.dropped += 1
+            self._maybe_compact_locked()
+
+    # ---------- compaction ----------
+    def _live_rows_locked(self) -> int:
+        return sum(len(b.high) + len(b.mid) for b in self._bins.values())
+
+    def _maybe_compact_locked(self):
+        live = self._live_rows_locked()
+        if len(self.rows) - live <= max(COMPACT_MIN_ROWS, live):
+            return
+        if self._samplers:
+            self._compact_due = True    # positions are in use: the last sampler compacts
+            return
+        self._compact_locked()
+
+    def _compact_locked(self):
+        """Keep only the rows the bins point at, renumbering rows and URI ids."""
+        rows: List[dict] = []
+        row_uid = array("l")
+        uri_ids: Dict[str, int] = {}
+        positions: Dict[Tuple[str, str], int] = {}
+        for pl, bins in self._bins.items():
+            for name in ("high", "mid"):
+                remapped = array("l")
+                for pos in getattr(bins, name):
+                    tr = self.rows[pos]
+                    positions[(pl, tr["uri"])] = len(rows)
+                    remapped.append(len(rows))
+                    rows.append(tr)
+                    row_uid.append(uri_ids.setdefault(tr["uri"], len(uri_ids)))
+                setattr(bins, name, remapped)
+            bins.members = frozenset(row_uid[p] for arr in (bins.high, bins.mid) for p in arr)
+        self.rows, self.row_uid = rows, row_uid
+        self._uri_ids, self._positions = uri_ids, positions
+        self._compact_due = False
+        self.compactions += 1
+
+    @contextmanager
+    def sampling(self):
+        """Hold row positions and URI ids stable (no compaction) while sampling."""
+        with self._lock:
+            self._samplers += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._samplers -= 1
+                if not self._samplers and self._compact_due:
+                    self._compact_locked()
+
+    def view(self, mood_key: str, language: str, entries: Dict[str, object],
+             tier: Callable[[dict], Optional[str]]) -> MoodIndex:
+        return MoodIndex(mood_key, language,
+                         {pl: self.bins(pl, entry, tier) for pl, entry in entries.items() if entry is not None})
+
+    # ---------- sampling ----------
+    def exclusion(self, uris: Iterable[str]) -> Exclusion:
+        with self._lock:
+            ids = [self._uri_ids[u] for u in uris if u in self._uri_ids]
+            size = len(self._uri_ids)
+        return Exclusion(size, ids)
+
+    def take(self, positions: array, k: int, excl: Exclusion) -> List[int]:
+        """Up to k row positions from `positions` in a random order, skipping and then
+        marking excluded URIs. Costs O(k + skipped), the bin is never copied."""
+        n = len(positions)
+        out: List[int] = []
+        if k <= 0 or n == 0:
+            return out
+        start = random.randrange(n)
+        stride = _coprime_stride(n)
+        for i in range(n):
+            pos = positions[(start + i * stride) % n]
+            uid = self.row_uid[pos]
+            if uid in excl:
+                continue
+            excl.add(uid)
+            out.append(pos)
+            if len(out) == k:
+                break
+        return out
+
+    def row(self, pos: int) -> dict:
+        return self.rows[pos]
+
+    def clear(self):
+        with self._lock:
+            self.rows, self.row_uid = [], array("l")
+            self._uri_ids.clear()
+            self._positions.clear()
+            self._bins.clear()
+            self._compact_due = False
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"rows": len(self.rows), "dead_rows": len(self.rows) - self._live_rows_locked(),
+                    "uris": len(self._uri_ids), "playlists": len(self._bins),
+                    "rebuilds": self.rebuilds, "extends": self.extends, "reuses": self.reuses,
+                    "dropped": self.dropped, "compactions": self.compactions}
+
+def _coprime_stride(n: int) -> int:
+    if n <= 2:
+        return 1
+    for _ in range(8):
+        s = random.randrange(1, n)
+        if math.gcd(s, n) == 1:
+            return s
+    return 1
+
+_INDEX: Optional[TrackIndex] = None
+_INDEX_LOCK = threading.Lock()
+
+def get_mood_index() -> TrackIndex:
+    global _INDEX
+    with _INDEX_LOCK:
+        if _INDEX is None:
+            _INDEX = TrackIndex()
+            get_playlist_pool().on_drop(_INDEX.forget)
+        return _INDEX
@@ -1,9 +1,20 @@
-import os, sys, time, math, random
-from typing import Dict, List, Tuple, Optional
+import os, sys, math, random, asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
 import spotipy
 from spotipy.oauth2 import SpotifyOAuth
 from spotipy.exceptions import SpotifyException
 
+from device_registry import get_registry
+from spotify_scheduler import ScheduledSpotify, lane_client, uncached_client, current_lane
+from playlist_pool import get_playlist_pool, PoolEntry, META_FIELDS, PAGE_SIZE
+from mood_index import get_mood_index
+from playback_start import start_tracks, append_tracks
+from playback_watcher import get_watcher
+from session_events import publish
+from next_batch import NextBatch
+from spotify_async import HAS_ASYNC, AsyncSpotify, gather_bounded, run_async, MAX_CONCURRENCY
+
 # ========================= USER SETTINGS =========================
 
 INITIAL_BATCH   = 50   # total initial tracks to queue
@@ -11,7 +22,6 @@ SEED_START      = 5    # start playback as soon as this many are ready
 TOP_UP_EVERY    = 20   # after this many plays/skips, add TOP_UP_BATCH
 TOP_UP_BATCH    = 20
 QUEUE_LOW_WATER = 5    # proactive top-up when queue length <= this
-POLL_SECONDS    = 3    # how often to poll playback for progress
 
 # Popularity rules
 POP_SKIP_BELOW      = 20   # skip tracks with popularity < 20
@@ -128,114 +138,143 @@ def _id_from_uri(x: str) -> str:
     return x.split("?")[0].split(":")[-1].split("/")[-1]
 
 def ensure_active_device(sp: spotipy.Spotify) -> Optional[str]:
-    devices = sp.devices().get("devices", [])
-    for d in devices:
-        if d.get("is_active"): return d.get("id")
-    return devices[0]["id"] if devices else None
-
-_PLAYLIST_NAME_CACHE: Dict[str, str] = {}
-def playlist_name(sp: spotipy.Spotify, uri: str) -> str:
-    pid = _id_from_uri(uri)
-    if pid in _PLAYLIST_NAME_CACHE: return _PLAYLIST_NAME_CACHE[pid]
-    try:
-        pl = sp.playlist(pid, fields="name")
-        _PLAYLIST_NAME_CACHE[pid] = pl.get("name", pid)
-        return _PLAYLIST_NAME_CACHE[pid]
-    except Exception:
-        return pid
+    return get_registry().active_device_id(sp)
 
-def fetch_playlist_tracks(sp: spotipy.Spotify, playlist_uri: str, first_page_only: bool=False) -> List[dict]:
-    """
-    Safe, defensive fetcher.
-    Returns list of dicts:
-      {uri,id,name,artists,popularity,source_playlist_uri,source_playlist_name}
-    - Skips local tracks
-    - Handles None artist names safely
-    - Popularity defaults to 0 if missing
-    """
-    pid = _id_from_uri(playlist_uri)
+def _rows_from_items(items: List[dict], playlist_uri: str, pl_name: str) -> List[dict]:
     out: List[dict] = []
-    fields = "items(track(id,uri,name,artists(name),popularity,is_local)),next"
-    try:
-        results = sp.playlist_items(pid, additional_types=["track"], fields=fields, limit=100)
-    except Exception:
-        return out  # if playlist fetch fails, return empty
-
-    pl_name = playlist_name(sp, playlist_uri)
-
-    while True:
-        items = results.get("items") or []
-        for it in items:
-            tr = it.get("track") or {}
-            if tr.get("is_local"):
-                continue
-            tid = tr.get("id")
-            uri = tr.get("uri")
-            if not tid or not uri:
-                continue
+    for it in items:
+        tr = it.get("track") or {}
+        if tr.get("is_local"):
+            continue
+        tid = tr.get("id")
+        uri = tr.get("uri")
+        if not tid or not uri:
+            continue
 
-            # Safely build artists string (drop None)
-            raw_artists = tr.get("artists") or []
-            artist_names = []
-            for a in raw_artists:
-                if isinstance(a, dict):
-                    nm = a.get("name")
-                    if nm:
-                        artist_names.append(str(nm))
-                elif isinstance(a, str):
-                    artist_names.append(a)
-            artists_str = ", ".join(artist_names)
-
-            pop = tr.get("popularity")
-            try:
-                pop_int = int(pop) if pop is not None else 0
-            except Exception:
-                pop_int = 0
-
-            out.append({
-                "uri": uri,
-                "id": tid,
-                "name": tr.get("name") or "Unknown",
-                "artists": artists_str,
-                "popularity": pop_int,
-                "source_playlist_uri": playlist_uri,
-                "source_playlist_name": pl_name,
-            })
-
-        if first_page_only: break
-        nxt = results.get("next")
-        if not nxt: break
-        results = sp.next(results)
-
-    random.shuffle(out)
+        # Safely build artists string (drop None)
+        raw_artists = tr.get("artists") or []
+        artist_names = []
+        for a in raw_artists:
+            if isinstance(a, dict):
+                nm = a.get("name")
+                if nm:
+                    artist_names.append(str(nm))
+            elif isinstance(a, str):
+                artist_names.append(a)
+        artists_str = ", ".join(artist_names)
+
+        pop = tr.get("popularity")
+        try:
+            pop_int = int(pop) if pop is not None else 0
+        except Exception:
+            pop_int = 0
+
+        out.append({
+            "uri": uri,
+            "id": tid,
+            "name": tr.get("name") or "Unknown",
+            "artists": artists_str,
+            "popularity": pop_int,
+            "source_playlist_uri": playlist_uri,
+            "source_playlist_name": pl_name,
+        })
     return out
 
+TRACK_FIELDS = "items(track(id,uri,name,artists(name),popularity,is_local)),next,total"
+PAGE_ROUNDS = 3       # extra page-loading rounds a build may take to meet its quotas
+PAGE_MARGIN = 1.5     # load pages for this many times the eligible tracks still missing
+# the snapshot check for a playlist with no rows pooled yet also returns its first page
+META_PAGE_FIELDS = f"{META_FIELDS},tracks({TRACK_FIELDS})"
+
+def _pages_to_load(entry: PoolEntry, pages: Optional[int]) -> List[int]:
+    """Offsets to read so the entry holds `pages` pages (None = all), picked at random."""
+    missing = entry.missing()
+    if pages is None:
+        return missing
+    return random.sample(missing, max(0, min(pages - len(entry.pages), len(missing))))
+
+def _meta_fields(entry: Optional[PoolEntry]) -> str:
+    return META_FIELDS if entry and entry.pages else META_PAGE_FIELDS
+
+def _entry_from_meta(pool, pid: str, entry: Optional[PoolEntry], meta: dict, playlist_uri: str) -> PoolEntry:
+    """Confirm or replace the entry from a snapshot check; an embedded first page is pooled too."""
+    tracks = meta.get("tracks") or {}
+    if not (entry and meta.get("snapshot_id") == entry.snapshot_id):
+        entry = pool.store(pid, meta.get("snapshot_id"), meta.get("name", pid), int(tracks.get("total") or 0))
+    else:
+        pool.confirm(pid)
+    if "items" in tracks and 0 not in entry.pages:
+        pool.add_pages(entry, {0: _rows_from_items(tracks.get("items") or [], playlist_uri, entry.name)})
+    return entry
+
+def _playlist_gone(e: Exception) -> bool:
+    """404 / 403: the playlist was deleted or made private. Anything else may pass on a retry."""
+    return isinstance(e, SpotifyException) and e.http_status in (403, 404)
+
+def _pooled_entry(sp: spotipy.Spotify, playlist_uri: str, pages: Optional[int]=None) -> Optional[PoolEntry]:
+    """The playlist's pool entry (cached, confirmed by snapshot_id, or new) holding
+    at least `pages` pages (None = the whole playlist)."""
+    pid = _id_from_uri(playlist_uri)
+    pool = get_playlist_pool()
+    entry, fresh = pool.lookup(pid)
+    src = uncached_client(sp)
+    if not fresh:
+        try:
+            meta = src.playlist(pid, fields=_meta_fields(entry)) or {}
+            entry = _entry_from_meta(pool, pid, entry, meta, playlist_uri)
+        except Exception as e:
+            # keep serving a cached pool through a failed check; nothing cached and
+            # gone -> missing for a while, nothing cached otherwise -> retried next build
+            if entry is None:
+                if _playlist_gone(e):
+                    pool.fail(pid)
+                return None
+    if entry is None:
+        return None     # known missing
+    loaded: Dict[int, List[dict]] = {}
+    for off in _pages_to_load(entry, pages):
+        try:
+            page = src.playlist_items(pid, additional_types=["track"], fields=TRACK_FIELDS, limit=PAGE_SIZE, offset=off)
+        except Exception:
+            break  # if a page fails, use what we have
+        loaded[off] = _rows_from_items(page.get("items") or [], playlist_uri, entry.name)
+    pool.add_pages(entry, loaded)
+    return entry
+
+async def _pooled_entry_async(asp: AsyncSpotify, playlist_uri: str, pages: Optional[int]=None) -> Optional[PoolEntry]:
+    pid = _id_from_uri(playlist_uri)
+    pool = get_playlist_pool()
+    entry, fresh = pool.lookup(pid)
+    src = uncached_client(asp)
+    if not fresh:
+        try:
+            meta = await src.playlist(pid, fields=_meta_fields(entry)) or {}
+            entry = _entry_from_meta(pool, pid, entry, meta, playlist_uri)
+        except Exception as e:
+            if entry is None:
+                if _playlist_gone(e):
+                    pool.fail(pid)
+                return None
+    if entry is None:
+        return None
+    offsets = _pages_to_load(entry, pages)
+    # page offsets are known from `total`, so all wanted pages are read at once
+    fetched = await asyncio.gather(*(
+        src.playlist_items(pid, additional_types=["track"], fields=TRACK_FIELDS, limit=PAGE_SIZE, offset=off)
+        for off in offsets), return_exceptions=True)
+    pool.add_pages(entry, {off: _rows_from_items(page.get("items") or [], playlist_uri, entry.name)
+                           for off, page in zip(offsets, fetched) if isinstance(page, dict)})
+    return entry
+
 # ---------- Popularity & allocation helpers ----------
 
-def split_by_popularity(pool: List[dict]) -> Tuple[List[dict], List[dict]]:
-    high, mid = [], []
-    for tr in pool:
-        p = tr["popularity"]
-        if p < POP_SKIP_BELOW: continue
-        if p >= HIGH_POP_MIN: high.append(tr)
-        elif p >= MID_POP_MIN: mid.append(tr)
-    random.shuffle(high); random.shuffle(mid)
-    return high, mid
-
-def _eligible_bins_for_playlist(sp, pl, first_page_only, seen_uris):
-    """Fetch tracks for a playlist, filter by popularity & seen, return {'high': [...], 'mid': [...]}"""
-    tracks = fetch_playlist_tracks(sp, pl, first_page_only=first_page_only)
-    uniq = []
-    used = set()
-    for tr in tracks:
-        if tr["uri"] in seen_uris: 
-            continue
-        if tr["uri"] in used:
-            continue
-        used.add(tr["uri"])
-        uniq.append(tr)
-    high, mid = split_by_popularity(uniq)
-    return {"high": high, "mid": mid}
+def _popularity_tier(tr: dict) -> Optional[str]:
+    """'high', 'mid', or None for tracks below MID_POP_MIN / POP_SKIP_BELOW."""
+    p = tr["popularity"]
+    if p < POP_SKIP_BELOW: return None
+    if p >= HIGH_POP_MIN: return "high"
+    if p >= MID_POP_MIN: return "mid"
+    return None
 
 def _proportional_quota(total_needed, sizes, max_share=0.70):
     """
@@ -261,28 +300,6 @@ def _proportional_quota(total_needed, sizes, max_share=0.70):
             leftover -= 1
     return base
 
-def _sample_high_mid(bins, k):
-    """bins = {'high':[...], 'mid':[...]} with fallback across bins."""
-    if k <= 0:
-        return []
-    kh = int(round(k * TARGET_HIGH_RATIO))
-    km = k - kh
-    out = []
-    take_h = min(kh, len(bins["high"]))
-    out += bins["high"][:take_h]
-    take_m = min(km, len(bins["mid"]))
-    out += bins["mid"][:take_m]
-    remaining = k - len(out)
-    ih, im = take_h, take_m
-    while remaining > 0 and (ih < len(bins["high"]) or im < len(bins["mid"])):
-        if ih < len(bins["high"]):
-            out.append(bins["high"][ih]); ih += 1; remaining -= 1
-            if remaining == 0: break
-        if im < len(bins["mid"]):
-            out.append(bins["mid"][im]); im += 1; remaining -= 1
-    random.shuffle(out)
-    return out[:k]
-
 # ---------- Weighting & batching ----------
 
 def prompt_language() -> str:
@@ -357,52 +374,156 @@ def build_batch(sp: spotipy.Spotify, language: str,
     """
     Build a batch with per-mood allocation and per-playlist proportional sampling,
     popularity-aware, excluding seen URIs.
+    Playlists are read progressively: one random page each, then more pages only
+    for playlists whose quota needs them (see _pages_wanted). Every round's reads
+    run on a bounded thread pool.
     """
-    chosen: List[dict] = []
     per_mood_counts = proportional_split(batch_size, mood_weights)
+    playlists = _playlists_for_build(language, per_mood_counts)
+    sp = lane_client(sp, current_lane())   # worker threads keep the caller's priority lane
+    with ThreadPoolExecutor(max_workers=max(1, min(MAX_CONCURRENCY, len(playlists)))) as pool:
+        def load(wanted: Dict[str, int]) -> Dict[str, Optional[PoolEntry]]:
+            # map() yields in submission order, so the merge does not depend on which fetch finished first
+            return dict(zip(wanted, pool.map(lambda pl: _pooled_entry(sp, pl, pages=wanted[pl]), wanted)))
+        entries = load({pl: 1 for pl in playlists})
+        for _ in range(0 if first_page_only else PAGE_ROUNDS):
+            wanted = _pages_wanted(language, per_mood_counts, entries, seen_uris)
+            if not wanted:
+                break
+            entries.update(load(wanted))
+    return _build_from_index(language, per_mood_counts, entries, seen_uris)
+
+async def build_batch_async(sp: spotipy.Spotify, language: str,
+                            mood_weights: Dict[str, int], batch_size: int,
+                            seen_uris: set, first_page_only: bool=False,
+                            concurrency: int = MAX_CONCURRENCY) -> List[dict]:
+    """
+    build_batch with every playlist of every selected mood fetched concurrently
+    (each playlist once, even if several moods share it). Selection is identical.
+    """
+    per_mood_counts = proportional_split(batch_size, mood_weights)
+    playlists = _playlists_for_build(language, per_mood_counts)
+    async with AsyncSpotify.from_sync(sp) as asp:
+        async def load(wanted: Dict[str, int]) -> Dict[str, Optional[PoolEntry]]:
+            fetched = await gather_bounded(
+                [lambda pl=pl: _pooled_entry_async(asp, pl, pages=wanted[pl]) for pl in wanted], concurrency)
+            return {pl: (None if isinstance(res, Exception) else res) for pl, res in zip(wanted, fetched)}
+        entries = await load({pl: 1 for pl in playlists})
+        for _ in range(0 if first_page_only else PAGE_ROUNDS):
+            wanted = _pages_wanted(language, per_mood_counts, entries, seen_uris)
+            if not wanted:
+                break
+            entries.update(await load(wanted))
+    return _build_from_index(language, per_mood_counts, entries, seen_uris)
+
+def build_batch_fast(sp: spotipy.Spotify, language: str,
+                     mood_weights: Dict[str, int], batch_size: int,
+                     seen_uris: set, first_page_only: bool=False) -> List[dict]:
+    """build_batch_async when httpx is available, else the blocking build_batch."""
+    if HAS_ASYNC:
+        return run_async(build_batch_async(sp, language, mood_weights, batch_size, seen_uris, first_page_only))
+    return build_batch(sp, language, mood_weights, batch_size, seen_uris, first_page_only)
+
+def _playlists_for_build(language: str, per_mood_counts: Dict[str, int]) -> List[str]:
+    """Every playlist a build needs, once each, in mood order."""
+    return list(dict.fromkeys(pl for mood_key, count in per_mood_counts.items() if count > 0
+                              for pl in collect_playlists_for_mood(language, mood_key)))
+
+def _pages_wanted(language: str, per_mood_counts: Dict[str, int],
+                  entries: Dict[str, Optional[PoolEntry]], seen_uris) -> Dict[str, int]:
+    """
+    Playlists whose loaded pages hold fewer eligible tracks than their quota
+    (allocated as _build_from_index will, from the estimated playlist size),
+    mapped to the page count to load up to. Empty when every quota is covered.
+    """
+    index = get_mood_index()
+    with index.sampling():
+        excl = index.exclusion(seen_uris)
+        needed: Dict[str, int] = {}
+        bins_by_pl = {}
+        for mood_key, count in per_mood_counts.items():
+            if count <= 0:
+                continue
+            playlists = [pl for pl in collect_playlists_for_mood(language, mood_key) if entries.get(pl)]
+            bins = [bins_by_pl.setdefault(pl, index.bins(pl, entries[pl], _popularity_tier)) for pl in playlists]
+            quotas = _proportional_quota(count, [b.estimate(excl) for b in bins], max_share=0.70)
+            for pl, q in zip(playlists, quotas):
+                needed[pl] = needed.get(pl, 0) + q
+        wanted = {}
+        for pl, q in needed.items():
+            entry, b = entries[pl], bins_by_pl[pl]
+            have = excl.eligible(b)
+            if q <= have or entry.complete:
+                continue
+            per_page = have / len(b.pages) if have else PAGE_SIZE / 4
+            wanted[pl] = len(entry.pages) + math.ceil((q - have) * PAGE_MARGIN / per_page)
+        return wanted
 
-    for mood_key, count in per_mood_counts.items():
-        if count <= 0:
-            continue
-        playlists = collect_playlists_for_mood(language, mood_key)
-        if not playlists:
-            continue
+def _build_from_index(language: str, per_mood_counts: Dict[str, int],
+                      entries: Dict[str, Optional[PoolEntry]], seen_uris) -> List[dict]:
+    """
+    Per-mood allocation over the popularity index (mood_index.py): playlists
+    are binned once per snapshot, and seen / already-picked tracks are skipped
+    through one exclusion bitmap, so a track is picked at most once per build.
+    """
+    index = get_mood_index()
+    with index.sampling():
+        views = {mood_key: index.view(mood_key, language,
+                                      {pl: entries.get(pl) for pl in collect_playlists_for_mood(language, mood_key)},
+                                      _popularity_tier)
+                 for mood_key, count in per_mood_counts.items() if count > 0}
+        excl = index.exclusion(seen_uris)
+
+        chosen: List[dict] = []
+        for mood_key, count in per_mood_counts.items():
+            view = views.get(mood_key)
+            if count <= 0 or view is None or not view.bins:
+                continue
+            bins_per_pl = list(view.bins.values())
 
-        # Build eligible bins per playlist for this mood
-        bins_per_pl = []
-        for pl in playlists:
-            bins_per_pl.append(_eligible_bins_for_playlist(sp, pl, first_page_only, seen_uris))
+            # Eligible sizes per playlist (high+mid, not seen / picked), scaled up for partly read playlists
+            sizes = [b.estimate(excl) for b in bins_per_pl]
 
-        # Eligible sizes per playlist (high+mid)
-        sizes = [len(b["high"]) + len(b["mid"]) for b in bins_per_pl]
+            # Allocate this mood's count proportionally; cap any single playlist's share
+            quotas = _proportional_quota(count, sizes, max_share=0.70)
 
-        # Allocate this mood's count proportionally; cap any single playlist's share
-        quotas = _proportional_quota(count, sizes, max_share=0.70)
+            # Sample from each playlist as per its quota, preserving high:mid target
+            picks: List[int] = []
+            for b, q in zip(bins_per_pl, quotas):
+                if q > 0:
+                    picks.extend(_sample_indexed(index, [b.high], [b.mid], q, excl))
 
-        # Sample from each playlist as per its quota, preserving high:mid target
-        picks = []
-        for b, q in zip(bins_per_pl, quotas):
-            if q > 0:
-                picks.extend(_sample_high_mid(b, q))
+            # If short due to thin bins, fill from any remaining eligible across all
+            deficit = count - len(picks)
+            if deficit > 0:
+                picks.extend(_sample_indexed(index, [b.high for b in bins_per_pl],
+                                             [b.mid for b in bins_per_pl], deficit, excl))
 
-        # If short due to thin bins, fill from any remaining eligible across all
-        deficit = count - len(picks)
-        if deficit > 0:
-            rem_high, rem_mid = [], []
-            for b, q in zip(bins_per_pl, quotas):
-                rem_high.extend(b["high"])
-                rem_mid.extend(b["mid"])
-            random.shuffle(rem_high); random.shuffle(rem_mid)
-            merged = {"high": rem_high, "mid": rem_mid}
-            extra = _sample_high_mid(merged, deficit)
-            picks.extend(extra)
+            # index rows are shared: tag copies
+            chosen.extend(dict(index.row(p), mood_key=mood_key) for p in picks)
 
-        for tr in picks:
-            tr["mood_key"] = mood_key
-        chosen.extend(picks)
+        random.shuffle(chosen)
+        return chosen
 
-    random.shuffle(chosen)
-    return chosen
+def _sample_indexed(index, highs, mids, k: int, excl) -> List[int]:
+    """k tracks aiming for TARGET_HIGH_RATIO high : mid; the short bin's share
+    comes from the other one."""
+    kh = int(round(k * TARGET_HIGH_RATIO))
+    out = _take_across(index, highs, kh, excl)
+    out += _take_across(index, mids, k - kh, excl)
+    if len(out) < k:
+        out += _take_across(index, highs, k - len(out), excl)
+    if len(out) < k:
+        out += _take_across(index, mids, k - len(out), excl)
+    return out
+
+def _take_across(index, bins: List, k: int, excl) -> List[int]:
+    out: List[int] = []
+    for arr in random.sample(bins, len(bins)):
+        if len(out) >= k:
+            break
+        out += index.take(arr, k - len(out), excl)
+    return out
 
 # ---------- Playback helpers & auto top-up ----------
 
@@ -411,112 +532,92 @@ def log_track(prefix: str, tr: dict):
           f"(pop {tr['popularity']})  from: {tr['source_playlist_name']}")
 
 def queue_only(sp: spotipy.Spotify, device_id: str, tracks: List[dict]):
+    """
+    Add tracks after what is playing without interrupting it: appended to the session
+    playlist in context mode, else handed to the queue writer (returns its job, or None).
+    """
     for tr in tracks:
-        try:
-            sp.add_to_queue(tr["uri"], device_id=device_id)
-            log_track("➕ Queued     ", tr)
-            time.sleep(0.03)
-        except SpotifyException as e:
-            print("add_to_queue error:", e)
+        log_track("➕ Queueing   ", tr)
+    return append_tracks(sp, device_id, [tr["uri"] for tr in tracks], label="mood mixer")["queue_job"]
 
 def start_with_seed_then_queue(sp: spotipy.Spotify, device_id: str, seed: List[dict], rest: List[dict]):
     if not seed:
         print("No seed tracks to start."); return
-    first = seed[0]
+    batch = seed + rest
     try:
-        sp.start_playback(device_id=device_id, uris=[first["uri"]])
-        log_track("▶  Now playing", first)
+        # one start for the whole batch (see playback_start.py); overflow is queued in the background
+        started = start_tracks(sp, device_id, [tr["uri"] for tr in batch], label="mood mixer")
+        log_track("▶  Now playing", batch[0])
     except SpotifyException as e:
-        print("start_playback error:", e); return
-    # queue remaining seed (if any)
-    if len(seed) > 1:
-        queue_only(sp, device_id, seed[1:])
-    # queue the rest as they’re ready
-    if rest:
-        queue_only(sp, device_id, rest)
-
-def safe_get_queue(sp):
-    try:
-        return sp.queue()
-    except Exception:
-        return None
+        print("start_playback error:", e); return None
+    for tr in batch[1:]:
+        log_track("➕ Up next    ", tr)
+    return started["queue_job"]
 
 def monitor_and_topup(sp: spotipy.Spotify, device_id: str,
                       language: str, weights: Dict[str, int],
-                      seen_uris: set, next_topup_after: int):
+                      seen_uris: set, next_topup_after: int, queued: Optional[int] = None):
     """
-    Robust top-up trigger:
-    - increments counter when track ID changes OR progress_ms drops notably (skip/next),
+    Top-up trigger, fed by the user's shared playback watcher:
+    - counts track changes and skips (including restarts / previous),
     - also tops up when the remaining queue is low (<= QUEUE_LOW_WATER).
+    The next top-up is prebuilt in the background ahead of whichever trigger is
+    due first (next_batch.py); `queued` is how many tracks are lined up after
+    the current one, if known.
     """
+    sp = lane_client(sp, "background")
     played = 0
-    last_track_id = None
-    last_progress = None
+    job = None   # last top-up job; the queue only looks low while it is still being written
     threshold = next_topup_after
+    nxt = NextBatch(lambda: build_batch_fast(sp, language, weights, TOP_UP_BATCH, seen_uris), label="mood mixer")
 
     print(f"\n🔁 Auto top-up armed: +{TOP_UP_BATCH} after every {TOP_UP_EVERY} plays/skips, "
           f"and also when queue ≤ {QUEUE_LOW_WATER}.\n")
 
-    while True:
-        try:
-            pb = sp.current_playback()
-        except SpotifyException:
-            time.sleep(POLL_SECONDS)
-            continue
-
-        # detect track change or skip (progress reset)
-        changed = False
-        if pb and pb.get("item"):
-            tid = pb["item"].get("id")
-            prog = pb.get("progress_ms")
-
-            if last_track_id is None:
-                last_track_id = tid
-                last_progress = prog
-
-            if tid and tid != last_track_id:
-                changed = True
-            elif prog is not None and last_progress is not None:
-                # large negative delta = probably skip/next
-                if prog + 5000 < last_progress:
-                    changed = True
-
-            last_track_id = tid
-            last_progress = prog
-
-        if changed:
-            played += 1
-            print(f"♪ Progress: {played} tracks played/skipped…")
-
-        # queue length check (safety net)
-        need_topup = False
-        q = safe_get_queue(sp)
-        if q and isinstance(q, dict):
-            queue_list = q.get("queue") or []
-            # This is Spotify's pending queue (not including current track)
-            if len(queue_list) <= QUEUE_LOW_WATER:
-                print(f"⚠  Queue buffer low ({len(queue_list)}). Will top up.")
-                need_topup = True
-
-        # threshold check
-        if played >= threshold:
-            print(f"✅ Reached {played} plays/skips (threshold {threshold}). Will top up.")
-            need_topup = True
-
-        if need_topup:
-            print(f"\n⬆  Top-up: building {TOP_UP_BATCH} more (balanced, no duplicates)…")
-            add = build_batch(sp, language, weights, TOP_UP_BATCH, seen_uris, first_page_only=False)
-            if not add:
-                print("No new tracks available to top-up (all seen or empty pools).")
+    with get_watcher(sp).subscribe(types=("track_changed", "skipped", "queue_low"),
+                                   queue_low=QUEUE_LOW_WATER) as events:
+        while True:
+            ev = events.get()
+            need_topup = False
+            if ev.type == "queue_low":
+                # Spotify's pending queue (not including current track)
+                if job is None or job.finished:
+                    print(f"⚠  Queue buffer low ({ev.queue_length}). Will top up.")
+                    need_topup = True
             else:
-                queue_only(sp, device_id, add)   # only queue; do not interrupt current song
-                for tr in add: seen_uris.add(tr["uri"])
-                print(f"✅ Top-up complete: +{len(add)} tracks.\n")
-            # move threshold forward to next block
-            while threshold <= played:
-                threshold += TOP_UP_EVERY
+                played += 1
+                print(f"♪ Progress: {played} tracks played/skipped…")
+                if queued is not None:
+                    queued = max(0, queued - 1)
+            if ev.queue_length is not None:
+                queued = ev.queue_length
+
+            # threshold check
+            if played >= threshold:
+                print(f"✅ Reached {played} plays/skips (threshold {threshold}). Will top up.")
+                need_topup = True
 
-        time.sleep(POLL_SECONDS)
+            if need_topup:
+                print(f"\n⬆  Top-up: building {TOP_UP_BATCH} more (balanced, no duplicates)…")
+                add = nxt.take()
+                if not add:
+                    print("No new tracks available to top-up (all seen or empty pools).")
+                else:
+                    job = queue_only(sp, device_id, add)   # only queue; do not interrupt current song
+                    if queued is not None:
+                        queued += len(add)
+                    for tr in add: seen_uris.add(tr["uri"])
+                    publish("mood_mixer", "top_up", added=len(add), played=played)
+                    print(f"✅ Top-up: +{len(add)} tracks" + (f" (queue job {job.id})" if job else " (session playlist)") + ".\n")
+                # move threshold forward to next block
+                while threshold <= played:
+                    threshold += TOP_UP_EVERY
+
+            # changes until the next top-up: the play threshold, or the queue draining to the low-water mark
+            until = threshold - played
+            if queued is not None:
+                until = min(until, queued - QUEUE_LOW_WATER + 1)
+            nxt.plan_from(ev.playback, max(1, until))
 
 # ========================= MAIN =========================
 
@@ -527,7 +628,7 @@ def main():
     os.environ["SPOTIPY_CLIENT_ID"] = SPOTIFY_CLIENT_ID
     os.environ["SPOTIPY_CLIENT_SECRET"] = SPOTIFY_CLIENT_SECRET
     os.environ["SPOTIPY_REDIRECT_URI"] = SPOTIFY_REDIRECT_URI
-    sp = spotipy.Spotify(auth_manager=SpotifyOAuth(
+    sp = ScheduledSpotify(auth_manager=SpotifyOAuth(
         client_id=SPOTIFY_CLIENT_ID,
         client_secret=SPOTIFY_CLIENT_SECRET,
         redirect_uri=SPOTIFY_REDIRECT_URI,
@@ -549,21 +650,22 @@ def main():
 
     # Build a small seed fast (first page only) and start immediately
     seen_uris = set()
-    seed = build_batch(sp, lang, weights, SEED_START, seen_uris, first_page_only=True)
+    seed = build_batch_fast(sp, lang, weights, SEED_START, seen_uris, first_page_only=True)
     for tr in seed: seen_uris.add(tr["uri"])
 
     # Build the remainder of the initial batch (full fetch)
     remaining_needed = max(0, INITIAL_BATCH - len(seed))
     rest = []
     if remaining_needed > 0:
-        rest = build_batch(sp, lang, weights, remaining_needed, seen_uris, first_page_only=False)
+        rest = build_batch_fast(sp, lang, weights, remaining_needed, seen_uris, first_page_only=False)
         for tr in rest: seen_uris.add(tr["uri"])
 
     print(f"\n▶  Starting now with {len(seed)} seed tracks, then queuing {len(rest)} more…\n")
     start_with_seed_then_queue(sp, device_id, seed, rest)
 
     # Monitor playback and auto top-up forever
-    monitor_and_topup(sp, device_id, lang, weights, seen_uris, next_topup_after=TOP_UP_EVERY)
+    monitor_and_topup(sp, device_id, lang, weights, seen_uris, next_topup_after=TOP_UP_EVERY,
+                      queued=len(seed) + len(rest) - 1)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
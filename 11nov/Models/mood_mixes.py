@@ -0,0 +1,221 @@
+# mood_mixes.py
+# Materialized mood mixes. Most mood mixer starts use one of a few
+# (language, mood_weights) combinations, and every start used to run a full
+# build (seed, then the rest of INITIAL_BATCH) before playback began. The store
+# keeps a pre-built candidate batch of MIX_SIZE tracks for each combination
+# that was asked for at least MATERIALIZE_AFTER times, refreshes it in the
+# background every REFRESH_SECS, and serves a start from it without any Spotify
+# reads:
+#
+#   draw()    per mood (proportional_split over the weights), a random sample of
+#             the mix's candidates that are not in seen_uris and were not served
+#             to the same user_key recently; None (caller builds live) when the
+#             mix is missing or too thin
+#
+# Mixes are shared by all users (candidate batches don't depend on the user);
+# the per-user filter keeps a user who restarts the mixer from hearing the same
+# opening. A mix nobody asked for in IDLE_DROP_SECS is dropped instead of
+# refreshed. Builds run on one daemon thread, on the background lane.
+#
+# Usage:
+#   mixes = get_mix_store()
+#   batch = mixes.draw(sp, language, weights, INITIAL_BATCH, seen_uris, user_key)
+#   if batch is None:
+#       batch = build_batch_fast(...)    # and the store materializes it if popular
+#   mixes.stats()                         # hit rate, per-mix age and size
+
+import os, time, random, threading
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional, Tuple
+
+from spotify_scheduler import lane_client
+from mood_mixer import build_batch_fast, proportional_split, INITIAL_BATCH
+
+MIX_SIZE = int(os.getenv("MOOD_MIX_SIZE", str(3 * INITIAL_BATCH)))
+REFRESH_SECS = float(os.getenv("MOOD_MIX_REFRESH_SECS", "600"))
+MATERIALIZE_AFTER = int(os.getenv("MOOD_MIX_AFTER", "2"))   # requests before a combination is kept
+MAX_MIXES = int(os.getenv("MOOD_MIX_MAX", "16"))
+IDLE_DROP_SECS = 3600.0
+MAX_TRACKED = 256           # request counters kept for combinations not materialized (yet)
+SERVED_MEMORY = 500         # URIs per user remembered for the per-user filter
+CHECK_SECS = 30.0
+
+MixKey = Tuple[str, Tuple[Tuple[str, int], ...]]
+
+def mix_key(language: str, weights: Dict[str, int]) -> MixKey:
+    return language, tuple(sorted((k, int(w)) for k, w in weights.items() if w > 0))
+
+class Mix:
+    __slots__ = ("key", "tracks", "built_at", "used_at", "hits", "building", "stale")
+
+    def __init__(self, key: MixKey):
+        self.key = key
+        self.tracks: List[dict] = []    # replaced on refresh, never mutated
+        self.built_at = 0.0
+        self.used_at = time.time()
+        self.hits = 0
+        self.building = False
+        self.stale = False      # a draw ran short: rebuild before the refresh is due
+
+class MixStore:
+    def __init__(self, mix_size: int = MIX_SIZE, refresh_secs: float = REFRESH_SECS,
+                 materialize_after: int = MATERIALIZE_AFTER, max_mixes: int = MAX_MIXES):
+        self.mix_size = mix_size
+        self.refresh_secs = refresh_secs
+        self.materialize_after = max(1, materialize_after)
+        self.max_mixes = max(1, max_mixes)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._mixes: Dict[MixKey, Mix] = {}
+        self._requests: "OrderedDict[MixKey, int]" = OrderedDict()
+        self._served: Dict[str, deque] = {}
+        self._sp = None
+        self._thread: Optional[threading.Thread] = None
+        self.metrics: Dict[str, int] = {"hits": 0, "misses": 0, "short": 0,
+                                        "builds": 0, "refreshes": 0, "errors": 0, "dropped": 0}
+
+    # ---------- serving ----------
+    def draw(self, sp, language: str, weights: Dict[str, int], count: int,
+             seen_uris=(), user_key: str = "default") -> Optional[List[dict]]:
+        """count tracks from the materialized mix, or None if there is none (or it is
+        too thin after filtering). Counts the request towards materializing the mix."""
+        key = mix_key(language, weights)
+        with self._lock:
+            self._sp = sp
+            mix = self._mixes.get(key)
+            if mix is None:
+                self._note_request(key)
+                self.metrics["misses"] += 1
+                return None
+            mix.used_at = time.time()
+            tracks = mix.tracks
+            served = self._served.setdefault(user_key, deque(maxlen=SERVED_MEMORY))
+            skip = set(seen_uris) | set(served)
+        if not tracks:
+            with self._lock:
+                self.metrics["misses"] += 1   # still building
+            return None
+
+        by_mood: Dict[str, List[dict]] = {}
+        for tr in tracks:
+            if tr["uri"] not in skip:
+                by_mood.setdefault(tr.get("mood_key"), []).append(tr)
+        out: List[dict] = []
+        for mood_key, n in proportional_split(count, weights).items():
+            pool = by_mood.get(mood_key, [])
+            if n > len(pool):
+                with self._lock:
+                    self.metrics["short"] += 1
+                    mix.stale = True
+                self._wake.set()
+                return None
+            out.extend(dict(tr) for tr in random.sample(pool, n))
+        random.shuffle(out)
+        with self._lock:
+            mix.hits += 1
+            self.metrics["hits"] += 1
+            served.extend(tr["uri"] for tr in out)
+        return out
+
+    def materialize(self, sp, language: str, weights: Dict[str, int]):
+        """Keep a mix for this combination regardless of how often it was asked for."""
+        with self._lock:
+            self._sp = sp
+            self._add(mix_key(language, weights))
+
+    def _note_request(self, key: MixKey):
+        n = self._requests.pop(key, 0) + 1
+        if n >= self.materialize_after:
+            self._add(key)
+            return
+        self._requests[key] = n
+        while len(self._requests) > MAX_TRACKED:
+            self._requests.popitem(last=False)
+
+    def _add(self, key: MixKey):
+        if key in self._mixes:
+            return
+        if len(self._mixes) >= self.max_mixes:
+            # make room: the least recently used mix goes
+            oldest = min(self._mixes.values(), key=lambda m: m.used_at)
+            del self._mixes[oldest.key]
+            self.metrics["dropped"] += 1
+        self._mixes[key] = Mix(key)
+        self._requests.pop(key, None)
+        self._ensure_thread()
+        self._wake.set()
+
+    # ---------- background builds ----------
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="mood-mixes", daemon=True)
+            self._thread.start()
+
+    def _due(self) -> List[Mix]:
+        now = time.time()
+        with self._lock:
+            for key in [k for k, m in self._mixes.items() if now - m.used_at > IDLE_DROP_SECS]:
+                del self._mixes[key]
+                self.metrics["dropped"] += 1
+            due = [m for m in self._mixes.values() if m.stale or now - m.built_at >= self.refresh_secs]
+            # mixes that ran short or were never built go first
+            due.sort(key=lambda m: (not m.stale, m.built_at))
+            return due
+
+    def _run(self):
+        while True:
+            self._wake.wait(CHECK_SECS)
+            self._wake.clear()
+            for mix in self._due():
+                self._build(mix)
+
+    def _build(self, mix: Mix):
+        with self._lock:
+            sp = self._sp
+            if sp is None or mix.building:
+                return
+            mix.building = True
+        language, weights = mix.key[0], dict(mix.key[1])
+        try:
+            tracks = build_batch_fast(lane_client(sp, "background"), language, weights, self.mix_size, set())
+        except Exception as e:
+            print(f"⚠  Mood mix build failed ({language}, {weights}): {e}")
+            with self._lock:
+                self.metrics["errors"] += 1
+                mix.building = False
+                mix.built_at = time.time() - self.refresh_secs + CHECK_SECS   # retry on the next check
+            return
+        with self._lock:
+            self.metrics["refreshes" if mix.tracks else "builds"] += 1
+            mix.tracks = tracks
+            mix.built_at = time.time()
+            mix.building = mix.stale = False
+        print(f"🧺 Mood mix ready: {language} {weights} ({len(tracks)} tracks)")
+
+    def clear(self):
+        with self._lock:
+            self._mixes.clear()
+            self._requests.clear()
+            self._served.clear()
+
+    def stats(self) -> dict:
+        now = time.time()
+        with self._lock:
+            served = self.metrics["hits"] + self.metrics["misses"] + self.metrics["short"]
+            return {**self.metrics,
+                    "hit_rate": round(self.metrics["hits"] / served, 3) if served else None,
+                    "tracked": len(self._requests),
+                    "mixes": [{"language": m.key[0], "weights": dict(m.key[1]), "tracks": len(m.tracks),
+                               "age_secs": round(now - m.built_at, 1) if m.built_at else None,
+                               "hits": m.hits}
+                              for m in self._mixes.values()]}
+
+_STORE: Optional[MixStore] = None
+_STORE_LOCK = threading.Lock()
+
+def get_mix_store() -> MixStore:
+    global _STORE
+    with _STORE_LOCK:
+        if _STORE is None:
+            _STORE = MixStore()
+        return _STORE
@@ -0,0 +1,141 @@
+# next_batch.py
+# Double-buffered top-ups for the engines' watcher loops (mood mixer
+# monitor_and_topup, artgig pump_loop, fina recom _watch_and_append). Each of
+# them used to build its top-up batch only once the trigger fired (N plays /
+# skips, or the queue running low), blocking its loop for the whole build.
+#
+# With a NextBatch the engine reports, on every track change, how many more
+# changes it expects before the trigger fires. From the current track's
+# remaining time and the average track length that gives an ETA; the next
+# batch starts building in the background when the ETA drops below the lead
+# time (LEAD_FACTOR x the average build time seen so far, plus
+# LEAD_MARGIN_SECS). When the trigger fires, take() swaps the prebuilt batch in,
+# waits for a build still in flight, or builds inline if none was started.
+#
+# One build at a time: the engine's own state (seen sets) is only touched by
+# the build thread between plan and take.
+#
+# Usage:
+#   nxt = NextBatch(lambda: build(TOP_UP_BATCH), label="mood mixer")
+#   on a track change:   nxt.plan_from(ev.playback, changes_until_trigger)
+#   when it fires:       batch = nxt.take()
+
+import time, threading, weakref
+from typing import Callable, List, Optional
+
+from spotify_scheduler import set_thread_lane
+
+DEFAULT_TRACK_SECS = 200.0
+DEFAULT_BUILD_SECS = 5.0
+LEAD_FACTOR = 2.0           # start this many average builds ahead of the trigger
+LEAD_MARGIN_SECS = 5.0
+EWMA_ALPHA = 0.3
+
+_BUFFERS = weakref.WeakSet()
+
+class NextBatch:
+    def __init__(self, build: Callable[[], List], label: str = "", lane: str = "background"):
+        self.build = build
+        self.label = label
+        self.lane = lane
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+        self._done = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._batch: Optional[List] = None
+        self._error: Optional[BaseException] = None
+        self.build_secs = DEFAULT_BUILD_SECS
+        self.track_secs = DEFAULT_TRACK_SECS
+        self.metrics = {"prefetched": 0, "swapped": 0, "waited": 0, "inline": 0, "errors": 0}
+        _BUFFERS.add(self)
+
+    @property
+    def lead_secs(self) -> float:
+        return LEAD_FACTOR * self.build_secs + LEAD_MARGIN_SECS
+
+    # ---------- planning ----------
+    def plan_from(self, playback: Optional[dict], changes_until_trigger: int):
+        """Re-plan the prefetch from the current playback (a watcher event's .playback)."""
+        pb = playback or {}
+        item = pb.get("item") or {}
+        duration = (item.get("duration_ms") or 0) / 1000.0
+        if duration:
+            self.track_secs += EWMA_ALPHA * (duration - self.track_secs)
+        remaining = max(0.0, duration - (pb.get("progress_ms") or 0) / 1000.0) if duration else self.track_secs
+        self.plan(remaining + max(0, changes_until_trigger - 1) * self.track_secs)
+
+    def plan(self, eta_secs: float):
+        """The trigger is expected in eta_secs: build in time to have the batch ready by then."""
+        with self._lock:
+            if self._thread is not None:
+                return          # already built or building
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            delay = eta_secs - self.lead_secs
+            if delay > 0:
+                self._timer = threading.Timer(delay, self._start)
+                self._timer.daemon = True
+                self._timer.start()
+                return
+        self._start()
+
+    def _start(self):
+        with self._lock:
+            self._timer = None
+            if self._thread is not None:
+                return
+            self._done.clear()
+            self._batch, self._error = None, None
+            self._thread = threading.Thread(target=self._run, name=f"next-batch-{self.label}", daemon=True)
+            self.metrics["prefetched"] += 1
+            self._thread.start()
+
+    def _run(self):
+        set_thread_lane(self.lane)
+        t0 = time.time()
+        try:
+            self._batch = self.build()
+        except BaseException as e:
+            self._error = e
+        self._note_build(time.time() - t0)
+        self._done.set()
+
+    def _note_build(self, secs: float):
+        self.build_secs += EWMA_ALPHA * (secs - self.build_secs)
+
+    # ---------- swapping ----------
+    def take(self) -> List:
+        """The next batch: prebuilt, awaited, or (nothing planned in time) built now."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            thread = self._thread
+        if thread is None:
+            self.metrics["inline"] += 1
+            t0 = time.time()
+            batch = self.build()
+            self._note_build(time.time() - t0)
+            return batch
+        self.metrics["swapped" if self._done.is_set() else "waited"] += 1
+        self._done.wait()
+        with self._lock:
+            batch, error = self._batch, self._error
+            self._thread, self._batch, self._error = None, None, None
+        if error is not None:
+            self.metrics["errors"] += 1
+            raise error
+        return batch
+
+    def stats(self) -> dict:
+        with self._lock:
+            state = "ready" if self._thread and self._done.is_set() else \
+                    "building" if self._thread else "scheduled" if self._timer else "idle"
+        return {"label": self.label, "state": state, "lead_secs": round(self.lead_secs, 1),
+                "build_secs": round(self.build_secs, 2), "track_secs": round(self.track_secs, 1),
+                **self.metrics}
+
+def buffers_stats() -> List[dict]:
+    """Stats of every live NextBatch (for /api/health)."""
+    return [b.stats() for b in list(_BUFFERS)]
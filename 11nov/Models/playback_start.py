@@ -0,0 +1,188 @@
+# playback_start.py
+# Start a batch of tracks with one or two Spotify calls instead of
+# start_playback(first) + one add_to_queue per remaining track.
+#
+# Modes (SPOTIFY_START_MODE, or per call):
+#   context  a private session playlist is refreshed with the batch and played
+#            as a context; top-ups are appended to it, 100 tracks per call, and
+#            play in order after the batch. Needs playlist-modify-private; a
+#            token without it falls back to queue, and after one 403 the
+#            process stops trying. (default)
+#   uris     one start_playback(uris=batch); the batch becomes the play context.
+#            A URI-list context cannot be extended, so top-ups go through the
+#            queue writer -- and Spotify plays queued tracks before the rest of
+#            the context, so a top-up that arrives early jumps ahead of the
+#            batch's remaining tracks (which still play afterwards).
+#   queue    the old behaviour: start the first track, queue the rest through
+#            the queue writer. Top-ups queue behind the rest, in order.
+#
+# Usage:
+#   started = start_tracks(sp, device_id, uris, label="artist mix")
+#   append_tracks(sp, device_id, more_uris, label="top-up")
+
+import os, threading
+from typing import Dict, List, Optional, Tuple
+
+from spotipy.exceptions import SpotifyException
+
+from queue_writer import get_queue_writer
+from session_events import publish
+from playback_watcher import get_watcher
+
+START_MODES = ("uris", "context", "queue")
+START_MODE = os.getenv("SPOTIFY_START_MODE", "context")
+URIS_PER_START = 100      # larger start_playback bodies are unreliable; the overflow is queued
+PLAYLIST_BATCH = 100      # Spotify's per-request limit for playlist add / replace
+SESSION_PLAYLIST_NAME = os.getenv("SPOTIFY_SESSION_PLAYLIST", "DJ Session (auto)")
+
+def _chunks(seq: List[str], n: int):
+    for i in range(0, len(seq), n):
+        yield seq[i:i + n]
+
+class PlaybackStarter:
+    def __init__(self, user_key: str = "default"):
+        self.user_key = user_key
+        self._lock = threading.Lock()
+        self.playlist_id: Optional[str] = None
+        self.context_ok = True               # False once the token turned out to lack the playlist scope
+        self.mode: Dict[str, str] = {}       # device id -> mode of its last start
+        self.calls_saved = 0
+
+    # ---------- session playlist ----------
+    def _session_playlist(self, sp) -> str:
+        with self._lock:
+            if self.playlist_id:
+                return self.playlist_id
+        # reuse the playlist from an earlier run before creating a new one
+        pid = None
+        for pl in (sp.current_user_playlists(limit=50).get("items") or []):
+            if pl and pl.get("name") == SESSION_PLAYLIST_NAME:
+                pid = pl["id"]
+                break
+        if pid is None:
+            pid = sp.current_user_playlist_create(SESSION_PLAYLIST_NAME, public=False,
+                                                  description="Managed by the DJ engines; rewritten on every start.")["id"]
+            print(f"🆕 Created session playlist '{SESSION_PLAYLIST_NAME}'")
+        with self._lock:
+            self.playlist_id = pid
+        return pid
+
+    def _forget_playlist(self, pid: str):
+        with self._lock:
+            if self.playlist_id == pid:
+                self.playlist_id = None
+
+    def _fill_session_playlist(self, sp, uris: List[str]) -> Tuple[str, int]:
+        """Rewrite the session playlist with `uris`: (playlist id, calls made). A playlist
+        the user deleted or unfollowed (404 / 403) is looked up or created again, once."""
+        chunks = list(_chunks(uris, PLAYLIST_BATCH))
+        for attempt in range(2):
+            pid = self._session_playlist(sp)
+            try:
+                sp.playlist_replace_items(pid, chunks[0])
+                for chunk in chunks[1:]:
+                    sp.playlist_add_items(pid, chunk)
+                return pid, len(chunks)
+            except SpotifyException as e:
+                if attempt or e.http_status not in (403, 404):
+                    raise
+                print(f"⚠️ Session playlist {pid} is gone ({e.http_status}); creating it again")
+                self._forget_playlist(pid)
+
+    # ---------- start / append ----------
+    def start(self, sp, device_id: str, uris: List[str], mode: Optional[str] = None,
+              label: str = "") -> dict:
+        """Start `uris` on the device. Returns {"mode", "context_uri", "queue_job"}."""
+        mode = mode or START_MODE
+        if mode not in START_MODES:
+            mode = "context"
+        if mode == "context" and not self.context_ok:
+            mode = "queue"
+        writer = get_queue_writer(self.user_key)
+        writer.cancel_device(device_id)   # a new start supersedes queueing still in flight
+        out = {"mode": mode, "context_uri": None, "queue_job": None}
+        if not uris:
+            return out
+
+        if mode == "context":
+            try:
+                pid, calls = self._fill_session_playlist(sp, uris)
+                out["context_uri"] = f"spotify:playlist:{pid}"
+                sp.start_playback(device_id=device_id, context_uri=out["context_uri"], offset={"position": 0})
+                self.calls_saved += max(0, len(uris) - 1 - calls)
+            except SpotifyException as e:
+                # queue, not uris: top-ups must still play after the batch
+                print(f"⚠️ Session playlist unavailable ({e.http_status}); queueing the batch instead")
+                if e.http_status == 403:
+                    self.context_ok = False     # token without playlist-modify-private
+                mode = out["mode"] = "queue"
+                out["context_uri"] = None
+
+        if mode == "uris":
+            sp.start_playback(device_id=device_id, uris=uris[:URIS_PER_START])
+            rest = uris[URIS_PER_START:]
+            self.calls_saved += min(len(uris), URIS_PER_START) - 1
+        elif mode == "queue":
+            sp.start_playback(device_id=device_id, uris=uris[:1])
+            rest = uris[1:]
+        else:
+            rest = []
+
+        if rest:
+            out["queue_job"] = writer.submit(sp, device_id, rest, label=label)
+        with self._lock:
+            self.mode[device_id] = mode
+        watcher = get_watcher(user_key=self.user_key)
+        if watcher:
+            watcher.poke()    # the track changed: let subscribers hear about it without waiting for a heartbeat
+        publish("playback", "started", user_key=self.user_key, label=label, mode=mode, tracks=len(uris),
+                queue_job=out["queue_job"].id if out["queue_job"] else None)
+        return out
+
+    def append(self, sp, device_id: str, uris: List[str], label: str = "") -> dict:
+        """Top-up: extend the session playlist if that is what is playing, else queue
+        (after a uris-mode start, ahead of what is left of the started batch)."""
+        out = {"mode": "queue", "queue_job": None}
+        if not uris:
+            return out
+        with self._lock:
+            pid = self.playlist_id if self.mode.get(device_id) == "context" else None
+        if pid:
+            try:
+                for chunk in _chunks(uris, PLAYLIST_BATCH):
+                    sp.playlist_add_items(pid, chunk)
+                self.calls_saved += len(uris) - len(list(_chunks(uris, PLAYLIST_BATCH)))
+                out["mode"] = "context"
+                return out
+            except SpotifyException as e:
+                print(f"⚠️ Could not extend session playlist ({e.http_status}); queueing instead")
+                if e.http_status in (403, 404):
+                    # gone: the next start makes a new one; until then this device's top-ups queue
+                    self._forget_playlist(pid)
+                    with self._lock:
+                        self.mode[device_id] = "queue"
+        out["queue_job"] = get_queue_writer(self.user_key).submit(sp, device_id, uris, label=label)
+        return out
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"default_mode": START_MODE, "context_ok": self.context_ok, "session_playlist": self.playlist_id,
+                    "devices": dict(self.mode), "calls_saved": self.calls_saved}
+
+_STARTERS: Dict[str, PlaybackStarter] = {}
+_STARTERS_LOCK = threading.Lock()
+
+def get_starter(user_key: str = "default") -> PlaybackStarter:
+    with _STARTERS_LOCK:
+        starter = _STARTERS.get(user_key)
+        if starter is None:
+            starter = _STARTERS[user_key] = PlaybackStarter(user_key)
+        return starter
+
+def start_tracks(sp, device_id: str, uris: List[str], mode: Optional[str] = None,
+                 label: str = "", user_key: str = "default") -> dict:
+    return get_starter(user_key).start(sp, device_id, uris, mode=mode, label=label)
+
+def append_tracks(sp, device_id: str, uris: List[str], label: str = "",
+                  user_key: str = "default") -> dict:
+    return get_starter(user_key).append(sp, device_id, uris, label=label)
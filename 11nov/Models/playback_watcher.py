@@ -0,0 +1,309 @@
+# playback_watcher.py
+# One playback poller per user. Engines (artgig pump, mood mixer top-ups,
+# fina recom watcher) and backend endpoints subscribe to it instead of each
+# polling current_playback / queue on their own loop.
+#
+# Events (PlaybackEvent.type):
+#   track_changed   a new track started after the previous one ran to (near) its end
+#   skipped         the track changed early, or the same track jumped back (restart / previous)
+#   paused, resumed
+#   stopped         nothing is playing any more
+#   queue_low       the queue is at or below a subscriber's queue_low (only polled
+#                   when someone asked for it: after track changes and every QUEUE_RECHECK_SECS)
+#
+# Readers that only need the current state call current(max_age); a fresh
+# enough snapshot is returned with progress_ms advanced locally, so repeated
+# /api/spotify/current hits share one upstream poll.
+#
+# How often to poll is up to a PollPolicy (poll_policy.py): sleep until just
+# before the expected track end, poll quickly across the boundary and after
+# poke(), slow heartbeat otherwise.
+#
+# The poll thread starts on the first subscriber / reader and exits after
+# STOP_AFTER_SECS with neither.
+#
+# Usage:
+#   watcher = get_watcher(sp)
+#   with watcher.subscribe(types=("track_changed", "skipped")) as sub:
+#       while True:
+#           ev = sub.get()
+#   watcher.poke()        # after a local next/previous/seek: poll again soon
+
+import time, queue, threading
+from typing import Dict, Iterable, List, Optional
+
+from spotify_scheduler import lane_client
+from poll_policy import PollPolicy
+
+POKE_DELAY_SECS = 0.4       # after a local command, give Spotify a moment before re-polling
+ERROR_BACKOFF_SECS = 5.0
+QUEUE_RECHECK_SECS = 30.0   # queue_low subscribers: re-read the queue at least this often
+STOP_AFTER_SECS = 120.0     # idle thread (no subscribers, no readers) exits
+SKIP_MARGIN_MS = 5000       # a change earlier than this before the end counts as a skip
+SUBSCRIBER_BUFFER = 100
+
+EVENT_TYPES = ("track_changed", "skipped", "paused", "resumed", "stopped", "queue_low")
+
+def _item_id(pb: Optional[dict]) -> Optional[str]:
+    return ((pb or {}).get("item") or {}).get("id")
+
+class PlaybackEvent:
+    __slots__ = ("type", "at", "item", "previous", "playback", "queue_length")
+
+    def __init__(self, type: str, item: Optional[dict] = None, previous: Optional[dict] = None,
+                 playback: Optional[dict] = None, queue_length: Optional[int] = None):
+        self.type = type
+        self.at = time.time()
+        self.item = item
+        self.previous = previous
+        self.playback = playback
+        self.queue_length = queue_length
+
+    def to_dict(self) -> dict:
+        brief = lambda t: {"id": t.get("id"), "uri": t.get("uri"), "name": t.get("name"),
+                           "artists": [a.get("name") for a in t.get("artists") or []]} if t else None
+        return {"type": self.type, "at": self.at, "item": brief(self.item),
+                "previous": brief(self.previous), "queue_length": self.queue_length,
+                "is_playing": bool((self.playback or {}).get("is_playing"))}
+
+class Subscription:
+    def __init__(self, watcher: "PlaybackWatcher", types: Optional[Iterable[str]], queue_low: Optional[int]):
+        self.watcher = watcher
+        self.types = set(types) if types else None
+        self.queue_low = queue_low
+        self.dropped = 0
+        self._q: "queue.Queue[PlaybackEvent]" = queue.Queue(maxsize=SUBSCRIBER_BUFFER)
+
+    def wants(self, ev: PlaybackEvent) -> bool:
+        if self.types is not None and ev.type not in self.types:
+            return False
+        if ev.type == "queue_low":
+            return self.queue_low is not None and ev.queue_length <= self.queue_low
+        return True
+
+    def _push(self, ev: PlaybackEvent):
+        # a slow consumer loses its oldest events, never blocks the poller
+        while True:
+            try:
+                self._q.put_nowait(ev)
+                return
+            except queue.Full:
+                try:
+                    self._q.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout: Optional[float] = None) -> Optional[PlaybackEvent]:
+        try:
+            return self._q.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.watcher.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class PlaybackWatcher:
+    def __init__(self, sp, user_key: str = "default"):
+        self.user_key = user_key
+        self.sp = lane_client(sp, "ui")
+        self.policy = PollPolicy()
+        self._lock = threading.Lock()
+        self._poll_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._subs: List[Subscription] = []
+        self._thread: Optional[threading.Thread] = None
+        self.playback: Optional[dict] = None
+        self.fetched_at = 0.0
+        self.queue_checked_at = 0.0
+        self.last_read = 0.0
+        self._poke_at: Optional[float] = None
+        self.polls = 0
+        self.queue_polls = 0
+        self.errors = 0
+        self.events: Dict[str, int] = {t: 0 for t in EVENT_TYPES}
+
+    # ---------- consumers ----------
+    def subscribe(self, types: Optional[Iterable[str]] = None, queue_low: Optional[int] = None) -> Subscription:
+        sub = Subscription(self, types, queue_low)
+        with self._lock:
+            self._subs.append(sub)
+        self._ensure_thread()
+        if queue_low is not None:
+            self.queue_checked_at = 0.0    # check the queue on the next poll
+            self._wake.set()
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            if sub in self._subs:
+                self._subs.remove(sub)
+
+    def current(self, max_age: float = 1.0) -> Optional[dict]:
+        """Latest playback (None if nothing is playing); polls only if older than max_age."""
+        self.last_read = time.time()
+        self._ensure_thread()
+        if time.time() - self.fetched_at > max_age:
+            self.poll_now()
+        return self._extrapolated()
+
+    def poke(self, delay: float = POKE_DELAY_SECS):
+        """A local command may have changed the track: poll again after `delay`."""
+        self.policy.note_command()
+        self._poke_at = time.time() + delay
+        self._wake.set()
+
+    def note_volume(self, volume_percent: int):
+        """A volume command succeeded: keep the snapshot's device volume in step until the next poll."""
+        with self._poll_lock:
+            pb = self.playback
+            if pb and pb.get("device"):
+                self.playback = {**pb, "device": {**pb["device"], "volume_percent": volume_percent}}
+
+    def _extrapolated(self) -> Optional[dict]:
+        pb = self.playback
+        if not pb:
+            return None
+        pb = dict(pb)
+        if pb.get("is_playing") and pb.get("item"):
+            elapsed_ms = int((time.time() - self.fetched_at) * 1000)
+            pb["progress_ms"] = min((pb.get("progress_ms") or 0) + elapsed_ms,
+                                    pb["item"].get("duration_ms") or 0)
+        return pb
+
+    # ---------- polling ----------
+    def poll_now(self) -> Optional[dict]:
+        with self._poll_lock:
+            if time.time() - self.fetched_at < 0.2:
+                return self.playback     # a concurrent caller just polled
+            pb = self.sp.current_playback()
+            self.polls += 1
+            self._update(pb, time.time())
+            return pb
+
+    def _update(self, pb: Optional[dict], now: float):
+        prev, prev_at = self.playback, self.fetched_at
+        self.playback, self.fetched_at = pb, now
+        events: List[PlaybackEvent] = []
+        prev_item, item = (prev or {}).get("item"), (pb or {}).get("item")
+
+        if prev_at and prev_item:
+            if not item:
+                events.append(PlaybackEvent("stopped", None, prev_item, pb))
+            else:
+                # where the previous track would be by now if it had kept playing
+                expected = (prev.get("progress_ms") or 0) + (
+                    int((now - prev_at) * 1000) if prev.get("is_playing") else 0)
+                if item.get("id") != prev_item.get("id"):
+                    early = expected < (prev_item.get("duration_ms") or 0) - SKIP_MARGIN_MS
+                    events.append(PlaybackEvent("skipped" if early else "track_changed", item, prev_item, pb))
+                elif (pb.get("progress_ms") or 0) + SKIP_MARGIN_MS < min(expected, prev.get("progress_ms") or 0):
+                    events.append(PlaybackEvent("skipped", item, prev_item, pb))    # restarted / previous
+                if prev.get("is_playing") and not pb.get("is_playing"):
+                    events.append(PlaybackEvent("paused", item, prev_item, pb))
+                elif not prev.get("is_playing") and pb.get("is_playing"):
+                    events.append(PlaybackEvent("resumed", item, prev_item, pb))
+        elif prev_at and item:
+            events.append(PlaybackEvent("track_changed", item, None, pb))
+
+        changed = any(ev.type in ("track_changed", "skipped") for ev in events)
+        threshold = self._queue_threshold()
+        if item and threshold is not None and (changed or now - self.queue_checked_at >= QUEUE_RECHECK_SECS):
+            try:
+                length = len((self.sp.queue() or {}).get("queue") or [])
+                self.queue_polls += 1
+                self.queue_checked_at = now
+                if length <= threshold:
+                    events.append(PlaybackEvent("queue_low", item, None, pb, queue_length=length))
+            except Exception as e:
+                print(f"⚠️ Playback watcher: queue read failed: {e}")
+        for ev in events:
+            self._publish(ev)
+
+    def _queue_threshold(self) -> Optional[int]:
+        with self._lock:
+            marks = [s.queue_low for s in self._subs if s.queue_low is not None]
+        return max(marks) if marks else None
+
+    def _publish(self, ev: PlaybackEvent):
+        self.events[ev.type] = self.events.get(ev.type, 0) + 1
+        with self._lock:
+            subs = list(self._subs)
+        for sub in subs:
+            if sub.wants(ev):
+                sub._push(ev)
+
+    def _interval(self) -> float:
+        return self.policy.next_delay(self.playback, self.fetched_at)
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=f"playback-watcher-{self.user_key}",
+                                                daemon=True)
+                self._thread.start()
+
+    def _idle(self) -> bool:
+        with self._lock:
+            return not self._subs and time.time() - self.last_read > STOP_AFTER_SECS
+
+    def _run(self):
+        while True:
+            if self._idle():
+                with self._lock:
+                    if not self._subs:      # re-check under the lock before giving up
+                        self._thread = None
+                        return
+            try:
+                self.poll_now()
+                delay = self._interval()
+            except Exception as e:
+                self.errors += 1
+                print(f"⚠️ Playback watcher poll failed: {e}")
+                delay = ERROR_BACKOFF_SECS
+            self._sleep(delay)
+
+    def _sleep(self, delay: float):
+        deadline = time.time() + delay
+        while True:
+            poke_at = self._poke_at
+            if poke_at is not None:
+                self._poke_at = None
+                deadline = min(deadline, poke_at)
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return
+            self._wake.wait(remaining)
+            self._wake.clear()
+            if self._poke_at is None and time.time() < deadline:
+                # woken by a new subscriber: poll right away
+                return
+
+    def stats(self) -> dict:
+        with self._lock:
+            subscribers = len(self._subs)
+            running = self._thread is not None and self._thread.is_alive()
+        return {"running": running, "subscribers": subscribers, "polls": self.polls,
+                "queue_polls": self.queue_polls, "errors": self.errors, "events": dict(self.events),
+                "age_secs": round(time.time() - self.fetched_at, 1) if self.fetched_at else None,
+                "policy": self.policy.stats()}
+
+_WATCHERS: Dict[str, PlaybackWatcher] = {}
+_WATCHERS_LOCK = threading.Lock()
+
+def get_watcher(sp=None, user_key: str = "default") -> Optional[PlaybackWatcher]:
+    """Per-user watcher; the first call for a user must pass a Spotify client.
+    Later calls that pass one swap it in, so the watcher follows token refreshes."""
+    with _WATCHERS_LOCK:
+        watcher = _WATCHERS.get(user_key)
+        if watcher is None and sp is not None:
+            watcher = _WATCHERS[user_key] = PlaybackWatcher(sp, user_key)
+        elif watcher is not None and sp is not None:
+            watcher.sp = lane_client(sp, "ui")
+        return watcher
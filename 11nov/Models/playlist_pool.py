@@ -0,0 +1,186 @@
+# playlist_pool.py
+# Process-wide cache of parsed playlist track rows, keyed by playlist id and
+# validated against the playlist's snapshot_id. The mood mixer reads the same
+# multi-page playlists for the seed, the rest of the first batch and every
+# top-up; with the pool, a repeat read costs at most one
+# playlists/{id}?fields=name,snapshot_id request, and none at all within
+# VALIDATE_AFTER_SECS of the last check. Pages are only fetched again when the
+# snapshot changed.
+#
+# Pools are shared by every session and user in the process (playlist contents
+# do not depend on who reads them). Rows are returned as a fresh, shuffled
+# list; callers must copy a row before changing it.
+#
+# Entries are filled page by page (PAGE_SIZE tracks at an offset): a build
+# loads a few random pages of a large playlist and only asks for more when its
+# quota needs them, so most builds never read a whole playlist. `total` comes
+# with the snapshot check (META_FIELDS), which tells the caller which offsets
+# exist before any page is read. A playlist the pool has no rows for yet is
+# checked with its first page embedded (playlists/{id} returns it under
+# `tracks`), so name, snapshot_id, total and page 0 cost one request.
+#
+# Entries carry the playlist's display name too; nothing needs a separate
+# name lookup. A playlist whose check came back 404 / 403 with nothing cached
+# is remembered as missing for NEGATIVE_SECS (lookup() says fresh, no entry)
+# instead of being retried on every build; transient failures (timeouts, 429,
+# 5xx) are not remembered.
+#
+# The pool stores rows, it does not fetch them: the caller (mood_mixer) does
+# lookup() -> snapshot check -> confirm() or store() -> add_pages(), on the
+# blocking or the async client. Snapshot checks and page reads should bypass
+# the response cache (spotify_scheduler.uncached_client), which would
+# otherwise answer them from a copy up to an hour old. Entries that are
+# replaced, evicted or cleared are passed to on_drop() listeners, so the mood
+# index can free the bins it built from them.
+#
+# Usage:
+#   pool = get_playlist_pool()
+#   entry, fresh = pool.lookup(pid)          # (None, True): known missing, skip it
+#   if not fresh:
+#       if entry and snapshot == entry.snapshot_id: pool.confirm(pid)
+#       else: entry = pool.store(pid, snapshot, name, total)
+#       (check 404 / 403, nothing cached: pool.fail(pid))
+#   pool.add_pages(entry, {offset: rows for offset in random.sample(entry.missing(), 2)})
+
+import os, time, threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+VALIDATE_AFTER_SECS = float(os.getenv("PLAYLIST_POOL_VALIDATE_SECS", "60"))
+MAX_PLAYLISTS = int(os.getenv("PLAYLIST_POOL_MAX", "256"))
+NEGATIVE_SECS = float(os.getenv("PLAYLIST_POOL_NEGATIVE_SECS", "120"))
+META_FIELDS = "name,snapshot_id,tracks.total"
+PAGE_SIZE = 100
+
+class PoolEntry:
+    __slots__ = ("snapshot_id", "name", "total", "pages", "checked_at")
+
+    def __init__(self, snapshot_id: Optional[str], name: str, total: int,
+                 pages: Optional[Dict[int, List[dict]]] = None):
+        self.snapshot_id = snapshot_id
+        self.name = name
+        self.total = total
+        # offset -> rows; replaced, never mutated, so readers can hold a reference
+        self.pages: Dict[int, List[dict]] = dict(pages or {})
+        self.checked_at = time.time()
+
+    def missing(self) -> List[int]:
+        """Offsets of the pages not loaded yet."""
+        pages = self.pages
+        return [off for off in range(0, self.total, PAGE_SIZE) if off not in pages]
+
+    @property
+    def complete(self) -> bool:
+        return not self.missing()
+
+class PlaylistPoolCache:
+    def __init__(self, max_playlists: int = MAX_PLAYLISTS, validate_after: float = VALIDATE_AFTER_SECS,
+                 negative_secs: float = NEGATIVE_SECS):
+        self.max_playlists = max(1, max_playlists)
+        self.validate_after = validate_after
+        self.negative_secs = negative_secs
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, PoolEntry]" = OrderedDict()
+        self._missing: "OrderedDict[str, float]" = OrderedDict()   # pid -> failed at
+        self._listeners: List[Callable[[PoolEntry], None]] = []
+        self.metrics: Dict[str, int] = {"hits": 0, "validated": 0, "changed": 0, "misses": 0, "pages_loaded": 0,
+                                        "failures": 0, "negative_hits": 0}
+
+    def lookup(self, pid: str) -> Tuple[Optional[PoolEntry], bool]:
+        """(entry, fresh). fresh means it was checked recently enough to use without
+        a snapshot check; which pages it holds is up to the caller to check.
+        (None, True) is a playlist whose check failed less than negative_secs ago."""
+        with self._lock:
+            entry = self._entries.get(pid)
+            if entry is None:
+                failed_at = self._missing.get(pid)
+                if failed_at is not None and time.time() - failed_at < self.negative_secs:
+                    self.metrics["negative_hits"] += 1
+                    return None, True
+                self.metrics["misses"] += 1
+                return None, False
+            self._entries.move_to_end(pid)
+            fresh = time.time() - entry.checked_at < self.validate_after
+            if fresh:
+                self.metrics["hits"] += 1
+            return entry, fresh
+
+    def confirm(self, pid: str):
+        """The snapshot check matched: the cached rows are current."""
+        with self._lock:
+            entry = self._entries.get(pid)
+            if entry is not None:
+                entry.checked_at = time.time()
+                self.metrics["validated"] += 1
+
+    def fail(self, pid: str):
+        """The playlist is gone or private (404 / 403) and nothing is cached: treat it as missing for a while."""
+        with self._lock:
+            self.metrics["failures"] += 1
+            self._missing.pop(pid, None)
+            self._missing[pid] = time.time()
+            while len(self._missing) > self.max_playlists:
+                self._missing.popitem(last=False)
+
+    def holds(self, entry: PoolEntry) -> bool:
+        """Whether `entry` is still pooled (not replaced or evicted)."""
+        with self._lock:
+            return any(e is entry for e in self._entries.values())
+
+    def on_drop(self, fn: Callable[[PoolEntry], None]):
+        """Call fn(entry) whenever an entry is replaced, evicted or cleared (e.g. to free
+        what was derived from it)."""
+        with self._lock:
+            self._listeners.append(fn)
+
+    def _dropped(self, entries: List[PoolEntry]):
+        for entry in entries:
+            for fn in self._listeners:
+                fn(entry)
+
+    def store(self, pid: str, snapshot_id: Optional[str], name: str, total: int) -> PoolEntry:
+        """A new (or changed) playlist: an entry with no pages loaded yet."""
+        entry = PoolEntry(snapshot_id, name, total)
+        with self._lock:
+            self._missing.pop(pid, None)
+            old = self._entries.get(pid)
+            if old is not None and old.snapshot_id != snapshot_id:
+                self.metrics["changed"] += 1
+            dropped = [old] if old is not None else []
+            self._entries[pid] = entry
+            self._entries.move_to_end(pid)
+            while len(self._entries) > self.max_playlists:
+                dropped.append(self._entries.popitem(last=False)[1])
+        self._dropped(dropped)
+        return entry
+
+    def add_pages(self, entry: PoolEntry, pages: Dict[int, List[dict]]):
+        if not pages:
+            return
+        with self._lock:
+            entry.pages = {**entry.pages, **pages}
+            self.metrics["pages_loaded"] += len(pages)
+
+    def clear(self):
+        with self._lock:
+            dropped = list(self._entries.values())
+            self._entries.clear()
+            self._missing.clear()
+        self._dropped(dropped)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"playlists": len(self._entries), "missing": len(self._missing),
+                    "pages": sum(len(e.pages) for e in self._entries.values()),
+                    "tracks": sum(len(rows) for e in self._entries.values() for rows in e.pages.values()),
+                    **self.metrics}
+
+_POOL: Optional[PlaylistPoolCache] = None
+_POOL_LOCK = threading.Lock()
+
+def get_playlist_pool() -> PlaylistPoolCache:
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = PlaylistPoolCache()
+        return _POOL
@@ -0,0 +1,74 @@
+# poll_policy.py
+# When to poll current_playback next. The playback already tells us progress_ms
+# and duration_ms, so instead of a fixed 2 s tick the poller sleeps until just
+# before the expected track end, polls quickly across the boundary, and
+# otherwise only sends a slow heartbeat (to notice pauses / skips made from
+# another Spotify app).
+#
+#   after a local command   poll every COMMAND_POLL_SECS for COMMAND_WINDOW_SECS
+#   playing                 sleep until END_LEAD_SECS before the expected end,
+#                           capped at HEARTBEAT_SECS
+#   at / past the end       poll every BOUNDARY_POLL_SECS until the track changes
+#   paused / nothing        IDLE_HEARTBEAT_SECS
+#
+# A 3-4 minute track costs ~15 polls instead of ~100 at a fixed 2 s.
+#
+# Usage:
+#   policy = PollPolicy()
+#   delay = policy.next_delay(playback, fetched_at)
+#   policy.note_command()          # after next / previous / seek / play
+#   policy.stats()
+
+import os, time
+from typing import Dict, Optional
+
+HEARTBEAT_SECS = float(os.getenv("SPOTIFY_POLL_HEARTBEAT", "15"))
+IDLE_HEARTBEAT_SECS = 30.0
+END_LEAD_SECS = 0.5         # wake this long before the expected end
+BOUNDARY_POLL_SECS = 1.0    # then poll at this rate until the next track shows up
+COMMAND_POLL_SECS = 1.0
+COMMAND_WINDOW_SECS = 4.0   # a local command may take a moment to show in current_playback
+MIN_DELAY_SECS = 0.25
+
+class PollPolicy:
+    def __init__(self, heartbeat: float = HEARTBEAT_SECS, idle_heartbeat: float = IDLE_HEARTBEAT_SECS):
+        self.heartbeat = heartbeat
+        self.idle_heartbeat = idle_heartbeat
+        self.command_at = 0.0
+        self.reasons: Dict[str, int] = {"command": 0, "track_end": 0, "boundary": 0,
+                                        "heartbeat": 0, "idle": 0}
+
+    def note_command(self, now: Optional[float] = None):
+        """A local control command may have changed the track or play state."""
+        self.command_at = now or time.time()
+
+    def remaining_ms(self, playback: Optional[dict], fetched_at: float, now: Optional[float] = None) -> Optional[int]:
+        """Expected time left in the current track, None if nothing is playing."""
+        pb = playback or {}
+        item = pb.get("item")
+        if not pb.get("is_playing") or not item or not item.get("duration_ms"):
+            return None
+        elapsed_ms = ((now or time.time()) - fetched_at) * 1000
+        return int(item["duration_ms"] - (pb.get("progress_ms") or 0) - elapsed_ms)
+
+    def next_delay(self, playback: Optional[dict], fetched_at: float, now: Optional[float] = None) -> float:
+        now = now or time.time()
+        if now - self.command_at < COMMAND_WINDOW_SECS:
+            return self._pick("command", COMMAND_POLL_SECS)
+        remaining_ms = self.remaining_ms(playback, fetched_at, now)
+        if remaining_ms is None:
+            return self._pick("idle", self.idle_heartbeat)
+        until_end = remaining_ms / 1000.0 - END_LEAD_SECS
+        if until_end <= 0:
+            return self._pick("boundary", BOUNDARY_POLL_SECS)
+        if until_end <= self.heartbeat:
+            return self._pick("track_end", max(MIN_DELAY_SECS, until_end))
+        return self._pick("heartbeat", self.heartbeat)
+
+    def _pick(self, reason: str, delay: float) -> float:
+        self.reasons[reason] += 1
+        return delay
+
+    def stats(self) -> dict:
+        return {"heartbeat_secs": self.heartbeat, "idle_heartbeat_secs": self.idle_heartbeat,
+                "delays": dict(self.reasons)}
@@ -0,0 +1,144 @@
+# prewarm.py
+# Background prewarm of the curated catalogs every user reads the same way:
+#
+#   mood mixer   every MOOD_BUCKETS playlist, all pages, into the shared
+#                playlist pool (playlist_pool.py), binned into the mood index
+#   artgig       the random-mode searches for every TAG_PROFILES tag (the same
+#                q / limit / offset / market as search_random), into the
+#                response cache (spotify_cache.py)
+#
+# so the first mood mix or artgig session after a restart reads warm data
+# instead of paying for the whole catalog. Runs once at backend startup and then
+# every PREWARM_EVERY_SECS; a rerun costs one snapshot check per playlist and
+# only the searches whose cached copy expired.
+#
+# Pacing: one request at a time on the background lane (the scheduler keeps
+# interactive calls ahead of it and handles 429s), PREWARM_PACE_SECS apart.
+# A run without a Spotify client (nobody logged in yet) is retried after
+# RETRY_SECS.
+#
+# Usage:
+#   prewarmer = get_prewarmer()
+#   prewarmer.start(lambda: spotify_manager.client("background"))
+#   prewarmer.stats()     # state, done / total, per-catalog counts, last run
+
+import os, time, threading
+from typing import Callable, List, Optional, Tuple
+
+from spotify_scheduler import lane_client
+from spotify_cache import get_cache
+from spotify_async import HAS_ASYNC, AsyncSpotify, run_async
+
+PREWARM_ENABLED = os.getenv("PREWARM", "1") != "0"
+PREWARM_EVERY_SECS = float(os.getenv("PREWARM_EVERY_SECS", "1800"))
+PREWARM_PACE_SECS = float(os.getenv("PREWARM_PACE_SECS", "0.2"))
+RETRY_SECS = 60.0
+
+class Prewarmer:
+    def __init__(self, every: float = PREWARM_EVERY_SECS, pace: float = PREWARM_PACE_SECS):
+        self.every = every
+        self.pace = pace
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.state = "idle"           # idle | running | waiting_for_auth | done
+        self.done = 0
+        self.total = 0
+        self.runs = 0
+        self.last_started: Optional[float] = None
+        self.last_finished: Optional[float] = None
+        self.last_duration: Optional[float] = None
+        self.metrics = {"playlists": 0, "searches": 0, "errors": 0}
+
+    def start(self, client_factory: Callable[[], object]):
+        """Prewarm now and then every `every` seconds, on a daemon thread."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, args=(client_factory,),
+                                            name="prewarm", daemon=True)
+            self._thread.start()
+
+    def _run(self, client_factory):
+        while True:
+            try:
+                sp = client_factory()
+            except Exception:
+                sp = None
+            if sp is None:
+                self.state = "waiting_for_auth"
+                time.sleep(RETRY_SECS)
+                continue
+            self.run_once(lane_client(sp, "background"))
+            time.sleep(self.every)
+
+    def run_once(self, sp):
+        jobs = _jobs()
+        with self._lock:
+            self.state, self.done, self.total = "running", 0, len(jobs)
+            self.last_started = time.time()
+        print(f"🔥 Prewarm: {len(jobs)} catalog reads")
+        for kind, fn in jobs:
+            try:
+                fn(sp)
+                with self._lock:
+                    self.metrics[kind] += 1
+            except Exception as e:
+                print(f"⚠  Prewarm {kind} read failed: {e}")
+                with self._lock:
+                    self.metrics["errors"] += 1
+            with self._lock:
+                self.done += 1
+            time.sleep(self.pace)
+        with self._lock:
+            self.state = "done"
+            self.runs += 1
+            self.last_finished = time.time()
+            self.last_duration = round(self.last_finished - self.last_started, 1)
+        print(f"🔥 Prewarm finished in {self.last_duration}s")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"state": self.state, "done": self.done, "total": self.total, "runs": self.runs,
+                    "every_secs": self.every, "last_duration_secs": self.last_duration,
+                    "last_finished_ago_secs": round(time.time() - self.last_finished, 1) if self.last_finished else None,
+                    **self.metrics}
+
+def _jobs() -> List[Tuple[str, Callable]]:
+    """(metric, fn(sp)) for every catalog read, mood mixer playlists first."""
+    jobs = []
+    try:
+        from mood_mixer import MOOD_BUCKETS, _pooled_entry, _pooled_entry_async, _popularity_tier
+        from mood_index import get_mood_index
+        async def pooled_async(sp, pl):
+            async with AsyncSpotify.from_sync(sp) as asp:
+                return await _pooled_entry_async(asp, pl)
+        def warm_playlist(sp, pl):
+            # the client builds use, so a first build doesn't pay its one-time setup either
+            entry = run_async(pooled_async(sp, pl)) if HAS_ASYNC else _pooled_entry(sp, pl)
+            if entry is not None:
+                get_mood_index().bins(pl, entry, _popularity_tier)   # binned now, not in the first build
+        playlists = dict.fromkeys(pl for by_lang in MOOD_BUCKETS.values() for pls in by_lang.values() for pl in pls)
+        jobs += [("playlists", lambda sp, pl=pl: warm_playlist(sp, pl)) for pl in playlists]
+    except ImportError as e:
+        print(f"Warning: mood mixer catalog not prewarmed: {e}")
+    if get_cache() is None:
+        return jobs   # searches are only kept by the response cache
+    try:
+        from artgig import TAG_PROFILES, MAX_PAGES_RANDOM, MARKET, sp_search_safe
+        tags = dict.fromkeys(t for profile in TAG_PROFILES.values() for t in profile)
+        jobs += [("searches", lambda sp, t=t, page=page: sp_search_safe(sp, q=t, type="track", limit=50,
+                                                                        offset=page*50, market=MARKET))
+                 for t in tags for page in range(MAX_PAGES_RANDOM)]
+    except ImportError as e:
+        print(f"Warning: artgig catalog not prewarmed: {e}")
+    return jobs
+
+_PREWARMER: Optional[Prewarmer] = None
+_PREWARMER_LOCK = threading.Lock()
+
+def get_prewarmer() -> Prewarmer:
+    global _PREWARMER
+    with _PREWARMER_LOCK:
+        if _PREWARMER is None:
+            _PREWARMER = Prewarmer()
+        return _PREWARMER
@@ -0,0 +1,199 @@
+# queue_writer.py
+# Background writer for Spotify queue adds. Play endpoints and engines start
+# the first track themselves, hand the remaining URIs to the writer and return
+# immediately; the writer adds them in order and records progress on a job.
+#
+# - one worker thread per device, jobs for a device run in submission order
+# - adds go through the "background" scheduler lane, so the shared token
+#   bucket paces them and interactive commands keep priority
+# - the scheduler already retries 429 / 5xx / connection errors; a track that
+#   still fails is retried ITEM_RETRIES more times, then recorded and skipped
+# - a device error (device gone) fails the rest of the job
+# - submit(..., replace=True) cancels the device's unfinished jobs, since a
+#   new playback start supersedes what they were queueing
+#
+# Usage:
+#   writer = get_queue_writer()               # per-user writer
+#   job = writer.submit(sp, device_id, uris[1:], label="artist mix")
+#   writer.job(job.id).to_dict()              # progress for a status endpoint
+
+import time, uuid, threading
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Optional
+
+from spotify_scheduler import lane_client
+from device_registry import is_device_error, get_registry
+from session_events import publish
+
+ITEM_RETRIES = 2        # attempts per track on top of the scheduler's own retries
+ITEM_RETRY_SECS = 0.5
+JOB_HISTORY = 200       # finished jobs kept for status lookups
+
+class QueueJob:
+    def __init__(self, sp, device_id: str, uris: List[str], label: str = ""):
+        self.id = uuid.uuid4().hex[:12]
+        self.sp = lane_client(sp, "background")   # the submitter's client: current token
+        self.device_id = device_id
+        self.uris = list(uris)
+        self.label = label
+        self.status = "pending"          # pending -> running -> done | failed | cancelled
+        self.added = 0
+        self.failed: List[dict] = []
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._cancel = threading.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed", "cancelled")
+
+    def cancel(self):
+        self._cancel.set()
+        if self.status == "pending":
+            self._finish("cancelled")
+
+    def _finish(self, status: str, error: Optional[str] = None):
+        self.status = status
+        self.error = error
+        self.finished_at = time.time()
+
+    def to_dict(self) -> dict:
+        total = len(self.uris)
+        done = self.added + len(self.failed)
+        end = self.finished_at or time.time()
+        return {
+            "job_id": self.id,
+            "label": self.label,
+            "device_id": self.device_id,
+            "status": self.status,
+            "total": total,
+            "added": self.added,
+            "failed": len(self.failed),
+            "failures": self.failed[-5:],
+            "progress": round(done / total, 3) if total else 1.0,
+            "error": self.error,
+            "elapsed_secs": round(end - (self.started_at or self.created_at), 2),
+        }
+
+class QueueWriter:
+    def __init__(self, user_key: str = "default"):
+        self.user_key = user_key
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Deque[QueueJob]] = {}
+        self._workers: Dict[str, threading.Thread] = {}
+        self._jobs: "OrderedDict[str, QueueJob]" = OrderedDict()
+        self.tracks_added = 0
+        self.tracks_failed = 0
+
+    def submit(self, sp, device_id: str, uris: List[str], label: str = "",
+               replace: bool = False) -> QueueJob:
+        job = QueueJob(sp, device_id, uris, label)
+        with self._lock:
+            if replace:
+                self._cancel_device_locked(device_id)
+            self._jobs[job.id] = job
+            self._trim_locked()
+            if not job.uris:
+                job._finish("done")
+                return job
+            self._pending.setdefault(device_id, deque()).append(job)
+            worker = self._workers.get(device_id)
+            if worker is None or not worker.is_alive():
+                worker = threading.Thread(target=self._run, args=(device_id,),
+                                          name=f"queue-writer-{device_id[:8]}", daemon=True)
+                self._workers[device_id] = worker
+                worker.start()
+        return job
+
+    def cancel_device(self, device_id: str):
+        with self._lock:
+            self._cancel_device_locked(device_id)
+
+    def _cancel_device_locked(self, device_id: str):
+        for job in self._jobs.values():
+            if job.device_id == device_id and not job.finished:
+                job.cancel()
+        self._pending.pop(device_id, None)
+
+    def _trim_locked(self):
+        while len(self._jobs) > JOB_HISTORY:
+            oldest_id = next(iter(self._jobs))
+            if not self._jobs[oldest_id].finished:
+                break
+            self._jobs.popitem(last=False)
+
+    def job(self, job_id: str) -> Optional[QueueJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self, limit: int = 20) -> List[QueueJob]:
+        with self._lock:
+            return list(self._jobs.values())[-limit:][::-1]
+
+    # ---------- worker ----------
+    def _run(self, device_id: str):
+        while True:
+            with self._lock:
+                queue = self._pending.get(device_id)
+                if not queue:
+                    self._pending.pop(device_id, None)
+                    self._workers.pop(device_id, None)
+                    return
+                job = queue.popleft()
+            if job.finished:
+                continue
+            self._write(job)
+
+    def _write(self, job: QueueJob):
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            self._write_items(job)
+        finally:
+            publish("queue", f"job_{job.status}", user_key=self.user_key, job=job.to_dict())
+
+    def _write_items(self, job: QueueJob):
+        for uri in job.uris:
+            if job._cancel.is_set():
+                job._finish("cancelled")
+                return
+            for attempt in range(ITEM_RETRIES + 1):
+                try:
+                    job.sp.add_to_queue(uri, device_id=job.device_id)
+                    job.added += 1
+                    self.tracks_added += 1
+                    break
+                except Exception as e:
+                    if is_device_error(e):
+                        get_registry(self.user_key).invalidate()
+                        job._finish("failed", f"device unavailable: {e}")
+                        print(f"⚠️ Queue job {job.id} stopped: device {job.device_id} unavailable")
+                        return
+                    if attempt < ITEM_RETRIES:
+                        time.sleep(ITEM_RETRY_SECS * (attempt + 1))
+                        continue
+                    job.failed.append({"uri": uri, "error": str(e)[:200]})
+                    self.tracks_failed += 1
+        job._finish("done")
+        print(f"✅ Queue job {job.id} ({job.label or 'queue'}): {job.added}/{len(job.uris)} added"
+              + (f", {len(job.failed)} failed" if job.failed else ""))
+
+    def stats(self) -> dict:
+        with self._lock:
+            active = [j for j in self._jobs.values() if not j.finished]
+            return {"active_jobs": len(active),
+                    "queued_tracks": sum(len(j.uris) - j.added - len(j.failed) for j in active),
+                    "workers": sum(1 for w in self._workers.values() if w.is_alive()),
+                    "tracks_added": self.tracks_added, "tracks_failed": self.tracks_failed}
+
+_WRITERS: Dict[str, QueueWriter] = {}
+_WRITERS_LOCK = threading.Lock()
+
+def get_queue_writer(user_key: str = "default") -> QueueWriter:
+    with _WRITERS_LOCK:
+        writer = _WRITERS.get(user_key)
+        if writer is None:
+            writer = _WRITERS[user_key] = QueueWriter(user_key)
+        return writer
@@ -0,0 +1,70 @@
+# session_events.py
+# In-process pub/sub for session activity (DJ / artgig / mood mixer / fina recom
+# starts and top-ups, queue jobs), fanned out to the backend's SSE stream.
+# Publishing with no subscribers is a no-op apart from the short history, so
+# engines can publish unconditionally, also when run from the command line.
+#
+# Usage:
+#   publish("mood_mixer", "top_up", added=20)
+#   q = get_session_events().subscribe()      # queue.Queue of event dicts
+#   ...
+#   get_session_events().unsubscribe(q)
+
+import time, queue, threading
+from collections import deque
+from typing import Dict, List
+
+HISTORY = 50              # replayed to new subscribers so a fresh tab sees the session state
+SUBSCRIBER_BUFFER = 100
+
+class SessionEvents:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subs: List["queue.Queue[dict]"] = []
+        self._history: "deque[dict]" = deque(maxlen=HISTORY)
+        self.published = 0
+
+    def publish(self, source: str, kind: str, **data) -> dict:
+        event = {"source": source, "kind": kind, "at": time.time(), **data}
+        with self._lock:
+            self._history.append(event)
+            self.published += 1
+            subs = list(self._subs)
+        for q in subs:
+            try:
+                q.put_nowait(event)
+            except queue.Full:
+                pass            # a stalled stream misses events rather than blocking an engine
+        return event
+
+    def subscribe(self) -> "queue.Queue[dict]":
+        q: "queue.Queue[dict]" = queue.Queue(maxsize=SUBSCRIBER_BUFFER)
+        with self._lock:
+            self._subs.append(q)
+        return q
+
+    def unsubscribe(self, q: "queue.Queue[dict]"):
+        with self._lock:
+            if q in self._subs:
+                self._subs.remove(q)
+
+    def recent(self, n: int = HISTORY) -> List[dict]:
+        with self._lock:
+            return list(self._history)[-n:]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"subscribers": len(self._subs), "published": self.published}
+
+_BUSES: Dict[str, SessionEvents] = {}
+_BUSES_LOCK = threading.Lock()
+
+def get_session_events(user_key: str = "default") -> SessionEvents:
+    with _BUSES_LOCK:
+        bus = _BUSES.get(user_key)
+        if bus is None:
+            bus = _BUSES[user_key] = SessionEvents()
+        return bus
+
+def publish(source: str, kind: str, user_key: str = "default", **data) -> dict:
+    return get_session_events(user_key).publish(source, kind, **data)
@@ -0,0 +1,180 @@
+# spotify_async.py
+# asyncio Spotify client (httpx) for fanning out independent catalog reads —
+# several artists, moods or playlists at once — so a multi-part build takes
+# about as long as its slowest request instead of the sum of all of them.
+#
+# It is built from an existing (Scheduled)Spotify client and shares its
+# auth, API prefix, rate-limit scheduler / lane and response cache, so async
+# and blocking calls draw from one budget and one cache. Inside one
+# `async with` block all requests share a keep-alive connection pool.
+#
+#   async with AsyncSpotify.from_sync(sp) as asp:
+#       results = await gather_bounded([lambda a=a: asp.artist_top_tracks(a) for a in ids])
+#
+#   run_async(coro)  — run a coroutine from blocking code (Flask handlers, engine threads)
+#
+# httpx is optional: HAS_ASYNC is False without it and engines keep their
+# blocking code paths.
+
+import copy, json, asyncio
+from typing import Awaitable, Callable, Dict, List, Optional
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+from requests.exceptions import ReadTimeout, ConnectTimeout, ConnectionError as ReqConnErr
+from spotipy.exceptions import SpotifyException
+
+from spotify_scheduler import get_scheduler, current_lane
+from spotify_cache import get_cache, match_endpoint, cache_key
+
+HAS_ASYNC = httpx is not None
+
+MAX_CONCURRENCY = 8      # in-flight requests per fan-out
+POOL_CONNECTIONS = 10
+REQUEST_TIMEOUT = 10.0
+
+def _id(x: str) -> str:
+    # accepts ids, spotify:<kind>:<id> URIs and open.spotify.com URLs
+    return x.split("?")[0].split(":")[-1].split("/")[-1]
+
+class AsyncSpotify:
+    def __init__(self, auth_headers: Callable[[], Dict[str, str]], prefix: str,
+                 scheduler=None, lane: Optional[str] = None, cache=None,
+                 max_connections: int = POOL_CONNECTIONS, timeout: float = REQUEST_TIMEOUT):
+        if httpx is None:
+            raise RuntimeError("httpx is not installed (pip install httpx)")
+        self.auth_headers = auth_headers
+        self.prefix = prefix
+        self.scheduler = scheduler or get_scheduler()
+        self.lane = lane
+        self.cache = cache
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self._client = None
+
+    @classmethod
+    def from_sync(cls, sp, **kwargs) -> "AsyncSpotify":
+        """Same token source, prefix, scheduler, lane and cache as the blocking client `sp`."""
+        return cls(sp._auth_headers, sp.prefix,
+                   scheduler=getattr(sp, "scheduler", None),
+                   lane=getattr(sp, "lane", None) or current_lane(),
+                   cache=getattr(sp, "cache", get_cache()), **kwargs)
+
+    def uncached(self) -> "AsyncSpotify":
+        """Same client and connection pool with the response cache bypassed."""
+        if self.cache is None:
+            return self
+        clone = copy.copy(self)
+        clone.cache = None
+        return clone
+
+    async def __aenter__(self):
+        limits = httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections)
+        self._client = httpx.AsyncClient(limits=limits, timeout=self.timeout)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._client.aclose()
+        self._client = None
+
+    # ---------- transport ----------
+    async def _send(self, method: str, url: str, params: Optional[dict], payload):
+        headers = dict(self.auth_headers())
+        headers["Content-Type"] = "application/json"
+        try:
+            resp = await self._client.request(method, url, params=params, headers=headers,
+                                              content=json.dumps(payload) if payload is not None else None)
+        except httpx.ConnectTimeout as e:
+            raise ConnectTimeout(str(e)) from e
+        except httpx.TimeoutException as e:
+            raise ReadTimeout(str(e)) from e
+        except httpx.TransportError as e:
+            raise ReqConnErr(str(e)) from e
+        if resp.status_code >= 400:
+            try:
+                err = resp.json().get("error", {})
+                msg = err.get("message", resp.text) if isinstance(err, dict) else str(err)
+                reason = err.get("reason") if isinstance(err, dict) else None
+            except ValueError:
+                msg, reason = resp.text, None
+            raise SpotifyException(resp.status_code, -1, f"{resp.url}:\n {msg}",
+                                   reason=reason, headers=resp.headers)
+        if not resp.content:
+            return None
+        try:
+            return resp.json()
+        except ValueError:
+            return None
+
+    async def _call(self, method: str, path: str, payload=None, **params):
+        if self._client is None:
+            raise RuntimeError("use AsyncSpotify inside 'async with'")
+        params = {k: v for k, v in params.items() if v is not None}
+        url = path if path.startswith("http") else self.prefix + path
+        rel = url[len(self.prefix):] if url.startswith(self.prefix) else url
+        endpoint = match_endpoint(rel) if (method == "GET" and self.cache is not None) else None
+        if endpoint:
+            key = cache_key(rel, params)
+            cached = self.cache.get(endpoint[0], key)
+            if cached is not None:
+                return cached
+        result = await self.scheduler.execute_async(
+            method, lambda: self._send(method, url, params or None, payload),
+            lane=self.lane or current_lane())
+        if endpoint:
+            self.cache.put(endpoint[0], key, result, endpoint[1])
+        return result
+
+    # ---------- endpoints (spotipy-compatible signatures) ----------
+    async def search(self, q, limit=10, offset=0, type="track", market=None):
+        return await self._call("GET", "search", q=q, limit=limit, offset=offset, type=type, market=market)
+
+    async def artist(self, artist_id):
+        return await self._call("GET", "artists/" + _id(artist_id))
+
+    async def artist_top_tracks(self, artist_id, country="US"):
+        return await self._call("GET", f"artists/{_id(artist_id)}/top-tracks", country=country)
+
+    async def artist_albums(self, artist_id, album_type=None, country=None, limit=20, offset=0):
+        return await self._call("GET", f"artists/{_id(artist_id)}/albums",
+                                include_groups=album_type, country=country, limit=limit, offset=offset)
+
+    async def album_tracks(self, album_id, limit=50, offset=0, market=None):
+        return await self._call("GET", f"albums/{_id(album_id)}/tracks",
+                                limit=limit, offset=offset, market=market)
+
+    async def tracks(self, track_ids: List[str], market=None):
+        return await self._call("GET", "tracks", ids=",".join(_id(t) for t in track_ids), market=market)
+
+    async def playlist(self, playlist_id, fields=None, market=None):
+        return await self._call("GET", "playlists/" + _id(playlist_id), fields=fields, market=market)
+
+    async def playlist_items(self, playlist_id, fields=None, limit=100, offset=0, market=None,
+                             additional_types=("track", "episode")):
+        return await self._call("GET", f"playlists/{_id(playlist_id)}/items",
+                                fields=fields, limit=limit, offset=offset, market=market,
+                                additional_types=",".join(additional_types))
+
+    async def next(self, result):
+        return await self._call("GET", result["next"]) if result and result.get("next") else None
+
+    async def add_to_queue(self, uri, device_id=None):
+        return await self._call("POST", "me/player/queue", uri=uri, device_id=device_id)
+
+async def gather_bounded(factories: List[Callable[[], Awaitable]], limit: int = MAX_CONCURRENCY,
+                         return_exceptions: bool = True) -> list:
+    """Run coroutine factories with at most `limit` in flight; results keep input order."""
+    sem = asyncio.Semaphore(max(1, limit))
+
+    async def one(factory):
+        async with sem:
+            return await factory()
+
+    return await asyncio.gather(*(one(f) for f in factories), return_exceptions=return_exceptions)
+
+def run_async(coro):
+    """Run a coroutine to completion from blocking code (its own event loop)."""
+    return asyncio.run(coro)
@@ -0,0 +1,155 @@
+# spotify_cache.py
+# TTL + LRU response cache for Spotify catalog reads, sitting under
+# ScheduledSpotify (spotify_scheduler.py). Only GETs on catalog endpoints are
+# cached; anything under /me (playback, devices, queue, library) always goes
+# to the API.
+#
+# Tiers:
+#   memory   bounded LRU (SPOTIFY_CACHE_MAX_ENTRIES)
+#   sqlite   optional (SPOTIFY_CACHE_DB=path), survives restarts; a disk hit is
+#            promoted into memory
+#
+# Entries are stored as JSON text and decoded on every hit, so callers that
+# shuffle or edit a result (artgig shuffles search items in place) never
+# corrupt the cached copy.
+#
+# Env:
+#   SPOTIFY_CACHE=1                 0 disables caching
+#   SPOTIFY_CACHE_MAX_ENTRIES=5000
+#   SPOTIFY_CACHE_DB=               e.g. .spotify_cache.sqlite3
+
+import os, re, json, time, sqlite3, threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+# (endpoint name, path regex relative to the API prefix, TTL seconds) — first match wins
+CACHE_RULES = [
+    ("genre_seeds",        re.compile(r"^recommendations/available-genre-seeds$"), 7 * DAY),
+    ("search",             re.compile(r"^search$"),                                6 * HOUR),
+    ("artist_top_tracks",  re.compile(r"^artists/[^/]+/top-tracks$"),              DAY),
+    ("artist_albums",      re.compile(r"^artists/[^/]+/albums$"),                  DAY),
+    ("artist",             re.compile(r"^artists(/[^/]+)?$"),                      DAY),
+    ("album_tracks",       re.compile(r"^albums/[^/]+/tracks$"),                   7 * DAY),
+    ("track",              re.compile(r"^tracks(/[^/]+)?$"),                       7 * DAY),
+    ("playlist_items",     re.compile(r"^playlists/[^/]+/(tracks|items)$"),        30 * 60),
+    ("playlist",           re.compile(r"^playlists/[^/]+$"),                       HOUR),
+]
+
+MAX_ENTRIES = int(os.getenv("SPOTIFY_CACHE_MAX_ENTRIES", "5000"))
+PRUNE_EVERY = 500   # disk puts between expired-row sweeps
+
+def match_endpoint(path: str) -> Optional[Tuple[str, int]]:
+    path = path.split("?", 1)[0].strip("/")
+    for name, rx, ttl in CACHE_RULES:
+        if rx.match(path):
+            return name, ttl
+    return None
+
+def cache_key(path: str, params: Optional[dict]) -> str:
+    # next-page URLs carry their query in the path; explicit params are merged in sorted order
+    clean = {k: v for k, v in (params or {}).items() if v is not None}
+    return path + "|" + json.dumps(clean, sort_keys=True, default=str)
+
+class ResponseCache:
+    def __init__(self, max_entries: int = MAX_ENTRIES, db_path: Optional[str] = None):
+        self.max_entries = max(1, max_entries)
+        self._lock = threading.Lock()
+        self._mem: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._db = None
+        self._puts = 0
+        self.metrics: Dict[str, Dict[str, int]] = {}
+        if db_path:
+            try:
+                self._db = sqlite3.connect(db_path, check_same_thread=False)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute("CREATE TABLE IF NOT EXISTS responses ("
+                                 "key TEXT PRIMARY KEY, endpoint TEXT, expires_at REAL, body TEXT)")
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f"⚠️ Spotify cache DB unavailable ({db_path}): {e}")
+                self._db = None
+
+    def _count(self, endpoint: str, key: str):
+        m = self.metrics.setdefault(endpoint, {"hits": 0, "disk_hits": 0, "misses": 0})
+        m[key] += 1
+
+    def get(self, endpoint: str, key: str):
+        now = time.time()
+        with self._lock:
+            hit = self._mem.get(key)
+            if hit and hit[0] > now:
+                self._mem.move_to_end(key)
+                self._count(endpoint, "hits")
+                return json.loads(hit[1])
+            if hit:
+                del self._mem[key]
+            if self._db is not None:
+                row = self._db.execute("SELECT expires_at, body FROM responses WHERE key=?", (key,)).fetchone()
+                if row and row[0] > now:
+                    self._remember(key, row[0], row[1])
+                    self._count(endpoint, "disk_hits")
+                    return json.loads(row[1])
+            self._count(endpoint, "misses")
+        return None
+
+    def _remember(self, key: str, expires_at: float, body: str):
+        self._mem[key] = (expires_at, body)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+
+    def put(self, endpoint: str, key: str, value, ttl: int):
+        if value is None:
+            return
+        body = json.dumps(value, separators=(",", ":"))
+        expires_at = time.time() + ttl
+        with self._lock:
+            self._remember(key, expires_at, body)
+            if self._db is not None:
+                try:
+                    self._db.execute("INSERT OR REPLACE INTO responses VALUES (?,?,?,?)",
+                                     (key, endpoint, expires_at, body))
+                    self._puts += 1
+                    if self._puts % PRUNE_EVERY == 0:
+                        self._db.execute("DELETE FROM responses WHERE expires_at < ?", (time.time(),))
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    print(f"⚠️ Spotify cache write failed: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._mem.clear()
+            self.metrics.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            endpoints = {k: dict(v) for k, v in self.metrics.items()}
+            entries = len(self._mem)
+        hits = sum(m["hits"] + m["disk_hits"] for m in endpoints.values())
+        total = hits + sum(m["misses"] for m in endpoints.values())
+        return {
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "disk": self._db is not None,
+            "hit_rate": round(hits / total, 3) if total else 0.0,
+            "endpoints": endpoints,
+        }
+
+_CACHE: Optional[ResponseCache] = None
+_CACHE_LOCK = threading.Lock()
+
+def get_cache() -> Optional[ResponseCache]:
+    """Process-wide cache, or None when SPOTIFY_CACHE=0."""
+    global _CACHE
+    if os.getenv("SPOTIFY_CACHE", "1") == "0":
+        return None
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = ResponseCache(MAX_ENTRIES, os.getenv("SPOTIFY_CACHE_DB") or None)
+        return _CACHE
@@ -0,0 +1,153 @@
+# spotify_manager.py
+# Process-wide Spotify client manager for the backend.
+#
+# - Reads the OAuth cache file once; afterwards the token lives in memory.
+# - A daemon thread refreshes the token REFRESH_MARGIN_SECS before it expires,
+#   so request handlers never pay for a refresh (or the cache-file read).
+# - Every client shares one keep-alive requests.Session (pooled HTTPS
+#   connections), so TLS is set up once instead of once per route.
+# - Clients are ScheduledSpotify, so every call goes through the shared
+#   rate-limit scheduler (spotify_scheduler.py).
+#
+# Usage:
+#   manager = SpotifyClientManager(oauth)   # oauth = spotipy SpotifyOAuth
+#   manager.start()
+#   sp = manager.client()                   # None if not authenticated
+#   sp = manager.client("interactive")      # same client, higher-priority lane
+
+import os, time, threading
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+import spotipy
+
+from spotify_scheduler import ScheduledSpotify
+
+REFRESH_MARGIN_SECS = 300   # refresh this long before expiry
+RETRY_AFTER_FAIL    = 30    # back-off when a background refresh fails
+POOL_SIZE           = 20    # keep-alive connections to api.spotify.com
+
+def pooled_session(pool_size: int = POOL_SIZE) -> requests.Session:
+    """Keep-alive requests.Session with a bigger pool. No urllib3 retries: the scheduler owns them."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+class SpotifyClientManager:
+    def __init__(self, oauth, pool_size: int = POOL_SIZE, refresh_margin: int = REFRESH_MARGIN_SECS):
+        self.oauth = oauth
+        self.refresh_margin = refresh_margin
+        self.session = pooled_session(pool_size)
+        self._lock = threading.Lock()
+        self._token_info: Optional[dict] = None
+        self._loaded = False
+        self._client: Optional[spotipy.Spotify] = None
+        self._client_token: Optional[str] = None
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ---------- token ----------
+    def _load_from_cache(self):
+        # one file read per process (and after clear())
+        if not self._loaded:
+            self._loaded = True
+            static_token = os.getenv("SPOTIFY_ACCESS_TOKEN")
+            if static_token:
+                # fixed token (e.g. bench/standin_server.py): never expires, nothing to refresh
+                self._token_info = {"access_token": static_token, "expires_at": time.time() + 10 * 365 * 86400}
+                return
+            try:
+                self._token_info = self.oauth.cache_handler.get_cached_token()
+            except Exception as e:
+                print(f"⚠️ Could not read Spotify token cache: {e}")
+                self._token_info = None
+
+    def _expires_in(self, token_info: dict) -> float:
+        return float(token_info.get("expires_at", 0)) - time.time()
+
+    def _refresh(self) -> Optional[dict]:
+        """Refresh now (caller holds no lock). Returns the new token_info or None."""
+        with self._lock:
+            token_info = self._token_info
+        if not token_info or not token_info.get("refresh_token"):
+            return None
+        new_info = self.oauth.refresh_access_token(token_info["refresh_token"])
+        with self._lock:
+            self._token_info = new_info
+        return new_info
+
+    def token_info(self) -> Optional[dict]:
+        with self._lock:
+            self._load_from_cache()
+            token_info = self._token_info
+        if token_info and self._expires_in(token_info) <= 0:
+            # Background refresher is behind (or not started): refresh inline as a fallback.
+            try:
+                token_info = self._refresh()
+            except Exception as e:
+                print(f"⚠️ Spotify token refresh failed: {e}")
+                return None
+        return token_info
+
+    def set_token(self, token_info: dict):
+        """Install a freshly issued token (e.g. from the OAuth callback)."""
+        with self._lock:
+            self._token_info = token_info
+            self._loaded = True
+        self._wake.set()
+
+    def clear(self):
+        with self._lock:
+            self._token_info = None
+            self._loaded = False
+            self._client = None
+            self._client_token = None
+
+    def is_authenticated(self) -> bool:
+        return self.token_info() is not None
+
+    # ---------- clients ----------
+    def _make_client(self, access_token: str) -> spotipy.Spotify:
+        return ScheduledSpotify(auth=access_token, requests_session=self.session)
+
+    def client(self, lane: Optional[str] = None) -> Optional[spotipy.Spotify]:
+        token_info = self.token_info()
+        if not token_info:
+            return None
+        access_token = token_info["access_token"]
+        with self._lock:
+            if self._client is None or self._client_token != access_token:
+                self._client = self._make_client(access_token)
+                self._client_token = access_token
+            client = self._client
+        return client.for_lane(lane) if lane else client
+
+    # ---------- background refresh ----------
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._refresh_loop, name="spotify-token-refresh", daemon=True)
+        self._thread.start()
+
+    def _refresh_loop(self):
+        while True:
+            with self._lock:
+                self._load_from_cache()
+                token_info = self._token_info
+            if not token_info:
+                wait = 60.0  # not logged in yet; set_token() wakes us up
+            else:
+                wait = self._expires_in(token_info) - self.refresh_margin
+                if wait <= 0:
+                    try:
+                        self._refresh()
+                        print("🔑 Spotify token refreshed in background")
+                        continue
+                    except Exception as e:
+                        print(f"⚠️ Background token refresh failed: {e}")
+                        wait = RETRY_AFTER_FAIL
+            self._wake.wait(timeout=max(1.0, wait))
+            self._wake.clear()
@@ -0,0 +1,346 @@
+# spotify_scheduler.py
+# Process-wide, rate-limit-aware scheduler for Spotify Web API calls.
+#
+# Every request made by a ScheduledSpotify client (backend, artgig, mood mixer,
+# fina recom) passes through one SpotifyScheduler:
+#   - a token bucket sized to the app quota paces requests, so callers no
+#     longer need fixed time.sleep() between calls — they only wait when the
+#     budget is actually used up;
+#   - a 429 pauses *all* callers for the Retry-After the API asked for;
+#   - catalog GETs are answered from spotify_cache.py when fresh, without
+#     spending a token;
+#   - timeouts, connection errors and 5xx are retried with jittered
+#     exponential backoff (read timeouts and dropped connections only for GETs,
+#     so POST/PUT commands such as add_to_queue are never sent twice; a connect
+#     timeout never reached the API and is retried for every method).
+#
+# Priority lanes (highest first):
+#   interactive  playback control from gestures/buttons
+#   ui           reads behind the UI (status, current track, devices) — default
+#   background   discovery and queue top-ups (pump_loop, monitor_and_topup, ...)
+# A lane only takes a token while no higher lane is waiting, and only if it
+# leaves that lane's reserve in the bucket, so a pause gesture never queues
+# behind a 20-track top-up.
+#
+#   sp.for_lane("interactive")          # client pinned to a lane
+#   set_thread_lane("background")       # default lane for this thread's calls
+#
+# Env:
+#   SPOTIFY_RATE_PER_SEC=8         sustained requests/second for this process
+#   SPOTIFY_RATE_BURST=16          bucket size
+#   SPOTIFY_MAX_RETRIES=4
+#   SPOTIFY_BACKGROUND_RESERVE=4   tokens background calls must leave for the others
+#   SPOTIFY_API_BASE=              e.g. http://127.0.0.1:8901/v1/ for bench/standin_server.py
+#   SPOTIFY_ACCESS_TOKEN=          fixed bearer token; replaces the OAuth auth_manager
+
+import os, copy, time, random, asyncio, threading
+from typing import Callable, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ReadTimeout, ConnectTimeout, ConnectionError as ReqConnErr
+import spotipy
+from spotipy.exceptions import SpotifyException
+
+from spotify_cache import get_cache, match_endpoint, cache_key
+
+RATE_PER_SEC  = float(os.getenv("SPOTIFY_RATE_PER_SEC", "8"))
+RATE_BURST    = int(os.getenv("SPOTIFY_RATE_BURST", "16"))
+MAX_RETRIES   = int(os.getenv("SPOTIFY_MAX_RETRIES", "4"))
+BACKOFF_BASE  = 0.25   # seconds
+BACKOFF_CAP   = 8.0
+DEFAULT_RETRY_AFTER = 1.0
+RETRY_STATUSES = (500, 502, 503, 504)
+
+LANES = ("interactive", "ui", "background")   # priority order
+DEFAULT_LANE = "ui"
+LANE_RESERVE: Dict[str, int] = {
+    "interactive": 0,
+    "ui": 1,
+    "background": int(os.getenv("SPOTIFY_BACKGROUND_RESERVE", "4")),
+}
+YIELD_SLICE = 0.02   # how often a lower lane re-checks for higher-lane waiters
+
+_thread_lane = threading.local()
+
+def set_thread_lane(lane: Optional[str]):
+    """Default lane for Spotify calls made from the current thread (None = DEFAULT_LANE)."""
+    _thread_lane.lane = lane
+
+def current_lane() -> str:
+    return getattr(_thread_lane, "lane", None) or DEFAULT_LANE
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: int):
+        self.rate = max(0.01, float(rate))
+        self.capacity = max(1, int(capacity))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, reserve: int = 0) -> float:
+        """
+        Take a token if one is available beyond `reserve`.
+        Returns 0.0 on success, else seconds until one is.
+        """
+        need = 1.0 + min(reserve, self.capacity - 1)
+        with self._lock:
+            self._refill(time.monotonic())
+            if self.tokens >= need:
+                self.tokens -= 1.0
+                return 0.0
+            return (need - self.tokens) / self.rate
+
+    def acquire(self, reserve: int = 0) -> float:
+        """Block until a token is taken. Returns the time spent waiting."""
+        waited = 0.0
+        while True:
+            wait = self.try_acquire(reserve)
+            if wait <= 0:
+                return waited
+            time.sleep(wait)
+            waited += wait
+
+def _retry_after_secs(e: SpotifyException, attempt: int) -> float:
+    headers = getattr(e, "headers", None) or {}
+    raw = headers.get("Retry-After") if hasattr(headers, "get") else None
+    try:
+        return max(0.0, float(raw))
+    except (TypeError, ValueError):
+        return DEFAULT_RETRY_AFTER * (2 ** attempt)
+
+def _backoff(attempt: int) -> float:
+    # "full jitter" exponential backoff
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt)))
+
+class SpotifyScheduler:
+    def __init__(self, rate: float = RATE_PER_SEC, burst: int = RATE_BURST, max_retries: int = MAX_RETRIES):
+        self.bucket = TokenBucket(rate, burst)
+        self.max_retries = max_retries
+        self._lock = threading.Lock()
+        self._blocked_until = 0.0
+        self._waiting = {lane: 0 for lane in LANES}
+        self.counters = {"calls": 0, "throttled": 0, "throttle_wait_secs": 0.0,
+                         "rate_limited": 0, "retries": 0, "failures": 0}
+        self.lane_counters = {lane: {"calls": 0, "wait_secs": 0.0, "max_wait_secs": 0.0} for lane in LANES}
+
+    def _count(self, key: str, n=1):
+        with self._lock:
+            self.counters[key] += n
+
+    def _higher_lane_waiting(self, lane: str) -> bool:
+        with self._lock:
+            return any(self._waiting[l] for l in LANES[:LANES.index(lane)])
+
+    def block_for(self, secs: float):
+        """Pause every caller for `secs` (Retry-After)."""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + secs)
+
+    def _next_wait(self, lane: str) -> float:
+        """Take a token for `lane` (returns 0.0) or return how long to sleep before trying again."""
+        with self._lock:
+            pause = self._blocked_until - time.monotonic()
+        if pause > 0:
+            return pause
+        if self._higher_lane_waiting(lane):
+            return YIELD_SLICE
+        wait = self.bucket.try_acquire(LANE_RESERVE[lane])
+        if wait <= 0:
+            return 0.0
+        # lower lanes wake up in slices so they notice higher-lane arrivals
+        return wait if lane == LANES[0] else min(wait, YIELD_SLICE)
+
+    def _enter(self, lane: str):
+        with self._lock:
+            self._waiting[lane] += 1
+
+    def _leave(self, lane: str, waited: float):
+        with self._lock:
+            self._waiting[lane] -= 1
+            lc = self.lane_counters[lane]
+            lc["calls"] += 1
+            lc["wait_secs"] += waited
+            lc["max_wait_secs"] = max(lc["max_wait_secs"], waited)
+            self.counters["calls"] += 1
+            if waited > 0.001:
+                self.counters["throttled"] += 1
+                self.counters["throttle_wait_secs"] += waited
+
+    def _wait_for_budget(self, lane: str):
+        t0 = time.monotonic()
+        self._enter(lane)
+        try:
+            while True:
+                wait = self._next_wait(lane)
+                if wait <= 0:
+                    break
+                time.sleep(wait)
+        finally:
+            self._leave(lane, time.monotonic() - t0)
+
+    async def _wait_for_budget_async(self, lane: str):
+        t0 = time.monotonic()
+        self._enter(lane)
+        try:
+            while True:
+                wait = self._next_wait(lane)
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+        finally:
+            self._leave(lane, time.monotonic() - t0)
+
+    def _retry_delay(self, method: str, e: Exception, attempt: int) -> Optional[float]:
+        """Seconds to wait before retrying after `e`, or None if it must not be retried."""
+        if isinstance(e, SpotifyException):
+            if e.http_status == 429:
+                self._count("rate_limited")
+                self.block_for(_retry_after_secs(e, attempt))
+                return 0.0  # the global pause already covers it
+            if e.http_status in RETRY_STATUSES:
+                return _backoff(attempt)
+            return None
+        if isinstance(e, ConnectTimeout):
+            return _backoff(attempt)  # nothing was sent
+        if isinstance(e, (ReqConnErr, ReadTimeout)):
+            # the command may have reached the API before the connection broke
+            return _backoff(attempt) if method == "GET" else None
+        return None
+
+    def _give_up(self, attempt: int) -> bool:
+        if attempt > self.max_retries:
+            self._count("failures")
+            return True
+        self._count("retries")
+        return False
+
+    def execute(self, method: str, call: Callable, lane: str = DEFAULT_LANE):
+        if lane not in LANE_RESERVE:
+            lane = DEFAULT_LANE
+        attempt = 0
+        while True:
+            self._wait_for_budget(lane)
+            try:
+                return call()
+            except (SpotifyException, ReadTimeout, ReqConnErr) as e:
+                delay = self._retry_delay(method, e, attempt)
+                attempt += 1
+                if delay is None or self._give_up(attempt):
+                    raise
+            if delay > 0:
+                time.sleep(delay)
+
+    async def execute_async(self, method: str, call: Callable, lane: str = DEFAULT_LANE):
+        """execute() for coroutines: `call` returns an awaitable; waits never block the event loop."""
+        if lane not in LANE_RESERVE:
+            lane = DEFAULT_LANE
+        attempt = 0
+        while True:
+            await self._wait_for_budget_async(lane)
+            try:
+                return await call()
+            except (SpotifyException, ReadTimeout, ReqConnErr) as e:
+                delay = self._retry_delay(method, e, attempt)
+                attempt += 1
+                if delay is None or self._give_up(attempt):
+                    raise
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self.counters)
+            out["throttle_wait_secs"] = round(out["throttle_wait_secs"], 3)
+            out["paused_for_secs"] = round(max(0.0, self._blocked_until - time.monotonic()), 3)
+            out["lanes"] = {
+                lane: {"calls": c["calls"], "waiting": self._waiting[lane],
+                       "mean_wait_ms": round(c["wait_secs"] / c["calls"] * 1000.0, 2) if c["calls"] else 0.0,
+                       "max_wait_ms": round(c["max_wait_secs"] * 1000.0, 2)}
+                for lane, c in self.lane_counters.items()
+            }
+        out["rate_per_sec"] = self.bucket.rate
+        out["burst"] = self.bucket.capacity
+        return out
+
+_SCHEDULER: Optional[SpotifyScheduler] = None
+_SCHEDULER_LOCK = threading.Lock()
+
+def get_scheduler() -> SpotifyScheduler:
+    global _SCHEDULER
+    with _SCHEDULER_LOCK:
+        if _SCHEDULER is None:
+            _SCHEDULER = SpotifyScheduler()
+        return _SCHEDULER
+
+class ScheduledSpotify(spotipy.Spotify):
+    """spotipy.Spotify whose HTTP calls all go through the shared scheduler."""
+
+    def __init__(self, *args, scheduler: Optional[SpotifyScheduler] = None, lane: Optional[str] = None, **kwargs):
+        self.scheduler = scheduler or get_scheduler()
+        self.lane = lane   # None = the calling thread's lane
+        self.cache = get_cache()
+        # read at construction time: engines load their .env after importing this module
+        static_token = os.getenv("SPOTIFY_ACCESS_TOKEN")
+        if static_token and not args and not kwargs.get("auth"):
+            kwargs.pop("auth_manager", None)
+            kwargs["auth"] = static_token
+        super().__init__(*args, **kwargs)
+        api_base = os.getenv("SPOTIFY_API_BASE")
+        if api_base:
+            self.prefix = api_base.rstrip("/") + "/"
+
+    def for_lane(self, lane: str) -> "ScheduledSpotify":
+        """Same auth and session, calls tagged with `lane`."""
+        if lane == self.lane:
+            return self
+        clone = copy.copy(self)
+        clone.lane = lane
+        return clone
+
+    def uncached(self) -> "ScheduledSpotify":
+        """Same client with the response cache bypassed (reads that must be current)."""
+        if self.cache is None:
+            return self
+        clone = copy.copy(self)
+        clone.cache = None
+        return clone
+
+    def _build_session(self):
+        # Retries live in the scheduler; urllib3 must not retry (or swallow 429s) underneath it.
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=10, max_retries=0)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+
+    def _internal_call(self, method, url, payload, params):
+        parent = super()._internal_call
+        # params is mutated by spotipy (content_type); give each attempt its own copy
+        run = lambda: self.scheduler.execute(method, lambda: parent(method, url, payload, dict(params)),
+                                             lane=self.lane or current_lane())
+        if method != "GET" or self.cache is None:
+            return run()
+        path = url[len(self.prefix):] if url.startswith(self.prefix) else url
+        endpoint = match_endpoint(path)
+        if not endpoint:
+            return run()
+        name, ttl = endpoint
+        key = cache_key(path, params)
+        cached = self.cache.get(name, key)
+        if cached is not None:
+            return cached
+        result = run()
+        self.cache.put(name, key, result, ttl)
+        return result
+
+def lane_client(sp, lane: str):
+    """sp pinned to `lane` if it is a ScheduledSpotify, else sp unchanged."""
+    return sp.for_lane(lane) if isinstance(sp, ScheduledSpotify) else sp
+
+def uncached_client(sp):
+    """sp with the response cache bypassed (ScheduledSpotify / AsyncSpotify), else sp unchanged."""
+    return sp.uncached() if hasattr(sp, "uncached") else sp
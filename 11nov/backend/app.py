@@ -1,4 +1,4 @@
-from flask import Flask, request, jsonify, send_from_directory, redirect
+from flask import Flask, request, jsonify, send_from_directory, redirect, g, Response, stream_with_context
 from flask_cors import CORS
 import os
 import sys
@@ -11,9 +11,12 @@ import base64
 from PIL import Image
 import io
 import json
+import time
+import queue
 import datetime
+import asyncio
+import atexit
 
-import spotipy
 from spotipy.oauth2 import SpotifyOAuth
 
 # Import configuration
@@ -28,12 +31,39 @@ except ImportError:
         DJ_DEFAULT_BATCH_SIZE = 150
         DJ_STRICT_PRIMARY = True
 
+from latency import latency_registry, RequestTimings, ms_since_epoch_ms
+
 # Add the gesture models path
 sys.path.append('../Gesture final')
 
+# Shared engine / Spotify modules live in ../Models
+MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Models')
+if MODELS_DIR not in sys.path:
+    sys.path.insert(0, MODELS_DIR)
+from spotify_manager import SpotifyClientManager
+from device_registry import get_registry
+from spotify_scheduler import get_scheduler
+from spotify_cache import get_cache
+from queue_writer import get_queue_writer
+from playback_start import start_tracks, get_starter
+from playback_watcher import get_watcher
+from session_events import get_session_events, publish
+from playlist_pool import get_playlist_pool
+from mood_index import get_mood_index
+from mood_mixes import get_mix_store
+from prewarm import get_prewarmer, PREWARM_ENABLED
+from next_batch import buffers_stats
+from spotify_async import HAS_ASYNC, AsyncSpotify, gather_bounded, run_async
+
+# Optional landmark recording for offline replay (see Gesture final/replay_gestures.py)
+try:
+    from landmark_stream import LandmarkRecorder
+except ImportError as e:
+    print(f"Warning: landmark recorder not available: {e}")
+    LandmarkRecorder = None
+
 # Import your existing modules
 try:
-    sys.path.append('../Models/Models')
     from artists_gig_backfriend import run_once as dj_run_once
     print("DJ module imported successfully")
 except ImportError as e:
@@ -42,7 +72,6 @@ except ImportError as e:
 
 # Import artgig module
 try:
-    sys.path.append('../Models/Models')
     from artgig import (
         spotify_client, ensure_active_device, choose_tags_menu, 
         search_by_artists, search_random, start_and_queue, pump_loop,
@@ -63,6 +92,12 @@ _cors_origins = getattr(Config, 'CORS_ORIGINS', [
 ])
 CORS(app, resources={r"/*": {"origins": _cors_origins}}, supports_credentials=True)
 
+_server_timing = getattr(Config, 'SERVER_TIMING', False)
+
+@app.before_request
+def start_request_timings():
+    g.timings = RequestTimings(latency_registry)
+
 @app.after_request
 def add_cors_headers(response):
     try:
@@ -72,6 +107,11 @@ def add_cors_headers(response):
             response.headers['Vary'] = 'Origin'
             response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Authorization'
             response.headers['Access-Control-Allow-Methods'] = 'GET, POST, OPTIONS'
+            if _server_timing:
+                response.headers['Timing-Allow-Origin'] = origin
+        timings = getattr(g, 'timings', None)
+        if _server_timing and timings and timings.stages:
+            response.headers['Server-Timing'] = timings.server_timing_header()
     except Exception:
         pass
     return response
@@ -99,6 +139,12 @@ hands = mp_hands.Hands(
     min_tracking_confidence=0.6
 )
 
+_record_path = getattr(Config, 'GESTURE_RECORD_PATH', None)
+landmark_recorder = LandmarkRecorder(_record_path) if (_record_path and LandmarkRecorder) else None
+if landmark_recorder:
+    atexit.register(landmark_recorder.close)   # flush the last frames on shutdown
+    print(f"⏺  Recording gesture landmarks to {_record_path}")
+
 # ===== Helper function for Spotify OAuth =====
 def _spotify_oauth():
     client_id = getattr(Config, 'SPOTIPY_CLIENT_ID', None)
@@ -108,7 +154,13 @@ def _spotify_oauth():
         'SPOTIFY_SCOPES',
         'user-modify-playback-state user-read-playback-state user-read-currently-playing user-library-modify'
     )
+    if getattr(Config, 'SPOTIFY_START_MODE', 'context') == 'context':
+        # the session playlist is created / rewritten by Models/playback_start.py
+        scopes += ' playlist-read-private playlist-modify-private'
     cache_path = os.environ.get('SPOTIFY_CACHE_PATH', '.cache-dj-session')
+    if getattr(Config, 'SPOTIFY_ACCESS_TOKEN', None):
+        # Fixed token (local stand-in API): OAuth is never used, credentials are placeholders
+        client_id, client_secret = client_id or 'standin', client_secret or 'standin'
     if not client_id or not client_secret:
         print("⚠️ Spotify credentials not configured")
     return SpotifyOAuth(
@@ -120,14 +172,43 @@ def _spotify_oauth():
         open_browser=False,
     )
 
+# One OAuth + token + pooled connection set for the whole process
+try:
+    spotify_manager = SpotifyClientManager(
+        _spotify_oauth(),
+        pool_size=getattr(Config, 'SPOTIFY_POOL_SIZE', 20),
+        refresh_margin=getattr(Config, 'SPOTIFY_TOKEN_REFRESH_MARGIN', 300),
+    )
+    spotify_manager.start()
+except Exception as e:
+    print(f"Warning: Spotify client manager not available: {e}")
+    spotify_manager = None
+
+# Cached device list / active device for the (single) logged-in user
+device_registry = get_registry()
+queue_writer = get_queue_writer()
+
+# app.run(debug=True) runs this module twice: a Werkzeug reloader parent that only
+# watches files, and the child (WERKZEUG_RUN_MAIN=true) that serves requests
+_RELOADER_PARENT = (__name__ == '__main__' and getattr(Config, 'DEBUG', True)
+                    and os.environ.get("WERKZEUG_RUN_MAIN") != "true")
+
+# Curated catalogs (mood mixer playlists, artgig tag searches) load in the background
+if PREWARM_ENABLED and spotify_manager and not _RELOADER_PARENT:
+    get_prewarmer().start(lambda: spotify_manager.client("background"))
+
+def _spotify_client(lane=None):
+    """Shared Spotify client, or None if not authenticated.
+    lane="interactive" for playback control; background engines drop to "background" themselves."""
+    return spotify_manager.client(lane) if spotify_manager else None
+
 def get_spotify_client():
     """Get authenticated Spotify client for artist mix"""
     try:
-        oauth = _spotify_oauth()
-        token = oauth.get_cached_token()
-        if not token:
+        sp = _spotify_client()
+        if not sp:
             raise Exception("Not authenticated with Spotify")
-        return spotipy.Spotify(auth=token['access_token'])
+        return sp
     except Exception as e:
         print(f"Error getting Spotify client: {e}")
         raise
@@ -158,21 +239,28 @@ def predict_gesture():
         if not image_data:
             return jsonify({"error": "No image data provided"}), 400
         
+        # Client-side stages (browser clock): capture/encode and upload
+        g.timings.record('client_encode', data.get('client_encode_ms'))
+        g.timings.record('upload', ms_since_epoch_ms(data.get('sent_at')))
+        
         try:
-            if ',' in image_data:
-                image_data = image_data.split(',')[1]
-            image_bytes = base64.b64decode(image_data)
-            image = Image.open(io.BytesIO(image_bytes))
+            with g.timings.stage('decode'):
+                if ',' in image_data:
+                    image_data = image_data.split(',')[1]
+                image_bytes = base64.b64decode(image_data)
+                image = Image.open(io.BytesIO(image_bytes))
+                opencv_image = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+                rgb_image = cv2.cvtColor(opencv_image, cv2.COLOR_BGR2RGB)
         except Exception as e:
             return jsonify({"error": f"Invalid image data: {str(e)}"}), 400
         
-        opencv_image = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
-        rgb_image = cv2.cvtColor(opencv_image, cv2.COLOR_BGR2RGB)
-        
         # Debug: Log image dimensions
         print(f"🔍 Image dimensions: {rgb_image.shape}")
         
-        results = hands.process(rgb_image)
+        with g.timings.stage('mediapipe'):
+            results = hands.process(rgb_image)
+        if landmark_recorder:
+            landmark_recorder.write(time.time(), results.multi_hand_landmarks[0] if results.multi_hand_landmarks else None)
         
         # Debug: Log hand detection results
         if results.multi_hand_landmarks:
@@ -188,6 +276,7 @@ def predict_gesture():
             return jsonify({"gesture": "none", "confidence": 0.0, "message": "No hand detected"})
         
         hand_landmarks = results.multi_hand_landmarks[0]
+        classify_started = time.perf_counter()
         
         # Use your exact feature extraction method
         def to_feature_vec(hand_landmarks):
@@ -227,6 +316,8 @@ def predict_gesture():
         else:
             predicted_class = gesture_model.predict(features_scaled)[0]
             confidence = 1.0
+        g.timings.record('classify', (time.perf_counter() - classify_started) * 1000.0)
+        decide_started = time.perf_counter()
         
         threshold = getattr(Config, 'GESTURE_CONFIDENCE_THRESHOLD', 0.3)
         
@@ -240,6 +331,7 @@ def predict_gesture():
             print(f"   ⚠️ Below threshold, setting to 'none'")
         else:
             print(f"   ✅ Above threshold, keeping prediction: {predicted_class}")
+        g.timings.record('decide', (time.perf_counter() - decide_started) * 1000.0)
         
         return jsonify({
             "gesture": predicted_class,
@@ -265,7 +357,8 @@ def search_artist_mix():
     {
         "artist": "Artist Name",
         "genre": "Genre Name",
-        "limit": 20
+        "limit": 20,
+        "start_mode": "uris"  # optional: uris | context | queue (default SPOTIFY_START_MODE)
     }
     """
     try:
@@ -286,8 +379,8 @@ def search_artist_mix():
         sp = get_spotify_client()
         
         # Check if Spotify is active
-        devices = sp.devices()
-        if not devices.get('devices'):
+        device = device_registry.active_device(sp)
+        if not device:
             return jsonify({
                 'ok': False,
                 'error': 'No active Spotify device found. Please open Spotify and start playing something.'
@@ -338,27 +431,15 @@ def search_artist_mix():
         # Extract track URIs
         track_uris = [track['uri'] for track in tracks]
         
-        # Get active device
-        active_device = None
-        for device in devices['devices']:
-            if device['is_active']:
-                active_device = device['id']
-                break
-        
-        if not active_device and devices['devices']:
-            active_device = devices['devices'][0]['id']
-        
+        # Start the whole batch in one call (re-resolves the device once if it went away);
+        # anything that does not fit goes to the background queue writer
+        started = {}
+        active_device = device_registry.run_on_device(
+            sp, lambda did: started.update(start_tracks(sp, did, track_uris, mode=data.get('start_mode'),
+                                                        label=f"artist mix: {artist_full_name}")))
+        queue_job = started.get('queue_job')
         print(f"Using device: {active_device}")
-        
-        # Start playing the first track
-        sp.start_playback(device_id=active_device, uris=[track_uris[0]])
-        print(f"Started playing: {tracks[0]['name']}")
-        
-        # Add remaining tracks to queue
-        for uri in track_uris[1:]:
-            sp.add_to_queue(uri, device_id=active_device)
-        
-        print(f"Added {len(track_uris) - 1} tracks to queue")
+        print(f"Started playing: {tracks[0]['name']} ({len(track_uris)} tracks, {started.get('mode')} mode)")
         
         # Prepare track info for response
         track_info = []
@@ -378,6 +459,8 @@ def search_artist_mix():
             'artist': artist_full_name,
             'genre': genre,
             'tracks_count': len(tracks),
+            'start_mode': started.get('mode'),
+            'queue_job': queue_job.to_dict() if queue_job else None,
             'tracks': track_info,
             'now_playing': track_info[0] if track_info else None
         })
@@ -475,6 +558,51 @@ def get_genres():
             'message': 'Using fallback genres due to Spotify API error'
         })
 
+def _artist_track_query(artist_name, genre):
+    return f'artist:{artist_name} genre:{genre}' if genre else f'artist:{artist_name}'
+
+def _resolve_artist(sp, artist_name, genre, limit):
+    """(artist_id, artist_name, tracks) for one artist, or None if the artist is not found"""
+    artist_results = sp.search(q=f'artist:{artist_name}', type='artist', limit=1)
+    if not artist_results['artists']['items']:
+        return None
+    artist = artist_results['artists']['items'][0]
+    tracks = sp.search(q=_artist_track_query(artist_name, genre), type='track', limit=limit)['tracks']['items']
+    if not tracks:
+        # Fallback: Get artist's top tracks
+        print(f"No tracks found with genre for {artist['name']}, using top tracks")
+        tracks = sp.artist_top_tracks(artist['id'])['tracks'][:limit]
+    return artist['id'], artist['name'], tracks
+
+async def _resolve_artist_async(asp, artist_name, genre, limit):
+    # artist lookup and track search are independent, so they go out together
+    artist_results, track_results = await asyncio.gather(
+        asp.search(q=f'artist:{artist_name}', type='artist', limit=1),
+        asp.search(q=_artist_track_query(artist_name, genre), type='track', limit=limit))
+    if not artist_results['artists']['items']:
+        return None
+    artist = artist_results['artists']['items'][0]
+    tracks = track_results['tracks']['items']
+    if not tracks:
+        print(f"No tracks found with genre for {artist['name']}, using top tracks")
+        tracks = (await asp.artist_top_tracks(artist['id']))['tracks'][:limit]
+    return artist['id'], artist['name'], tracks
+
+def _resolve_artists(sp, artists, genre, limit):
+    """_resolve_artist for each name, in order; fanned out over AsyncSpotify when available"""
+    if not HAS_ASYNC:
+        return [_resolve_artist(sp, name, genre, limit) for name in artists]
+
+    async def fan_out():
+        async with AsyncSpotify.from_sync(sp) as asp:
+            return await gather_bounded([lambda n=n: _resolve_artist_async(asp, n, genre, limit) for n in artists])
+
+    results = run_async(fan_out())
+    for name, res in zip(artists, results):
+        if isinstance(res, Exception):
+            print(f"Artist '{name}' lookup failed: {res}")
+    return [None if isinstance(res, Exception) else res for res in results]
+
 @app.route('/api/artist-mix/play-multiple', methods=['POST'])
 def play_multiple_artists():
     """
@@ -485,7 +613,8 @@ def play_multiple_artists():
         "artists": ["Artist 1", "Artist 2", "Artist 3"],
         "genre": "Genre Name",  # optional
         "tracks_per_artist": 5,  # optional, default 5
-        "shuffle": true  # optional, default true
+        "shuffle": true,  # optional, default true
+        "start_mode": "uris"  # optional: uris | context | queue (default SPOTIFY_START_MODE)
     }
     """
     try:
@@ -507,8 +636,8 @@ def play_multiple_artists():
         sp = get_spotify_client()
         
         # Check if Spotify is active
-        devices = sp.devices()
-        if not devices.get('devices'):
+        device = device_registry.active_device(sp)
+        if not device:
             return jsonify({
                 'ok': False,
                 'error': 'No active Spotify device found. Please open Spotify and start playing something.'
@@ -517,35 +646,12 @@ def play_multiple_artists():
         all_tracks = []
         artist_info = {}
         
-        # Process each artist
-        for artist_name in artists:
-            print(f"Processing artist: {artist_name}")
-            
-            # Search for the artist
-            artist_results = sp.search(q=f'artist:{artist_name}', type='artist', limit=1)
-            
-            if not artist_results['artists']['items']:
+        # Resolve every artist (concurrently when httpx is available); results keep request order
+        for artist_name, found in zip(artists, _resolve_artists(sp, artists, genre, tracks_per_artist)):
+            if found is None:
                 print(f"Artist '{artist_name}' not found, skipping")
                 continue
-            
-            artist = artist_results['artists']['items'][0]
-            artist_id = artist['id']
-            artist_full_name = artist['name']
-            
-            # Build search query
-            if genre:
-                search_query = f'artist:{artist_name} genre:{genre}'
-            else:
-                search_query = f'artist:{artist_name}'
-            
-            # Search for tracks
-            track_results = sp.search(q=search_query, type='track', limit=tracks_per_artist)
-            tracks = track_results['tracks']['items']
-            
-            if not tracks:
-                # Fallback: Get artist's top tracks
-                print(f"No tracks found with genre for {artist_full_name}, using top tracks")
-                tracks = sp.artist_top_tracks(artist_id)['tracks'][:tracks_per_artist]
+            artist_id, artist_full_name, tracks = found
             
             if tracks:
                 # Add artist info to tracks
@@ -577,27 +683,15 @@ def play_multiple_artists():
         # Extract track URIs
         track_uris = [track['uri'] for track in all_tracks]
         
-        # Get active device
-        active_device = None
-        for device in devices['devices']:
-            if device['is_active']:
-                active_device = device['id']
-                break
-        
-        if not active_device and devices['devices']:
-            active_device = devices['devices'][0]['id']
-        
+        # Start the whole batch in one call (re-resolves the device once if it went away);
+        # anything that does not fit goes to the background queue writer
+        started = {}
+        active_device = device_registry.run_on_device(
+            sp, lambda did: started.update(start_tracks(sp, did, track_uris, mode=data.get('start_mode'),
+                                                        label="multi-artist mix")))
+        queue_job = started.get('queue_job')
         print(f"Using device: {active_device}")
-        
-        # Start playing the first track
-        sp.start_playback(device_id=active_device, uris=[track_uris[0]])
-        print(f"Started playing: {all_tracks[0]['name']} by {all_tracks[0]['artist_name']}")
-        
-        # Add remaining tracks to queue
-        for uri in track_uris[1:]:
-            sp.add_to_queue(uri, device_id=active_device)
-        
-        print(f"Added {len(track_uris) - 1} tracks to queue")
+        print(f"Started playing: {all_tracks[0]['name']} by {all_tracks[0]['artist_name']} ({started.get('mode')} mode)")
         
         # Prepare response
         track_info = []
@@ -617,6 +711,8 @@ def play_multiple_artists():
             'artist_info': artist_info,
             'tracks': track_info,
             'tracks_count': len(track_uris),
+            'start_mode': started.get('mode'),
+            'queue_job': queue_job.to_dict() if queue_job else None,
             'genre': genre,
             'shuffled': shuffle
         })
@@ -674,8 +770,8 @@ def start_artgig_session():
         print(f"Starting artgig session: mode={mode}, tag_profile={tag_profile}, artists={artists}")
         print(f"Using tags: {tags}")
         
-        # Get Spotify client
-        sp = spotify_client()
+        # Get Spotify client (shared token + connection pool)
+        sp = get_spotify_client()
         
         # Ensure active device
         device_id = ensure_active_device(sp)
@@ -698,6 +794,7 @@ def start_artgig_session():
         # Start the pump loop thread
         pump_thread = threading.Thread(target=run_pump_loop, daemon=True)
         pump_thread.start()
+        publish("artgig", "session_started", mode=mode, tag_profile=tag_profile, artists=artists)
         
         return jsonify({
             'ok': True,
@@ -917,6 +1014,7 @@ def fina_recom_start_recommendations():
         # Start the thread
         thread = threading.Thread(target=run_recommendations, daemon=True)
         thread.start()
+        publish("fina", "session_started", mode=mode)
         
         return jsonify({
             "ok": True,
@@ -975,6 +1073,34 @@ def fina_recom_get_profile():
 
 # ===== MOOD MIXER INTEGRATION ENDPOINTS =====
 
+def _mood_mixer_params(data):
+    """(language, mood_weights, None) from a start / preview body, or (None, None, error response)."""
+    if not data:
+        return None, None, (jsonify({"error": "No data provided"}), 400)
+    
+    language = data.get('language', 'mix')
+    mood_weights = data.get('mood_weights', {})
+    if not isinstance(mood_weights, dict):
+        return None, None, (jsonify({"error": "mood_weights must be an object of mood -> weight"}), 400)
+    
+    # Validate language
+    if language not in ['hi', 'en', 'mix']:
+        return None, None, (jsonify({"error": "Invalid language. Must be 'hi', 'en', or 'mix'"}), 400)
+    
+    # Validate mood weights
+    valid_moods = ['happy', 'sad_breakup', 'motivational', 'chill_lofi', 'hiphop', 'rap', 'old_classic', 'romantic', 'party']
+    total_weight = 0
+    
+    for mood in valid_moods:
+        weight = mood_weights.get(mood, 0)
+        if isinstance(weight, bool) or not isinstance(weight, int) or weight < 0 or weight > 100 or weight % 5 != 0:
+            return None, None, (jsonify({"error": f"Invalid weight for {mood}. Must be 0-100, multiple of 5"}), 400)
+        total_weight += weight
+    
+    if total_weight != 100:
+        return None, None, (jsonify({"error": f"Total weight must equal 100, got {total_weight}"}), 400)
+    return language, mood_weights, None
+
 @app.route('/api/mood-mixer/start', methods=['POST'])
 def start_mood_mixer():
     """
@@ -997,50 +1123,22 @@ def start_mood_mixer():
     }
     """
     try:
-        data = request.get_json()
-        if not data:
-            return jsonify({"error": "No data provided"}), 400
-        
-        language = data.get('language', 'mix')
-        mood_weights = data.get('mood_weights', {})
-        
-        # Validate language
-        if language not in ['hi', 'en', 'mix']:
-            return jsonify({"error": "Invalid language. Must be 'hi', 'en', or 'mix'"}), 400
-        
-        # Validate mood weights
-        valid_moods = ['happy', 'sad_breakup', 'motivational', 'chill_lofi', 'hiphop', 'rap', 'old_classic', 'romantic', 'party']
-        total_weight = 0
-        
-        for mood in valid_moods:
-            weight = mood_weights.get(mood, 0)
-            if weight < 0 or weight > 100 or weight % 5 != 0:
-                return jsonify({"error": f"Invalid weight for {mood}. Must be 0-100, multiple of 5"}), 400
-            total_weight += weight
-        
-        if total_weight != 100:
-            return jsonify({"error": f"Total weight must equal 100, got {total_weight}"}), 400
+        language, mood_weights, error = _mood_mixer_params(request.get_json(silent=True))
+        if error:
+            return error
         
         # Get Spotify client
         sp = get_spotify_client()
         
         # Check if Spotify is active
-        devices = sp.devices()
-        if not devices.get('devices'):
+        device = device_registry.active_device(sp)
+        if not device:
             return jsonify({
                 'ok': False,
                 'error': 'No active Spotify device found. Please open Spotify and start playing something.'
             }), 400
         
-        # Get active device
-        active_device = None
-        for device in devices['devices']:
-            if device['is_active']:
-                active_device = device['id']
-                break
-        
-        if not active_device and devices['devices']:
-            active_device = devices['devices'][0]['id']
+        active_device = device['id']
         
         # Start the mood mixer in a separate thread
         import threading
@@ -1071,30 +1169,38 @@ def start_mood_mixer():
                 
                 # Import the mood mixer functions from mood_mixer.py
                 from mood_mixer import (
-                    build_batch, start_with_seed_then_queue, monitor_and_topup,
+                    build_batch_fast, start_with_seed_then_queue, monitor_and_topup,
                     SEED_START, INITIAL_BATCH, TOP_UP_EVERY, TOP_UP_BATCH
                 )
                 print("✅ Successfully imported mood_mixer.py functions")
                 
-                # Build initial batch
+                # Initial batch: from the materialized mix for this combination if there is one
                 seen_uris = set()
-                seed = build_batch(sp, language, mood_weights, SEED_START, seen_uris, first_page_only=True)
-                for tr in seed: 
-                    seen_uris.add(tr["uri"])
-                
-                # Build the remainder of the initial batch
-                remaining_needed = max(0, INITIAL_BATCH - len(seed))
-                rest = []
-                if remaining_needed > 0:
-                    rest = build_batch(sp, language, mood_weights, remaining_needed, seen_uris, first_page_only=False)
-                    for tr in rest: 
+                batch = get_mix_store().draw(sp, language, mood_weights, INITIAL_BATCH, seen_uris)
+                if batch:
+                    print(f"🧺 Initial batch served from the materialized mix ({len(batch)} tracks)")
+                    seed, rest = batch[:SEED_START], batch[SEED_START:]
+                    seen_uris.update(tr["uri"] for tr in batch)
+                else:
+                    # Build initial batch
+                    seed = build_batch_fast(sp, language, mood_weights, SEED_START, seen_uris, first_page_only=True)
+                    for tr in seed: 
                         seen_uris.add(tr["uri"])
+                    
+                    # Build the remainder of the initial batch
+                    remaining_needed = max(0, INITIAL_BATCH - len(seed))
+                    rest = []
+                    if remaining_needed > 0:
+                        rest = build_batch_fast(sp, language, mood_weights, remaining_needed, seen_uris, first_page_only=False)
+                        for tr in rest: 
+                            seen_uris.add(tr["uri"])
                 
                 print(f"Starting mood mixer with {len(seed)} seed tracks, then queuing {len(rest)} more")
                 start_with_seed_then_queue(sp, active_device, seed, rest)
                 
                 # Monitor and top-up
-                monitor_and_topup(sp, active_device, language, mood_weights, seen_uris, next_topup_after=TOP_UP_EVERY)
+                monitor_and_topup(sp, active_device, language, mood_weights, seen_uris, next_topup_after=TOP_UP_EVERY,
+                                  queued=len(seed) + len(rest) - 1)
                 
             except Exception as e:
                 print(f"Mood mixer error: {e}")
@@ -1104,6 +1210,7 @@ def start_mood_mixer():
         # Start the mood mixer thread
         mixer_thread = threading.Thread(target=run_mood_mixer, daemon=True)
         mixer_thread.start()
+        publish("mood_mixer", "session_started", language=language, mood_weights=mood_weights)
         
         return jsonify({
             'ok': True,
@@ -1119,6 +1226,46 @@ def start_mood_mixer():
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
+MAX_PREVIEW_TRACKS = 100
+
+@app.route('/api/mood-mixer/preview', methods=['POST'])
+def preview_mood_mixer():
+    """
+    A batch for the given language / mood weights without starting playback.
+    Same body as /api/mood-mixer/start, plus optional "count" (an integer,
+    default INITIAL_BATCH, at most MAX_PREVIEW_TRACKS). Served from the materialized
+    mix when there is one ("source": "materialized"), else built live.
+    """
+    try:
+        data = request.get_json(silent=True)
+        language, mood_weights, error = _mood_mixer_params(data)
+        if error:
+            return error
+        from mood_mixer import build_batch_fast, INITIAL_BATCH
+        count = data.get('count', INITIAL_BATCH)
+        if isinstance(count, bool) or not isinstance(count, int) or not 1 <= count <= MAX_PREVIEW_TRACKS:
+            return jsonify({"error": f"Invalid count. Must be an integer 1-{MAX_PREVIEW_TRACKS}"}), 400
+        
+        sp = get_spotify_client()
+        tracks = get_mix_store().draw(sp, language, mood_weights, count)
+        source = "materialized"
+        if tracks is None:
+            tracks = build_batch_fast(sp, language, mood_weights, count, set())
+            source = "live"
+        
+        return jsonify({
+            'ok': True,
+            'source': source,
+            'language': language,
+            'mood_weights': mood_weights,
+            'tracks': [{k: tr.get(k) for k in ('uri', 'name', 'artists', 'popularity', 'mood_key', 'source_playlist_name')}
+                       for tr in tracks]
+        })
+        
+    except Exception as e:
+        print(f"Mood mixer preview error: {e}")
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/mood-mixer/moods', methods=['GET'])
 def get_mood_categories():
     """Get available mood categories and their display names"""
@@ -1207,7 +1354,8 @@ def start_dj_session():
             batch_size=batch_size,
             strict_primary=strict_primary
         )
-        
+        publish("dj", "session_started", mode=mode, genre=genre, artists=artists)
+
         return jsonify(result)
         
     except Exception as e:
@@ -1223,12 +1371,54 @@ def health_check():
         "gesture_models": gesture_model is not None,
         "dj_module": dj_run_once is not None,
         "artist_mix": True,
+        "latency_alert": latency_registry.p95('e2e_gesture') > getattr(Config, 'LATENCY_E2E_P95_ALERT_MS', 1500),
+        "spotify_scheduler": get_scheduler().stats(),
+        "spotify_cache": get_cache().stats() if get_cache() else None,
+        "playlist_pool": get_playlist_pool().stats(),
+        "mood_index": get_mood_index().stats(),
+        "mood_mixes": get_mix_store().stats(),
+        "prewarm": get_prewarmer().stats(),
+        "next_batch": buffers_stats(),
+        "queue_writer": queue_writer.stats(),
+        "playback_start": get_starter().stats(),
+        "playback_watcher": get_watcher().stats() if get_watcher() else None,
+        "session_events": get_session_events().stats(),
         "config": {
             "gesture_confidence_threshold": getattr(Config, 'GESTURE_CONFIDENCE_THRESHOLD', 0.8),
             "dj_batch_size": getattr(Config, 'DJ_DEFAULT_BATCH_SIZE', 150)
         }
     })
 
+@app.route('/api/queue-jobs', methods=['GET'])
+def queue_jobs():
+    """Recent background queue jobs, newest first"""
+    limit = int(request.args.get('limit', 20))
+    return jsonify({"ok": True, "jobs": [j.to_dict() for j in queue_writer.jobs(limit)], "writer": queue_writer.stats()})
+
+@app.route('/api/queue-jobs/<job_id>', methods=['GET'])
+def queue_job_status(job_id):
+    """Progress of one background queue job (job ids come from the play endpoints)"""
+    job = queue_writer.job(job_id)
+    if job is None:
+        return jsonify({"ok": False, "error": f"Unknown queue job {job_id}"}), 404
+    return jsonify({"ok": True, "job": job.to_dict()})
+
+@app.route('/api/metrics/latency')
+def latency_metrics():
+    """Per-stage latency histograms for the gesture → playback chain"""
+    if request.args.get('reset') == '1':
+        latency_registry.reset()
+    stages = latency_registry.snapshot()
+    e2e_p95 = stages.get('e2e_gesture', {}).get('p95_ms', 0.0)
+    alert_ms = getattr(Config, 'LATENCY_E2E_P95_ALERT_MS', 1500)
+    return jsonify({
+        "ok": True,
+        "stages": stages,
+        "e2e_p95_ms": e2e_p95,
+        "e2e_p95_alert_ms": alert_ms,
+        "alert": bool(alert_ms and e2e_p95 > alert_ms)
+    })
+
 @app.route('/api/gesture/classes')
 def get_gesture_classes():
     """Get available gesture classes"""
@@ -1275,16 +1465,14 @@ def internal_error(error):
 @app.get('/api/spotify/status')
 def spotify_status():
     try:
-        oauth = _spotify_oauth()
-        token_info = oauth.get_cached_token()
-        is_authed = bool(token_info)
+        sp = _spotify_client()
+        is_authed = sp is not None
         status = {"authenticated": is_authed}
         if is_authed:
-            sp = spotipy.Spotify(auth=token_info['access_token'])
             try:
                 me = sp.current_user()
                 status["user"] = {"id": me.get('id'), "name": me.get('display_name') or me.get('id')}
-                devices = sp.devices().get('devices', [])
+                devices = device_registry.devices(sp)
                 status["devices"] = [{"id": d.get('id'), "name": d.get('name'), "is_active": d.get('is_active')} for d in devices]
             except Exception:
                 pass
@@ -1295,8 +1483,9 @@ def spotify_status():
 @app.get('/api/spotify/login')
 def spotify_login():
     try:
-        oauth = _spotify_oauth()
-        auth_url = oauth.get_authorize_url()
+        if not spotify_manager:
+            return jsonify({"error": "Spotify OAuth not configured"}), 500
+        auth_url = spotify_manager.oauth.get_authorize_url()
         return jsonify({"auth_url": auth_url})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -1304,8 +1493,7 @@ def spotify_login():
 @app.get('/callback')
 def spotify_callback():
     try:
-        oauth = _spotify_oauth()
-        if not oauth:
+        if not spotify_manager:
             return jsonify({"error": "Spotify OAuth not configured"}), 500
             
         code = request.args.get('code')
@@ -1313,8 +1501,9 @@ def spotify_callback():
         if not code:
             return jsonify({"error": "Missing authorization code"}), 400
             
-        token_info = oauth.get_access_token(code)
-        # Persisted via cache_path; redirect back to frontend with success
+        token_info = spotify_manager.oauth.get_access_token(code)
+        spotify_manager.set_token(token_info)
+        # Persisted via cache_path (and kept in memory); redirect back to frontend with success
         frontend_url = getattr(Config, 'SPOTIPY_REDIRECT_URI', 'http://127.0.0.1:5500/frontend/profile.html')
         return redirect(f"{frontend_url}?auth=success&expires_in={token_info.get('expires_in', 0)}")
     except Exception as e:
@@ -1329,26 +1518,17 @@ def spotify_play_specific():
         data = request.get_json(force=True)
         uri = (data or {}).get('uri')
         query = (data or {}).get('query')
-        oauth = _spotify_oauth()
-        token = oauth.get_cached_token()
-        if not token:
+        sp = _spotify_client("interactive")
+        if not sp:
             return jsonify({"ok": False, "error": "Not authenticated"}), 401
-        sp = spotipy.Spotify(auth=token['access_token'])
 
         # resolve device
-        devices = sp.devices().get('devices', [])
-        if not devices:
+        try:
+            device = device_registry.active_device(sp, transfer_if_idle=True)
+        except Exception:
+            device = device_registry.active_device(sp)
+        if not device:
             return jsonify({"ok": False, "error": "No active Spotify device"}), 400
-        device_id = None
-        for d in devices:
-            if d.get('is_active'):
-                device_id = d.get('id'); break
-        if not device_id:
-            device_id = devices[0].get('id')
-            try:
-                sp.transfer_playback(device_id=device_id, force_play=True)
-            except Exception:
-                pass
 
         target_uri = uri
         if not target_uri and query:
@@ -1361,7 +1541,7 @@ def spotify_play_specific():
         if not target_uri:
             return jsonify({"ok": False, "error": "Provide 'uri' or 'query'"}), 400
 
-        sp.start_playback(device_id=device_id, uris=[target_uri])
+        device_registry.run_on_device(sp, lambda did: sp.start_playback(device_id=did, uris=[target_uri]))
         return jsonify({"ok": True, "played": target_uri})
     except Exception as e:
         return jsonify({"ok": False, "error": str(e)}), 500
@@ -1369,48 +1549,56 @@ def spotify_play_specific():
 @app.post('/api/spotify/control')
 def spotify_control():
     """Generic control endpoint for playback actions from gestures/UI.
-    Body: { "action": "play|pause|next|previous|volume|seek", "delta": 10| -10 | 30000 }
+    Body: { "action": "play|pause|next|previous|volume|seek", "delta": 10| -10 | 30000,
+            "gesture_ts": <epoch ms of the camera frame that triggered it, optional> }
     """
     try:
         data = request.get_json(force=True) or {}
         action = (data.get('action') or '').lower()
         delta = int(data.get('delta') or 0)
+        timings = g.timings
 
-        oauth = _spotify_oauth()
-        token = oauth.get_cached_token()
-        if not token:
+        with timings.stage('spotify_auth'):
+            sp = _spotify_client("interactive")
+        if not sp:
             return jsonify({"ok": False, "error": "Not authenticated"}), 401
-        sp = spotipy.Spotify(auth=token['access_token'])
 
-        devices = sp.devices().get('devices', [])
-        if not devices:
+        with timings.stage('spotify_device'):
+            device = device_registry.active_device(sp)
+        if not device:
             return jsonify({"ok": False, "error": "No active Spotify device"}), 400
-        device = next((d for d in devices if d.get('is_active')), devices[0])
-        device_id = device.get('id')
+        run = lambda command: device_registry.run_on_device(sp, command)
 
+        command_started = time.perf_counter()
+        watcher = get_watcher(sp)
         if action == 'play':
-            sp.start_playback(device_id=device_id)
+            run(lambda did: sp.start_playback(device_id=did))
         elif action == 'pause':
-            sp.pause_playback(device_id=device_id)
+            run(lambda did: sp.pause_playback(device_id=did))
         elif action == 'next':
-            sp.next_track(device_id=device_id)
+            run(lambda did: sp.next_track(device_id=did))
         elif action == 'previous':
-            sp.previous_track(device_id=device_id)
+            run(lambda did: sp.previous_track(device_id=did))
         elif action == 'volume':
-            cur_v = device.get('volume_percent', 50)
+            # the device list is cached for a while; the playback snapshot carries the live volume
+            pb = watcher.current(max_age=1.0)
+            cur_v = ((pb or {}).get('device') or {}).get('volume_percent')
+            if cur_v is None:
+                cur_v = device.get('volume_percent', 50)
             new_v = max(0, min(100, cur_v + (delta if delta else 0)))
-            sp.volume(new_v, device_id=device_id)
+            device_registry.note_volume(run(lambda did: sp.volume(new_v, device_id=did)), new_v)
+            watcher.note_volume(new_v)
         elif action == 'seek':
-            pb = sp.current_playback()
+            pb = watcher.current(max_age=1.0)   # progress is advanced locally between polls
             if not pb or not pb.get('item'):
                 return jsonify({"ok": False, "error": "No current playback"}), 400
             pos = pb.get('progress_ms', 0)
             dur = pb['item'].get('duration_ms', 0)
             new_pos = min(max(0, pos + (delta if delta else 0)), max(0, dur - 1000))
-            sp.seek_track(new_pos, device_id=device_id)
+            run(lambda did: sp.seek_track(new_pos, device_id=did))
         elif action == 'like':
             # Like/save current track
-            pb = sp.current_playback()
+            pb = watcher.current(max_age=1.0)
             if not pb or not pb.get('item'):
                 return jsonify({"ok": False, "error": "No current playback"}), 400
             track_id = pb['item'].get('id')
@@ -1420,82 +1608,149 @@ def spotify_control():
                 return jsonify({"ok": False, "error": "No track ID"}), 400
         else:
             return jsonify({"ok": False, "error": "Unknown action"}), 400
+        timings.record('spotify_command', (time.perf_counter() - command_started) * 1000.0)
+        if action in ('play', 'pause', 'next', 'previous', 'seek'):
+            watcher.poke()   # the track or play state may have changed: subscribers hear about it soon
 
-        return jsonify({"ok": True, "action": action})
+        e2e_ms = ms_since_epoch_ms(data.get('gesture_ts'))
+        timings.record('e2e_gesture', e2e_ms)
+
+        return jsonify({"ok": True, "action": action, "e2e_ms": round(e2e_ms, 1) if e2e_ms is not None else None})
     except Exception as e:
         return jsonify({"ok": False, "error": str(e)}), 500
 
+def _now_playing_payload(playback):
+    """Shape a current_playback() dict for the UI (shared by /current and /events)."""
+    if not playback:
+        return {"ok": True, "playing": False, "message": "No active playback"}
+    
+    track = playback.get('item', {})
+    if not track:
+        return {"ok": True, "playing": False, "message": "No track information"}
+    
+    # Extract track information
+    track_info = {
+        "id": track.get('id'),
+        "name": track.get('name'),
+        "artists": [artist.get('name') for artist in track.get('artists', [])],
+        "album": track.get('album', {}).get('name'),
+        "duration_ms": track.get('duration_ms'),
+        "external_urls": track.get('external_urls', {}),
+        "preview_url": track.get('preview_url')
+    }
+    
+    # Extract album art
+    images = track.get('album', {}).get('images', [])
+    if images:
+        track_info['album_art'] = images[0].get('url')  # Get largest image
+    
+    # Extract playback state
+    device = playback.get('device') or {}
+    playback_info = {
+        "is_playing": playback.get('is_playing', False),
+        "progress_ms": playback.get('progress_ms', 0),
+        "volume_percent": device.get('volume_percent', 0),
+        "shuffle_state": playback.get('shuffle_state', False),
+        "repeat_state": playback.get('repeat_state', 'off'),
+        "device": {
+            "id": device.get('id'),
+            "name": device.get('name'),
+            "type": device.get('type'),
+            "is_active": device.get('is_active', False)
+        }
+    }
+    
+    return {
+        "ok": True,
+        "playing": True,
+        "track": track_info,
+        "playback": playback_info
+    }
+
 @app.get('/api/spotify/current')
 def spotify_current():
     """Get currently playing track information with metadata and progress"""
     try:
-        oauth = _spotify_oauth()
-        token = oauth.get_cached_token()
-        if not token:
+        sp = _spotify_client()
+        if not sp:
             return jsonify({"ok": False, "error": "Not authenticated"}), 401
+        # shared per-user watcher: tabs and engines polling at once share one upstream call
+        playback = get_watcher(sp).current(max_age=1.0)
         
-        sp = spotipy.Spotify(auth=token['access_token'])
-        playback = sp.current_playback()
-        
-        if not playback:
-            return jsonify({"ok": True, "playing": False, "message": "No active playback"})
-        
-        track = playback.get('item', {})
-        if not track:
-            return jsonify({"ok": True, "playing": False, "message": "No track information"})
-        
-        # Extract track information
-        track_info = {
-            "id": track.get('id'),
-            "name": track.get('name'),
-            "artists": [artist.get('name') for artist in track.get('artists', [])],
-            "album": track.get('album', {}).get('name'),
-            "duration_ms": track.get('duration_ms'),
-            "external_urls": track.get('external_urls', {}),
-            "preview_url": track.get('preview_url')
-        }
-        
-        # Extract album art
-        images = track.get('album', {}).get('images', [])
-        if images:
-            track_info['album_art'] = images[0].get('url')  # Get largest image
-        
-        # Extract playback state
-        playback_info = {
-            "is_playing": playback.get('is_playing', False),
-            "progress_ms": playback.get('progress_ms', 0),
-            "volume_percent": playback.get('device', {}).get('volume_percent', 0),
-            "shuffle_state": playback.get('shuffle_state', False),
-            "repeat_state": playback.get('repeat_state', 'off'),
-            "device": {
-                "id": playback.get('device', {}).get('id'),
-                "name": playback.get('device', {}).get('name'),
-                "type": playback.get('device', {}).get('type'),
-                "is_active": playback.get('device', {}).get('is_active', False)
-            }
-        }
-        
-        return jsonify({
-            "ok": True,
-            "playing": True,
-            "track": track_info,
-            "playback": playback_info
-        })
+        return jsonify(_now_playing_payload(playback))
         
     except Exception as e:
         return jsonify({"ok": False, "error": str(e)}), 500
 
+SSE_PROGRESS_SECS = 1.0   # progress ticks, computed locally from the last snapshot
+SSE_PING_SECS = 15.0      # comment line so proxies keep the stream open
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@app.get('/api/spotify/events')
+def spotify_events():
+    """Server-Sent Events stream of now-playing state and session activity.
+
+    Events:
+        now_playing  same body as /api/spotify/current; sent on connect and on
+                     track change / skip / pause / resume / stop
+        progress     {"progress_ms", "duration_ms", "is_playing"} every second
+                     while playing, extrapolated without calling Spotify
+        session      DJ / artgig / mood mixer / fina recom and queue activity;
+                     recent events are replayed on connect
+
+    Every open stream shares the per-user playback watcher, so any number of
+    tabs costs one upstream poll.
+    """
+    sp = _spotify_client()
+    if not sp:
+        return jsonify({"ok": False, "error": "Not authenticated"}), 401
+    watcher = get_watcher(sp)
+    bus = get_session_events()
+
+    def stream():
+        sub = watcher.subscribe(types=("track_changed", "skipped", "paused", "resumed", "stopped"))
+        session_q = bus.subscribe()
+        try:
+            yield "retry: 3000\n\n"
+            yield _sse("now_playing", _now_playing_payload(watcher.current(max_age=1.0)))
+            for ev in bus.recent(10):
+                yield _sse("session", ev)
+            last_ping = time.time()
+            while True:
+                ev = sub.get(timeout=SSE_PROGRESS_SECS)
+                # the watcher just polled; read its snapshot without another upstream call
+                playback = watcher.current(max_age=float('inf'))
+                if ev is not None:
+                    yield _sse("now_playing", _now_playing_payload(playback))
+                elif playback and playback.get('is_playing') and playback.get('item'):
+                    yield _sse("progress", {"progress_ms": playback.get('progress_ms', 0),
+                                            "duration_ms": playback['item'].get('duration_ms'),
+                                            "is_playing": True})
+                while True:
+                    try:
+                        yield _sse("session", session_q.get_nowait())
+                    except queue.Empty:
+                        break
+                if time.time() - last_ping >= SSE_PING_SECS:
+                    last_ping = time.time()
+                    yield ": ping\n\n"
+        finally:
+            sub.close()
+            bus.unsubscribe(session_q)
+
+    return Response(stream_with_context(stream()), mimetype='text/event-stream',
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @app.get('/api/spotify/devices')
 def spotify_devices():
     """Get available Spotify devices"""
     try:
-        oauth = _spotify_oauth()
-        token = oauth.get_cached_token()
-        if not token:
+        sp = _spotify_client()
+        if not sp:
             return jsonify({"ok": False, "error": "Not authenticated"}), 401
-        
-        sp = spotipy.Spotify(auth=token['access_token'])
-        devices = sp.devices().get('devices', [])
+        devices = device_registry.devices(sp, force=request.args.get('refresh') == '1')
         
         return jsonify({
             "ok": True,
@@ -1515,13 +1770,10 @@ def spotify_transfer():
         if not device_id:
             return jsonify({"ok": False, "error": "Device ID required"}), 400
         
-        oauth = _spotify_oauth()
-        token = oauth.get_cached_token()
-        if not token:
+        sp = _spotify_client("interactive")
+        if not sp:
             return jsonify({"ok": False, "error": "Not authenticated"}), 401
-        
-        sp = spotipy.Spotify(auth=token['access_token'])
-        sp.transfer_playback(device_id=device_id, force_play=True)
+        device_registry.transfer(sp, device_id, force_play=True)
         
         return jsonify({"ok": True, "device_id": device_id})
         
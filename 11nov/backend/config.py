@@ -29,6 +29,17 @@ class Config:
     SPOTIPY_CLIENT_SECRET = os.environ.get('SPOTIPY_CLIENT_SECRET')
     SPOTIPY_REDIRECT_URI = os.environ.get('SPOTIPY_REDIRECT_URI', 'http://127.0.0.1:5500/frontend/profile.html')
     
+    # Spotify client manager (in-memory token, pooled keep-alive connections)
+    SPOTIFY_POOL_SIZE = int(os.environ.get('SPOTIFY_POOL_SIZE', '20'))
+    SPOTIFY_TOKEN_REFRESH_MARGIN = int(os.environ.get('SPOTIFY_TOKEN_REFRESH_MARGIN', '300'))  # seconds before expiry
+    
+    # Point the Spotify clients at bench/standin_server.py (read by Models/spotify_scheduler.py)
+    SPOTIFY_API_BASE = os.environ.get('SPOTIFY_API_BASE')  # e.g. http://127.0.0.1:8901/v1/
+    SPOTIFY_ACCESS_TOKEN = os.environ.get('SPOTIFY_ACCESS_TOKEN')  # fixed token, skips OAuth
+    
+    # Batch starts (read by Models/playback_start.py): uris | context | queue
+    SPOTIFY_START_MODE = os.environ.get('SPOTIFY_START_MODE', 'context')
+    
     # Gesture recognition settings
     GESTURE_CONFIDENCE_THRESHOLD = float(os.environ.get('GESTURE_CONFIDENCE_THRESHOLD', 0.3))  # Lowered from 0.8 to 0.3
     GESTURE_STABLE_FRAMES = int(os.environ.get('GESTURE_STABLE_FRAMES', '5'))
@@ -42,6 +53,13 @@ class Config:
     GESTURE_MODEL_PATH = os.environ.get('GESTURE_MODEL_PATH', '../Gesture final/gesture_model.pkl')
     GESTURE_SCALER_PATH = os.environ.get('GESTURE_SCALER_PATH', '../Gesture final/scaler.pkl')
     
+    # Record /api/gesture/predict landmarks for Gesture final/replay_gestures.py (unset = off)
+    GESTURE_RECORD_PATH = os.environ.get('GESTURE_RECORD_PATH') or None
+    
+    # Latency instrumentation
+    SERVER_TIMING = os.environ.get('SERVER_TIMING', '0') == '1'  # add Server-Timing header to responses
+    LATENCY_E2E_P95_ALERT_MS = float(os.environ.get('LATENCY_E2E_P95_ALERT_MS', '1500'))
+    
     # CORS settings
     CORS_ORIGINS = os.environ.get('CORS_ORIGINS', 'http://localhost:3000,http://127.0.0.1:3000,http://localhost:5000,http://127.0.0.1:5000,http://localhost:5500,http://127.0.0.1:5500,null').split(',')
     
@@ -100,6 +118,11 @@ DJ_STRICT_PRIMARY=1
 # Model Paths (relative to backend directory)
 GESTURE_MODEL_PATH=../Gesture final/gesture_model.pkl
 GESTURE_SCALER_PATH=../Gesture final/scaler.pkl
+# GESTURE_RECORD_PATH=gesture_session.lmks
+
+# Latency Instrumentation
+SERVER_TIMING=0
+LATENCY_E2E_P95_ALERT_MS=1500
 
 # CORS Settings
 CORS_ORIGINS=http://localhost:3000,http://127.0.0.1:3000,http://localhost:5000
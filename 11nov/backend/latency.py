@@ -0,0 +1,136 @@
+"""
+Per-stage latency histograms for the gesture → playback chain.
+
+Stages recorded by app.py (all in milliseconds):
+    client_encode    frame capture → JPEG/base64 ready (reported by the browser)
+    upload           browser send → request received (client/server clocks)
+    decode           base64 → RGB array
+    mediapipe        hand landmark detection
+    classify         feature extraction + scaler + model
+    decide           confidence threshold decision
+    spotify_auth     access token / client lookup
+    spotify_device   device resolution
+    spotify_command  Spotify command issued → acknowledged
+    e2e_gesture      frame capture of the gesture → Spotify ack
+
+Each request also carries a RequestTimings object so the same stages can be
+returned in a `Server-Timing` header.
+"""
+
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+# Bucket upper bounds in ms (last bucket is +inf)
+BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000]
+RECENT_SAMPLES = 2048
+
+
+class StageHistogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent = deque(maxlen=RECENT_SAMPLES)
+
+    def observe(self, ms: float):
+        i = 0
+        while i < len(BUCKETS_MS) and ms > BUCKETS_MS[i]:
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+        self.recent.append(ms)
+
+    def percentile(self, q: float) -> float:
+        if not self.recent:
+            return 0.0
+        xs = sorted(self.recent)
+        k = min(len(xs) - 1, max(0, int(round(q / 100.0 * (len(xs) - 1)))))
+        return xs[k]
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count, 3) if self.count else 0.0,
+            "p50_ms": round(self.percentile(50), 3),
+            "p95_ms": round(self.percentile(95), 3),
+            "p99_ms": round(self.percentile(99), 3),
+            "max_ms": round(self.max, 3),
+            "buckets": {
+                (f"le_{b}" if i < len(BUCKETS_MS) else "inf"): c
+                for i, (b, c) in enumerate(zip(BUCKETS_MS + [None], self.counts))
+            },
+        }
+
+
+class LatencyRegistry:
+    """Process-wide stage histograms (thread-safe)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+
+    def observe(self, stage: str, ms: float):
+        if ms is None or ms < 0:
+            return
+        with self._lock:
+            h = self._stages.get(stage)
+            if h is None:
+                h = self._stages[stage] = StageHistogram()
+            h.observe(float(ms))
+
+    def p95(self, stage: str) -> float:
+        with self._lock:
+            h = self._stages.get(stage)
+            return h.percentile(95) if h else 0.0
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {name: h.summary() for name, h in sorted(self._stages.items())}
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+
+
+class RequestTimings:
+    """Stages timed during one request; also fed into the registry."""
+
+    def __init__(self, registry: LatencyRegistry):
+        self.registry = registry
+        self.stages = []  # [(name, ms)]
+
+    def record(self, stage: str, ms: float):
+        if ms is None or ms < 0:
+            return
+        self.stages.append((stage, ms))
+        self.registry.observe(stage, ms)
+
+    @contextmanager
+    def stage(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - t0) * 1000.0)
+
+    def server_timing_header(self) -> str:
+        return ", ".join(f"{name};dur={ms:.1f}" for name, ms in self.stages)
+
+
+def ms_since_epoch_ms(ts_ms, now: float = None):
+    """Milliseconds elapsed since a client epoch-ms timestamp (None if missing/bad)."""
+    try:
+        ts_ms = float(ts_ms)
+    except (TypeError, ValueError):
+        return None
+    if ts_ms <= 0:
+        return None
+    return (now if now is not None else time.time()) * 1000.0 - ts_ms
+
+
+latency_registry = LatencyRegistry()
@@ -0,0 +1,256 @@
+# mood_mixer_bench.py
+# Microbenchmarks for the mood mixer's allocation helpers and the mood index
+# (mood_index.py) it samples from, at growing scale, plus whole builds against
+# an in-process stub Spotify client (no network, no stand-in server needed):
+#
+#   proportional_split     n moods
+#   _proportional_quota    n playlists
+#   index exclusion        TrackIndex.exclusion over an index of n URIs, seen set of n/2
+#   index take             TrackIndex.take of BATCH from a bin of n, half of it seen
+#   _sample_indexed        BATCH from one playlist's high / mid bins (n tracks), half seen
+#   _take_across           BATCH across 10 bins of n/10, half seen
+#   _pages_wanted          every MOOD_BUCKETS playlist n tracks long with its first page
+#                          pooled, seen set of n/2, index empty
+#   build_batch cold       every MOOD_BUCKETS playlist n tracks long, seen set of n/2,
+#                          pool and index empty
+#   build_batch warm       the same, pool and index already filled
+#
+# For every (bench, n): median / min wall time over --repeats runs, and, from
+# one extra run under tracemalloc, peak traced memory and the blocks / bytes
+# allocated and still held. Then a least-squares log-log fit of time against n
+# per bench: an exponent above SUPERLINEAR_EXP is flagged (e.g. seen_uris
+# turning into a list, so every membership test scans it).
+#
+#   python3 bench/mood_mixer_bench.py --sizes 100,1000,10000 --out report.json
+#   python3 bench/mood_mixer_bench.py --baseline report.json    # flag regressions
+#
+# Exit status 1 when something is flagged and --strict is given.
+
+import os, sys, gc, json, math, time, random, platform, argparse, statistics, tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Models"))
+import mood_mixer as mm
+from playlist_pool import get_playlist_pool, PAGE_SIZE
+from mood_index import get_mood_index, TrackIndex
+
+SUPERLINEAR_EXP = 1.25      # fitted time ~ n^k with k above this is flagged
+REGRESSION_RATIO = 1.5      # --baseline: median this many times slower is flagged
+MIN_FIT_MS = 0.05           # sizes faster than this are timer noise, left out of the fit
+BATCH = 50
+
+# ======== Stub Spotify ========
+class StubSpotify:
+    """The two playlist reads the mood mixer makes, served from synthetic playlists of `size` tracks."""
+    def __init__(self, size: int, seed: int = 7):
+        self.size = size
+        self.seed = seed
+        self.calls = 0
+        self._items = {}
+
+    def _playlist_items(self, pid: str):
+        if pid not in self._items:
+            rng = random.Random(f"{self.seed}:{pid}")
+            # a third of each playlist is shared with the others, like overlapping curated lists
+            self._items[pid] = [{"track": {
+                "id": tid, "uri": f"spotify:track:{tid}", "name": f"Track {tid}",
+                "artists": [{"name": f"Artist {rng.randrange(self.size // 4 + 1)}"}],
+                "popularity": rng.randrange(101), "is_local": False}}
+                for tid in (f"shared{i:07d}" if i % 3 == 0 else f"{pid[:10]}{i:07d}" for i in range(self.size))]
+        return self._items[pid]
+
+    def playlist(self, pid, fields=None, **kw):
+        self.calls += 1
+        tracks = {"total": self.size}
+        if fields and "tracks(" in fields:
+            tracks["items"] = self._playlist_items(pid)[:PAGE_SIZE]   # first page embedded, as Spotify does
+        return {"name": f"Playlist {pid[:6]}", "snapshot_id": f"snap-{self.seed}-{self.size}", "tracks": tracks}
+
+    def playlist_items(self, pid, fields=None, limit=PAGE_SIZE, offset=0, **kw):
+        self.calls += 1
+        items = self._playlist_items(pid)
+        return {"items": items[offset:offset + limit], "total": len(items),
+                "next": None if offset + limit >= len(items) else "more"}
+
+# ======== Workloads ========
+def _tracks(n: int, rng: random.Random):
+    return [{"uri": f"spotify:track:t{i:08d}", "id": f"t{i:08d}", "name": f"Track {i}", "artists": "A",
+             "popularity": rng.randrange(101), "source_playlist_uri": "p", "source_playlist_name": "P"}
+            for i in range(n)]
+
+def _seen(tracks, rng: random.Random):
+    return {tr["uri"] for tr in rng.sample(tracks, len(tracks) // 2)}
+
+def _all_moods():
+    return {key: 100 // len(mm.MOOD_ORDER) for key, _ in mm.MOOD_ORDER}
+
+def _reset_pools():
+    get_playlist_pool().clear()
+    get_mood_index().clear()
+
+def _binned(tracks, parts: int = 1):
+    """A TrackIndex of its own holding `tracks` split into `parts` pooled playlists: (index, [bins])."""
+    index, pool = TrackIndex(), get_playlist_pool()
+    size = math.ceil(len(tracks) / parts)
+    bins = []
+    for i in range(parts):
+        entry = pool.store(f"bench{parts}x{i}", "snap", f"Bench {i}", size)
+        pool.add_pages(entry, {0: tracks[i * size:(i + 1) * size]})
+        bins.append(index.bins(f"spotify:playlist:bench{parts}x{i}", entry, mm._popularity_tier))
+    return index, bins
+
+def _stub_seen(sp: StubSpotify, rng: random.Random):
+    """Half of every build playlist's tracks, as seen_uris."""
+    return {it["track"]["uri"] for pl in mm._playlists_for_build("mix", mm.proportional_split(BATCH, _all_moods()))
+            for it in rng.sample(sp._playlist_items(mm._id_from_uri(pl)), sp.size // 2)}
+
+def workloads(n: int):
+    """(bench name, setup() -> state, run(state)) per helper at size n."""
+    rng = random.Random(n)
+    # popularity 40..100: every track lands in a bin, so bins hold n
+    tracks = [dict(tr, popularity=40 + tr["popularity"] * 60 // 100) for tr in _tracks(n, rng)]
+    seen = _seen(tracks, rng)
+    one_index, (one_bins,) = _binned(tracks)
+    one_positions = one_bins.high + one_bins.mid
+    ten_index, ten_bins = _binned(tracks, 10)
+
+    def sample_setup(index):
+        return lambda: index.exclusion(seen)
+
+    def pages_setup():
+        _reset_pools()
+        sp = StubSpotify(n)
+        per_mood = mm.proportional_split(BATCH, _all_moods())
+        entries = {pl: mm._pooled_entry(sp, pl, pages=1) for pl in mm._playlists_for_build("mix", per_mood)}
+        get_mood_index().clear()
+        return per_mood, entries, _stub_seen(sp, rng)
+
+    def build_setup(warm: bool):
+        def setup():
+            _reset_pools()
+            sp = StubSpotify(n)
+            seen_uris = _stub_seen(sp, rng)
+            if warm:
+                mm.build_batch(sp, "mix", _all_moods(), BATCH, seen_uris)
+            return sp, seen_uris
+        return setup
+
+    return [
+        ("proportional_split", lambda: {f"mood{i}": rng.randrange(1, 20) * 5 for i in range(n)},
+         lambda w: mm.proportional_split(10 * len(w), w)),
+        ("_proportional_quota", lambda: [rng.randrange(0, 500) for _ in range(n)],
+         lambda sizes: mm._proportional_quota(10 * len(sizes), sizes)),
+        ("index exclusion", lambda: seen, one_index.exclusion),
+        ("index take", sample_setup(one_index),
+         lambda excl: one_index.take(one_positions, BATCH, excl)),
+        ("_sample_indexed", sample_setup(one_index),
+         lambda excl: mm._sample_indexed(one_index, [one_bins.high], [one_bins.mid], BATCH, excl)),
+        ("_take_across", sample_setup(ten_index),
+         lambda excl: mm._take_across(ten_index, [b.high for b in ten_bins] + [b.mid for b in ten_bins], BATCH, excl)),
+        ("_pages_wanted", pages_setup, lambda st: mm._pages_wanted("mix", *st)),
+        ("build_batch cold", build_setup(False), lambda st: mm.build_batch(st[0], "mix", _all_moods(), BATCH, st[1])),
+        ("build_batch warm", build_setup(True), lambda st: mm.build_batch(st[0], "mix", _all_moods(), BATCH, st[1])),
+    ]
+
+# ======== Measuring ========
+def measure(setup, run, repeats: int) -> dict:
+    times = []
+    for _ in range(repeats):
+        state = setup()
+        gc.collect()
+        t0 = time.perf_counter()
+        run(state)
+        times.append((time.perf_counter() - t0) * 1000)
+
+    state = setup()
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    result = run(state)
+    _, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    diff = after.compare_to(before, "filename")
+    del result
+    return {"wall_ms_median": round(statistics.median(times), 4), "wall_ms_min": round(min(times), 4),
+            "peak_kib": round(peak / 1024, 1),
+            "alloc_blocks": sum(max(0, d.count_diff) for d in diff),
+            "retained_kib": round(sum(d.size_diff for d in diff) / 1024, 1)}
+
+def fit_exponent(points) -> float:
+    """Least-squares slope of log(time) over log(n)."""
+    xs = [math.log(n) for n, _ in points]
+    ys = [math.log(t) for _, t in points]
+    mx, my = sum(xs) / len(xs), sum(ys) / len(ys)
+    den = sum((x - mx) ** 2 for x in xs)
+    return sum((x - mx) * (y - my) for x, y in zip(xs, ys)) / den if den else 0.0
+
+def scaling(results) -> dict:
+    out = {}
+    for name in dict.fromkeys(r["bench"] for r in results):
+        points = [(r["n"], r["wall_ms_median"]) for r in results
+                  if r["bench"] == name and r["wall_ms_median"] >= MIN_FIT_MS]
+        if len(points) < 2:
+            out[name] = {"exponent": None, "superlinear": False}
+            continue
+        k = fit_exponent(points)
+        out[name] = {"exponent": round(k, 2), "superlinear": k > SUPERLINEAR_EXP}
+    return out
+
+def regressions(results, baseline_path: str) -> list:
+    with open(baseline_path) as f:
+        base = {(r["bench"], r["n"]): r for r in json.load(f)["results"]}
+    flagged = []
+    for r in results:
+        b = base.get((r["bench"], r["n"]))
+        if b and b["wall_ms_median"] >= MIN_FIT_MS and r["wall_ms_median"] > REGRESSION_RATIO * b["wall_ms_median"]:
+            flagged.append({"bench": r["bench"], "n": r["n"], "baseline_ms": b["wall_ms_median"],
+                            "now_ms": r["wall_ms_median"],
+                            "ratio": round(r["wall_ms_median"] / b["wall_ms_median"], 2)})
+    return flagged
+
+def main():
+    ap = argparse.ArgumentParser(description="Mood mixer allocation / sampling microbenchmarks")
+    ap.add_argument("--sizes", default="100,1000,10000", help="comma-separated n values")
+    ap.add_argument("--repeats", type=int, default=5)
+    ap.add_argument("--only", default="", help="comma-separated bench names (default: all)")
+    ap.add_argument("--out", default="", help="write the JSON report here (default: stdout)")
+    ap.add_argument("--baseline", default="", help="earlier report to compare medians against")
+    ap.add_argument("--strict", action="store_true", help="exit 1 if anything is flagged")
+    args = ap.parse_args()
+
+    sizes = sorted(int(s) for s in args.sizes.split(",") if s.strip())
+    only = {s.strip() for s in args.only.split(",") if s.strip()}
+    random.seed(1)
+    results = []
+    for n in sizes:
+        for name, setup, run in workloads(n):
+            if only and name not in only:
+                continue
+            r = {"bench": name, "n": n, **measure(setup, run, args.repeats)}
+            results.append(r)
+            print(f"{name:<22} n={n:<7} {r['wall_ms_median']:>10.3f} ms  peak {r['peak_kib']:>9.1f} KiB  "
+                  f"{r['alloc_blocks']:>8} blocks", file=sys.stderr)
+    _reset_pools()
+
+    report = {"meta": {"python": platform.python_version(), "platform": platform.platform(),
+                       "time": time.strftime("%Y-%m-%dT%H:%M:%S"), "sizes": sizes, "repeats": args.repeats,
+                       "batch": BATCH, "superlinear_exp": SUPERLINEAR_EXP},
+              "results": results, "scaling": scaling(results)}
+    flagged = [name for name, s in report["scaling"].items() if s["superlinear"]]
+    if args.baseline:
+        report["regressions"] = regressions(results, args.baseline)
+        flagged += [f"{r['bench']} n={r['n']}" for r in report["regressions"]]
+    for name in flagged:
+        print(f"⚠  flagged: {name}", file=sys.stderr)
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    sys.exit(1 if flagged and args.strict else 0)
+
+if __name__ == "__main__":
+    main()
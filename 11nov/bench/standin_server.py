@@ -0,0 +1,694 @@
+# standin_server.py
+# Local stand-in for the subset of the Spotify Web API this repo uses, so the
+# backend and the three engines (artgig, mood mixer, fina recom) can be run,
+# benchmarked and load-tested without a Spotify account or playback device.
+#
+# Stdlib only. Serves a deterministic synthetic catalog (or a recorded one
+# via --catalog), simulates one user's playback (devices, queue, a clock that
+# advances tracks) and can inject latency and 429s.
+#
+#   python3 bench/standin_server.py --port 8901 --latency-ms 40 --jitter-ms 20 --rate-limit 30
+#
+# Point everything at it (backend/.env, fina recom/.env or the shell):
+#   SPOTIFY_API_BASE=http://127.0.0.1:8901/v1/
+#   SPOTIFY_ACCESS_TOKEN=standin          # any token is accepted; skips OAuth
+#
+# GET /_standin/stats returns per-endpoint request counts and injected 429s;
+# POST /_standin/reset clears playback state and counters.
+
+import json, time, random, string, hashlib, argparse, threading
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs, urlencode
+
+# ======== Synthetic catalog ========
+WORDS = ("midnight neon river golden broken summer velvet echo paper fire ocean city "
+         "silver wild lonely electric dream sky heart shadow rain highway moon sugar "
+         "gravity crystal stranger dust honey thunder").split()
+GENRES = ["pop", "hip hop", "rap", "lo-fi", "bollywood", "indie", "edm", "rock",
+          "r&b", "punjabi", "classic rock", "chill", "romance", "party", "acoustic"]
+TITLE_SUFFIXES = ["", "", "", "", " (Remix)", " - Slowed + Reverb", " (Lofi Flip)",
+                  " - Club Mix", " (Mashup)", " - Extended Mix", " (VIP Edit)", " - Bootleg"]
+
+def _sid(*parts) -> str:
+    """Deterministic 22-char base62 id, like Spotify's."""
+    h = int(hashlib.sha1("/".join(map(str, parts)).encode()).hexdigest(), 16)
+    alphabet = string.digits + string.ascii_letters
+    out = []
+    for _ in range(22):
+        h, r = divmod(h, 62)
+        out.append(alphabet[r])
+    return "".join(out)
+
+def _title(rng: random.Random, n: int) -> str:
+    return " ".join(rng.choice(WORDS).capitalize() for _ in range(n))
+
+class Catalog:
+    def __init__(self, seed: int = 7, n_artists: int = 200, albums_per_artist: int = 4, tracks_per_album: int = 10):
+        self.seed = seed
+        self.playlist_size = (80, 400)
+        self.artists, self.albums, self.tracks = {}, {}, {}
+        self.artist_albums = defaultdict(list)
+        self.album_tracks = defaultdict(list)
+        self.artist_tracks = defaultdict(list)
+        self.playlists = {}
+        rng = random.Random(seed)
+        for a in range(n_artists):
+            aid = _sid("artist", seed, a)
+            self.artists[aid] = {
+                "id": aid, "type": "artist", "uri": f"spotify:artist:{aid}",
+                "name": f"{_title(rng, 2)} {rng.choice(['', 'Band', 'DJ', 'Collective', ''])}".strip(),
+                "genres": rng.sample(GENRES, 2), "popularity": rng.randint(5, 95),
+                "followers": {"total": rng.randint(100, 5_000_000)}, "images": [],
+            }
+            for b in range(albums_per_artist):
+                alid = _sid("album", seed, a, b)
+                year = rng.randint(1975, 2025)
+                album = {"id": alid, "type": "album", "uri": f"spotify:album:{alid}",
+                         "name": _title(rng, rng.randint(1, 3)), "album_type": "album",
+                         "release_date": f"{year}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+                         "release_date_precision": "day", "total_tracks": tracks_per_album,
+                         "artists": [self._artist_ref(aid)], "images": []}
+                self.albums[alid] = album
+                self.artist_albums[aid].append(alid)
+                for t in range(tracks_per_album):
+                    self._add_track(rng, aid, album, t)
+        self.genres = sorted({g for a in self.artists.values() for g in a["genres"]})
+
+    def _artist_ref(self, aid):
+        a = self.artists[aid]
+        return {"id": aid, "name": a["name"], "type": "artist", "uri": a["uri"]}
+
+    def _add_track(self, rng, aid, album, n):
+        tid = _sid("track", self.seed, album["id"], n)
+        artists = [self._artist_ref(aid)]
+        if rng.random() < 0.15:
+            artists.append(self._artist_ref(rng.choice(list(self.artists))))
+        self.tracks[tid] = {
+            "id": tid, "type": "track", "uri": f"spotify:track:{tid}", "is_local": False,
+            "name": _title(rng, rng.randint(1, 3)) + rng.choice(TITLE_SUFFIXES),
+            "artists": artists, "duration_ms": rng.randint(120_000, 300_000),
+            "popularity": max(0, min(100, self.artists[aid]["popularity"] + rng.randint(-20, 20))),
+            "explicit": rng.random() < 0.2, "track_number": n + 1, "disc_number": 1,
+            "album": {k: album[k] for k in ("id", "type", "uri", "name", "album_type", "release_date",
+                                             "release_date_precision", "artists", "images")},
+            "external_urls": {"spotify": f"https://open.spotify.com/track/{tid}"},
+        }
+        self.album_tracks[album["id"]].append(tid)
+        self.artist_tracks[aid].append(tid)
+
+    def playlist(self, pid: str) -> dict:
+        """Any playlist id resolves to a deterministic playlist built from the catalog."""
+        pl = self.playlists.get(pid)
+        if pl is None:
+            rng = random.Random(f"{self.seed}/{pid}")
+            ids = rng.sample(sorted(self.tracks), min(len(self.tracks), rng.randint(*self.playlist_size)))
+            pl = self.playlists[pid] = {
+                "id": pid, "type": "playlist", "uri": f"spotify:playlist:{pid}",
+                "name": f"{_title(rng, 2)} Mix", "description": "stand-in playlist",
+                "snapshot_id": _sid("snapshot", pid), "public": True,
+                "owner": {"id": "standin", "display_name": "Stand-in"},
+                "track_ids": ids,
+            }
+        return pl
+
+    # ---------- recorded catalogs ----------
+    def dump(self, path: str):
+        with open(path, "w") as f:
+            json.dump({"artists": list(self.artists.values()), "albums": list(self.albums.values()),
+                       "tracks": list(self.tracks.values()),
+                       "playlists": {k: v for k, v in self.playlists.items()}}, f)
+
+    @classmethod
+    def load(cls, path: str) -> "Catalog":
+        with open(path) as f:
+            data = json.load(f)
+        cat = cls(n_artists=0)
+        for a in data.get("artists", []):
+            cat.artists[a["id"]] = a
+        for al in data.get("albums", []):
+            cat.albums[al["id"]] = al
+            for ar in al.get("artists", []):
+                cat.artist_albums[ar["id"]].append(al["id"])
+        for t in data.get("tracks", []):
+            cat.tracks[t["id"]] = t
+            alid = (t.get("album") or {}).get("id")
+            if alid:
+                cat.album_tracks[alid].append(t["id"])
+            for ar in t.get("artists", []):
+                cat.artist_tracks[ar["id"]].append(t["id"])
+        cat.playlists.update(data.get("playlists", {}))
+        cat.genres = sorted({g for a in cat.artists.values() for g in a.get("genres", [])}) or list(GENRES)
+        return cat
+
+    # ---------- search ----------
+    def search(self, q: str, kind: str):
+        artist_filter = None
+        if 'artist:"' in q:
+            pre, _, rest = q.partition('artist:"')
+            artist_filter, _, post = rest.partition('"')
+            q = pre + " " + post
+        elif "artist:" in q:
+            pre, _, rest = q.partition("artist:")
+            artist_filter, _, post = rest.partition(" ")
+            q = pre + " " + post
+        terms = [t for t in q.lower().split() if ":" not in t]
+        af = artist_filter.lower() if artist_filter else None
+        if kind == "artist":
+            return [a for a in self.artists.values()
+                    if all(t in a["name"].lower() for t in terms)
+                    and (af is None or af in a["name"].lower())]
+        out = []
+        for t in self.tracks.values():
+            names = " ".join(a["name"] for a in t["artists"]).lower()
+            if af is not None and af not in names:
+                continue
+            hay = f"{t['name']} {names} {t['album']['name']}".lower()
+            if all(term in hay for term in terms):
+                out.append(t)
+        return out
+
+# ======== Playback simulation ========
+class Player:
+    """One user's playback. The clock runs `speed` times faster than real time."""
+
+    def __init__(self, catalog: Catalog, speed: float = 1.0, idle: bool = False):
+        self.catalog, self.speed = catalog, speed
+        self.devices = [
+            {"id": "standin-device-1", "name": "Stand-in Speaker", "type": "Computer",
+             "is_active": not idle, "is_private_session": False, "is_restricted": False, "volume_percent": 60},
+            {"id": "standin-device-2", "name": "Stand-in Phone", "type": "Smartphone",
+             "is_active": False, "is_private_session": False, "is_restricted": False, "volume_percent": 40},
+        ]
+        self.current = None          # track id
+        self.context = deque()       # remaining tracks of the started context
+        self.context_id = None       # playlist id when the context is a playlist
+        self.queue = deque()         # user queue (add_to_queue), played before the context
+        self.is_playing = False
+        self.position_ms = 0.0
+        self.updated = time.monotonic()
+        self.started_tracks = 0
+        if not idle and catalog.tracks:
+            # something paused on the device, like a real Spotify client left open
+            ids = catalog.playlist("standin0default0playlst")["track_ids"][:50]
+            self.current, self.context = ids[0], deque(ids[1:])
+
+    def _tick(self):
+        now = time.monotonic()
+        if self.is_playing and self.current:
+            self.position_ms += (now - self.updated) * 1000.0 * self.speed
+            while self.current and self.position_ms >= self.catalog.tracks[self.current]["duration_ms"]:
+                self.position_ms -= self.catalog.tracks[self.current]["duration_ms"]
+                self._advance()
+        self.updated = now
+
+    def _advance(self):
+        nxt = self.queue.popleft() if self.queue else (self.context.popleft() if self.context else None)
+        self.current = nxt
+        if nxt:
+            self.started_tracks += 1
+        else:
+            self.is_playing, self.position_ms = False, 0.0
+
+    def active_device(self):
+        return next((d for d in self.devices if d["is_active"]), None)
+
+    def activate(self, device_id):
+        if device_id and not any(d["id"] == device_id for d in self.devices):
+            return False
+        if device_id:
+            for d in self.devices:
+                d["is_active"] = d["id"] == device_id
+        return self.active_device() is not None
+
+    def state(self):
+        self._tick()
+        if not self.current:
+            return None
+        return {"device": self.active_device(), "is_playing": self.is_playing,
+                "progress_ms": int(self.position_ms), "timestamp": int(time.time() * 1000),
+                "shuffle_state": False, "repeat_state": "off",
+                "currently_playing_type": "track", "item": self.catalog.tracks[self.current]}
+
+    def play(self, uris=None, context_uri=None, offset=None, position_ms=None):
+        self._tick()
+        self.context_id = None
+        if context_uri:
+            cid = context_uri.split(":")[-1]
+            self.context_id = cid if ":playlist:" in context_uri else None
+            if ":playlist:" in context_uri:
+                ids = list(self.catalog.playlist(cid)["track_ids"])
+            elif ":album:" in context_uri:
+                ids = list(self.catalog.album_tracks.get(cid, []))
+            else:
+                ids = list(self.catalog.artist_tracks.get(cid, []))[:10]
+            start = 0
+            if isinstance(offset, dict):
+                if "position" in offset:
+                    start = int(offset["position"])
+                elif "uri" in offset and offset["uri"].split(":")[-1] in ids:
+                    start = ids.index(offset["uri"].split(":")[-1])
+            ids = ids[start:]
+        elif uris:
+            ids = [u.split(":")[-1] for u in uris]
+            if isinstance(offset, dict) and "position" in offset:
+                ids = ids[int(offset["position"]):]
+        else:
+            ids = None
+        if ids is not None:
+            ids = [i for i in ids if i in self.catalog.tracks]
+            if not ids:
+                return False
+            self.current, self.context = ids[0], deque(ids[1:])
+            self.position_ms = float(position_ms or 0)
+            self.started_tracks += 1
+        if not self.current:
+            return False
+        self.is_playing = True
+        return True
+
+    def extend_context(self, pid: str, ids):
+        # tracks added to the playlist being played join the end of its context
+        if pid == self.context_id:
+            self.context.extend(ids)
+
+    def pause(self):
+        self._tick()
+        self.is_playing = False
+
+    def next(self):
+        self._tick()
+        self.position_ms = 0.0
+        self._advance()
+
+    def previous(self):
+        self._tick()
+        self.position_ms = 0.0
+
+    def seek(self, position_ms: int):
+        self._tick()
+        self.position_ms = float(max(0, position_ms))
+
+    def upcoming(self, n=20):
+        return (list(self.queue) + list(self.context))[:n]
+
+# ======== HTTP ========
+class StandinState:
+    def __init__(self, catalog: Catalog, args):
+        self.catalog = catalog
+        self.args = args
+        self.lock = threading.Lock()
+        self.player = Player(catalog, args.speed, args.idle)
+        self.rng = random.Random(args.seed)
+        self.window = deque()          # request timestamps for --rate-limit
+        self.counts = defaultdict(int)
+        self.throttled = 0
+        self.saved = set()
+        self.user_playlists = []       # ids created through POST me/playlists
+
+    def reset(self):
+        with self.lock:
+            self.player = Player(self.catalog, self.args.speed, self.args.idle)
+            self.window.clear()
+            self.counts.clear()
+            self.throttled = 0
+
+class Handler(BaseHTTPRequestHandler):
+    server_version = "SpotifyStandin/1.0"
+    protocol_version = "HTTP/1.1"   # keep-alive, like the real API; every response sets Content-Length
+    state: StandinState = None
+
+    def log_message(self, fmt, *args):
+        if self.state.args.verbose:
+            super().log_message(fmt, *args)
+
+    # ---------- plumbing ----------
+    def _send(self, status: int, body=None, headers=None):
+        data = b"" if body is None else json.dumps(body).encode()
+        self.send_response(status)
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        if body is not None:
+            self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        if data:
+            self.wfile.write(data)
+
+    def _error(self, status: int, message: str, headers=None):
+        self._send(status, {"error": {"status": status, "message": message}}, headers)
+
+    def _body(self) -> dict:
+        n = int(self.headers.get("Content-Length") or 0)
+        if not n:
+            return {}
+        try:
+            return json.loads(self.rfile.read(n) or b"{}")
+        except ValueError:
+            return {}
+
+    def _base(self) -> str:
+        return f"http://{self.headers.get('Host') or '127.0.0.1'}/v1/"
+
+    def _page(self, path: str, items: list, q: dict, default_limit=20, max_limit=50, extra=None):
+        limit = max(1, min(max_limit, int(q.get("limit", default_limit))))
+        offset = max(0, int(q.get("offset", 0)))
+        chunk = items[offset:offset + limit]
+        def link(off):
+            params = dict(q, limit=limit, offset=off)
+            return f"{self._base()}{path}?{urlencode(params)}"
+        page = {"href": link(offset), "items": chunk, "limit": limit, "offset": offset,
+                "total": len(items), "next": link(offset + limit) if offset + limit < len(items) else None,
+                "previous": link(max(0, offset - limit)) if offset > 0 else None}
+        page.update(extra or {})
+        return page
+
+    def _throttle(self) -> bool:
+        """Apply injected latency / 429s. Returns True if a 429 was sent."""
+        args, st = self.state.args, self.state
+        with st.lock:
+            delay = max(0.0, args.latency_ms + st.rng.uniform(-args.jitter_ms, args.jitter_ms)) / 1000.0
+            now = time.monotonic()
+            limited = False
+            if args.rate_limit > 0:
+                while st.window and now - st.window[0] > 1.0:
+                    st.window.popleft()
+                if len(st.window) >= args.rate_limit:
+                    limited = True
+                else:
+                    st.window.append(now)
+            if not limited and args.error_rate > 0 and st.rng.random() < args.error_rate:
+                limited = True
+            if limited:
+                st.throttled += 1
+        if delay:
+            time.sleep(delay)
+        if limited:
+            self._error(429, "API rate limit exceeded", {"Retry-After": str(args.retry_after)})
+        return limited
+
+    def _dispatch(self, method: str):
+        # read the body before any early answer, or its bytes are parsed as the next
+        # request on this keep-alive connection
+        body = self._body()
+        url = urlparse(self.path)
+        path = url.path
+        q = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        if path.startswith("/_standin/"):
+            return self._admin(method, path)
+        if not path.startswith("/v1/"):
+            return self._error(404, "Not found")
+        path = path[len("/v1/"):].strip("/")
+        if not (self.headers.get("Authorization") or "").startswith("Bearer "):
+            return self._error(401, "No token provided")
+        if self._throttle():
+            return
+        parts = path.split("/")
+        route = "/".join("{id}" if len(p) == 22 else p for p in parts)
+        with self.state.lock:
+            self.state.counts[f"{method} {route}"] += 1
+        handler = getattr(self, "_" + method.lower() + "_" + parts[0].replace("-", "_"), None)
+        if handler is None:
+            return self._error(404, f"Stand-in does not implement {method} /{path}")
+        try:
+            return handler(parts[1:], q, body)
+        except (KeyError, IndexError):
+            return self._error(404, "Not found")
+        except ValueError as e:
+            return self._error(400, str(e))
+
+    def do_GET(self):    self._dispatch("GET")
+    def do_PUT(self):    self._dispatch("PUT")
+    def do_POST(self):   self._dispatch("POST")
+    def do_DELETE(self): self._dispatch("DELETE")
+
+    def _admin(self, method, path):
+        st = self.state
+        if path == "/_standin/stats":
+            with st.lock:
+                return self._send(200, {"requests": dict(sorted(st.counts.items())),
+                                        "total": sum(st.counts.values()), "throttled": st.throttled,
+                                        "tracks_started": st.player.started_tracks})
+        if path == "/_standin/reset" and method == "POST":
+            st.reset()
+            return self._send(200, {"ok": True})
+        return self._error(404, "Not found")
+
+    # ---------- catalog ----------
+    def _get_search(self, rest, q, body):
+        cat = self.state.catalog
+        out = {}
+        for kind in (q.get("type") or "track").split(","):
+            items = cat.search(q.get("q", ""), kind)
+            out[kind + "s"] = self._page("search", items, q)
+        return self._send(200, out)
+
+    def _get_artists(self, rest, q, body):
+        cat = self.state.catalog
+        if not rest:
+            return self._send(200, {"artists": [cat.artists.get(i) for i in q.get("ids", "").split(",")]})
+        aid = rest[0]
+        if aid not in cat.artists:
+            return self._error(404, "non existing id")
+        if len(rest) == 1:
+            return self._send(200, cat.artists[aid])
+        if rest[1] == "top-tracks":
+            tracks = sorted((cat.tracks[t] for t in cat.artist_tracks[aid]), key=lambda t: -t["popularity"])
+            return self._send(200, {"tracks": tracks[:10]})
+        if rest[1] == "albums":
+            return self._send(200, self._page(f"artists/{aid}/albums", [cat.albums[a] for a in cat.artist_albums[aid]], q))
+        if rest[1] == "related-artists":
+            genres = set(cat.artists[aid]["genres"])
+            rel = [a for a in cat.artists.values() if a["id"] != aid and genres & set(a["genres"])]
+            return self._send(200, {"artists": rel[:20]})
+        return self._error(404, "Not found")
+
+    def _get_albums(self, rest, q, body):
+        cat = self.state.catalog
+        alid = rest[0]
+        if alid not in cat.albums:
+            return self._error(404, "non existing id")
+        if len(rest) > 1 and rest[1] == "tracks":
+            return self._send(200, self._page(f"albums/{alid}/tracks", [cat.tracks[t] for t in cat.album_tracks[alid]], q))
+        return self._send(200, cat.albums[alid])
+
+    def _get_tracks(self, rest, q, body):
+        cat = self.state.catalog
+        if not rest:
+            return self._send(200, {"tracks": [cat.tracks.get(i) for i in q.get("ids", "").split(",")]})
+        if rest[0] not in cat.tracks:
+            return self._error(404, "non existing id")
+        return self._send(200, cat.tracks[rest[0]])
+
+    def _get_playlists(self, rest, q, body):
+        cat = self.state.catalog
+        pl = cat.playlist(rest[0])
+        items = [{"added_at": "2024-01-01T00:00:00Z", "is_local": False, "track": cat.tracks[t]}
+                 for t in pl["track_ids"] if t in cat.tracks]
+        if len(rest) > 1 and rest[1] in ("tracks", "items"):
+            return self._send(200, self._page(f"playlists/{pl['id']}/{rest[1]}", items, q, 100, 100))
+        out = {k: v for k, v in pl.items() if k != "track_ids"}
+        out["tracks"] = self._page(f"playlists/{pl['id']}/tracks", items, {}, 100, 100)
+        return self._send(200, out)
+
+    def _write_playlist(self, rest, q, body, replace: bool):
+        st = self.state
+        pl = st.catalog.playlists.get(rest[0])
+        if pl is None or rest[1] not in ("tracks", "items"):
+            return self._error(404, "Not found")
+        uris = body if isinstance(body, list) else (body.get("uris") or [])
+        if len(uris) > 100:
+            raise ValueError("You can add a maximum of 100 tracks per request.")
+        ids = [u.split(":")[-1] for u in uris if u.split(":")[-1] in st.catalog.tracks]
+        with st.lock:
+            if replace:
+                pl["track_ids"] = ids
+            else:
+                pos = q.get("position")
+                if pos is None:
+                    pl["track_ids"].extend(ids)
+                    st.player.extend_context(pl["id"], ids)
+                else:
+                    pl["track_ids"][int(pos):int(pos)] = ids
+            pl["snapshot_id"] = _sid("snapshot", pl["id"], len(pl["track_ids"]), time.time())
+        return self._send(200 if replace else 201, {"snapshot_id": pl["snapshot_id"]})
+
+    def _put_playlists(self, rest, q, body):
+        return self._write_playlist(rest, q, body, replace=True)
+
+    def _post_playlists(self, rest, q, body):
+        return self._write_playlist(rest, q, body, replace=False)
+
+    def _get_recommendations(self, rest, q, body):
+        cat = self.state.catalog
+        if rest and rest[0] == "available-genre-seeds":
+            return self._send(200, {"genres": cat.genres})
+        limit = max(1, min(100, int(q.get("limit", 20))))
+        seed_artists = [a for a in q.get("seed_artists", "").split(",") if a in cat.artists]
+        genres = set(g for g in q.get("seed_genres", "").split(",") if g)
+        for a in seed_artists:
+            genres.update(cat.artists[a]["genres"])
+        for t in (x for x in q.get("seed_tracks", "").split(",") if x in cat.tracks):
+            for a in cat.tracks[t]["artists"]:
+                genres.update(cat.artists.get(a["id"], {}).get("genres", []))
+        pool = [t for t in cat.tracks.values()
+                if not genres or genres & set(cat.artists.get(t["artists"][0]["id"], {}).get("genres", []))]
+        rng = random.Random(json.dumps(q, sort_keys=True))
+        picks = rng.sample(pool, min(limit, len(pool)))
+        return self._send(200, {"tracks": picks, "seeds": [{"id": s, "type": "ARTIST"} for s in seed_artists]})
+
+    # ---------- me ----------
+    def _get_me(self, rest, q, body):
+        st, cat = self.state, self.state.catalog
+        if not rest or rest == [""]:
+            return self._send(200, {"id": "standin-user", "display_name": "Stand-in User",
+                                    "country": "IN", "product": "premium", "type": "user"})
+        if rest[0] == "top":
+            if rest[1] == "artists":
+                items = sorted(cat.artists.values(), key=lambda a: -a["popularity"])
+            else:
+                items = sorted(cat.tracks.values(), key=lambda t: -t["popularity"])[:500]
+            rng = random.Random(q.get("time_range", "medium_term"))
+            items = rng.sample(items[:200], min(len(items), 100))
+            return self._send(200, self._page(f"me/top/{rest[1]}", items, q))
+        if rest[0] in ("tracks", "library"):
+            items = [{"added_at": "2024-01-01T00:00:00Z", "track": cat.tracks[t]} for t in sorted(st.saved)]
+            return self._send(200, self._page("me/tracks", items, q))
+        if rest[0] == "playlists":
+            items = [{k: v for k, v in cat.playlists[p].items() if k != "track_ids"} for p in st.user_playlists]
+            return self._send(200, self._page("me/playlists", items, q))
+        if rest[0] != "player":
+            return self._error(404, "Not found")
+        with st.lock:
+            p = st.player
+            sub = rest[1] if len(rest) > 1 else ""
+            if sub == "devices":
+                return self._send(200, {"devices": [dict(d) for d in p.devices]})
+            if sub == "queue":
+                s = p.state()
+                return self._send(200, {"currently_playing": s["item"] if s else None,
+                                        "queue": [cat.tracks[t] for t in p.upcoming()]})
+            if sub in ("", "currently-playing"):
+                s = p.state()
+                return self._send(200, s) if s else self._send(204)
+        return self._error(404, "Not found")
+
+    def _put_me(self, rest, q, body):
+        st = self.state
+        if rest and rest[0] in ("tracks", "library"):
+            ids = [i.split(":")[-1] for i in (q.get("ids") or q.get("uris") or "").split(",") if i]
+            ids += [i.split(":")[-1] for i in body.get("ids", [])]
+            with st.lock:
+                st.saved.update(i for i in ids if i in st.catalog.tracks)
+            return self._send(200, {})
+        if not rest or rest[0] != "player":
+            return self._error(404, "Not found")
+        sub = rest[1] if len(rest) > 1 else ""
+        with st.lock:
+            p = st.player
+            if sub == "":
+                ids = body.get("device_ids") or []
+                if not ids or not p.activate(ids[0]):
+                    return self._error(404, "Device not found")
+                if body.get("play") and p.current:
+                    p.play()
+                return self._send(204)
+            if not p.activate(q.get("device_id")):
+                return self._error(404, "Player command failed: No active device found")
+            if sub == "play":
+                if not p.play(body.get("uris"), body.get("context_uri"), body.get("offset"), body.get("position_ms")):
+                    return self._error(404, "Player command failed: Nothing to play")
+            elif sub == "pause":
+                p.pause()
+            elif sub == "seek":
+                p.seek(int(q.get("position_ms", 0)))
+            elif sub == "volume":
+                vol = int(q.get("volume_percent", 50))
+                if not 0 <= vol <= 100:
+                    raise ValueError("Invalid volume")
+                p.active_device()["volume_percent"] = vol
+            elif sub in ("shuffle", "repeat"):
+                pass
+            else:
+                return self._error(404, "Not found")
+        return self._send(204)
+
+    def _post_me(self, rest, q, body):
+        st = self.state
+        if rest and rest[0] == "playlists":
+            with st.lock:
+                pid = _sid("user-playlist", len(st.user_playlists), body.get("name", ""))
+                st.catalog.playlists[pid] = {
+                    "id": pid, "type": "playlist", "uri": f"spotify:playlist:{pid}",
+                    "name": body.get("name") or "New Playlist", "description": body.get("description", ""),
+                    "snapshot_id": _sid("snapshot", pid, 0), "public": bool(body.get("public", True)),
+                    "owner": {"id": "standin-user", "display_name": "Stand-in User"}, "track_ids": [],
+                }
+                st.user_playlists.append(pid)
+                out = {k: v for k, v in st.catalog.playlists[pid].items() if k != "track_ids"}
+            return self._send(201, out)
+        if len(rest) < 2 or rest[0] != "player":
+            return self._error(404, "Not found")
+        with st.lock:
+            p = st.player
+            if not p.activate(q.get("device_id")):
+                return self._error(404, "Player command failed: No active device found")
+            if rest[1] == "queue":
+                tid = (q.get("uri") or "").split(":")[-1]
+                if tid not in st.catalog.tracks:
+                    return self._error(400, "Invalid track uri")
+                p._tick()
+                if not p.current:
+                    return self._error(404, "Player command failed: No active playback")
+                p.queue.append(tid)
+            elif rest[1] == "next":
+                p.next()
+            elif rest[1] == "previous":
+                p.previous()
+            else:
+                return self._error(404, "Not found")
+        return self._send(204)
+
+class StandinHTTPServer(ThreadingHTTPServer):
+    request_queue_size = 128   # concurrent fan-out clients open many connections at once
+
+def main():
+    ap = argparse.ArgumentParser(description="Local stand-in for the Spotify Web API.")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8901)
+    ap.add_argument("--seed", type=int, default=7, help="synthetic catalog / jitter seed")
+    ap.add_argument("--artists", type=int, default=200, help="synthetic catalog size (artists)")
+    ap.add_argument("--catalog", help="load a recorded catalog JSON instead of generating one")
+    ap.add_argument("--dump-catalog", help="write the generated catalog to this path and exit")
+    ap.add_argument("--playlist-size", default="80-400", help="track count range of generated playlists, e.g. 800-1200")
+    ap.add_argument("--speed", type=float, default=1.0, help="playback clock multiplier (60 = a minute per second)")
+    ap.add_argument("--idle", action="store_true", help="start with no active device")
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    ap.add_argument("--jitter-ms", type=float, default=0.0)
+    ap.add_argument("--rate-limit", type=int, default=0, help="429 above this many requests/second (0 = off)")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with a 429")
+    ap.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds on injected 429s")
+    ap.add_argument("--verbose", action="store_true")
+    args = ap.parse_args()
+
+    catalog = Catalog.load(args.catalog) if args.catalog else Catalog(seed=args.seed, n_artists=args.artists)
+    if args.dump_catalog:
+        catalog.dump(args.dump_catalog)
+        print(f"✅ Catalog written to {args.dump_catalog}")
+        return
+    lo, _, hi = args.playlist_size.partition("-")
+    catalog.playlist_size = (int(lo), int(hi or lo))
+
+    Handler.state = StandinState(catalog, args)
+    server = StandinHTTPServer((args.host, args.port), Handler)
+    server.daemon_threads = True
+    print(f"🎧 Spotify stand-in on http://{args.host}:{args.port}/v1/  "
+          f"({len(catalog.artists)} artists, {len(catalog.tracks)} tracks)")
+    print(f"   SPOTIFY_API_BASE=http://{args.host}:{args.port}/v1/  SPOTIFY_ACCESS_TOKEN=standin")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nBye.")
+
+if __name__ == "__main__":
+    main()
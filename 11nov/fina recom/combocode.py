@@ -9,6 +9,10 @@ from tqdm import tqdm
 import spotipy
 from spotipy.oauth2 import SpotifyOAuth
 
+# Shared Spotify helpers live in ../Models
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Models"))
+from spotify_scheduler import ScheduledSpotify
+
 # Import configuration
 try:
     from config import Config
@@ -46,7 +50,7 @@ def spotify_client() -> spotipy.Spotify:
         scope=SCOPES,
         cache_path=os.path.join(HERE, Config.SPOTIFY_CACHE_PATH)
     )
-    return spotipy.Spotify(auth_manager=auth, requests_timeout=30, retries=3)
+    return ScheduledSpotify(auth_manager=auth, requests_timeout=30)
 
 
 def parse_playlist_id(url: str) -> Optional[str]:
@@ -39,6 +39,10 @@ class Config:
     # Cache path for OAuth tokens
     SPOTIFY_CACHE_PATH = os.environ.get('SPOTIFY_CACHE_PATH', '.cache_spotify_export')
     
+    # Local stand-in API (../bench/standin_server.py); read by ../Models/spotify_scheduler.py
+    SPOTIFY_API_BASE = os.environ.get('SPOTIFY_API_BASE')
+    SPOTIFY_ACCESS_TOKEN = os.environ.get('SPOTIFY_ACCESS_TOKEN')
+    
     # Recommendation system settings
     INITIAL_COUNT = int(os.environ.get('INITIAL_COUNT', '50'))
     APPEND_EVERY_N = int(os.environ.get('APPEND_EVERY_N', '15'))
@@ -71,6 +75,8 @@ class Config:
         """Print current configuration (without sensitive data)"""
         print("Fina Recom Configuration:")
         print(f"   Market: {cls.SPOTIFY_MARKET}")
+        if cls.SPOTIFY_API_BASE:
+            print(f"   Spotify API Base: {cls.SPOTIFY_API_BASE}")
         print(f"   Redirect URI: {cls.SPOTIPY_REDIRECT_URI}")
         print(f"   Spotify Client ID: {'Set' if cls.SPOTIPY_CLIENT_ID else 'Not Set'}")
         print(f"   Spotify Client Secret: {'Set' if cls.SPOTIPY_CLIENT_SECRET else 'Not Set'}")
@@ -96,6 +102,10 @@ SPOTIFY_MARKET=IN
 SPOTIFY_SCOPES=playlist-read-private playlist-read-collaborative user-top-read user-modify-playback-state user-read-playback-state user-read-currently-playing
 SPOTIFY_CACHE_PATH=.cache_spotify_export
 
+# Local stand-in API (optional)
+# SPOTIFY_API_BASE=http://127.0.0.1:8901/v1/
+# SPOTIFY_ACCESS_TOKEN=standin
+
 # Recommendation System Settings
 INITIAL_COUNT=50
 APPEND_EVERY_N=15
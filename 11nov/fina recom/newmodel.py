@@ -2,16 +2,24 @@
 # Queue-based player (no playlist context). Builds an initial queue, then
 # keeps appending new recommendations as you listen.
 
-import os, json, random, time, threading
+import os, sys, json, random, time, threading
 from typing import Dict, Any, List, Tuple, Optional, Set
 from dataclasses import dataclass
 from datetime import datetime
 from dateutil import parser as dateparser
 
-import spotipy
 from spotipy.oauth2 import SpotifyOAuth
 from spotipy.exceptions import SpotifyException
 
+# Shared Spotify helpers live in ../Models
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Models"))
+from device_registry import get_registry
+from spotify_scheduler import ScheduledSpotify, set_thread_lane
+from playback_start import start_tracks, append_tracks
+from playback_watcher import get_watcher
+from session_events import publish
+from next_batch import NextBatch
+
 # Import configuration
 try:
     from config import Config
@@ -87,6 +95,8 @@ STRATEGY_WEIGHTS = {
     }
 }
 
+TRACKS_BULK_MAX = 50   # sp.tracks() limit per request
+
 # Tunables for selection windows
 TOP_N_BOOST = Config.TOP_N_BOOST
 ALBUM_TOP_N = Config.ALBUM_TOP_N
@@ -103,7 +113,7 @@ class QueuePlayer:
         self.mode = mode if mode in STRATEGY_WEIGHTS else "balanced"
         self.strategy_weights = STRATEGY_WEIGHTS[self.mode]
 
-        self.sp = spotipy.Spotify(auth_manager=SpotifyOAuth(
+        self.sp = ScheduledSpotify(auth_manager=SpotifyOAuth(
             client_id=CLIENT_ID,
             client_secret=CLIENT_SECRET,
             redirect_uri=REDIRECT_URI,
@@ -142,7 +152,12 @@ class QueuePlayer:
         self.last_track_id: Optional[str] = None
         self.tracks_played_since_append = 0
 
-        # Device
+        # Session-wide track metadata (id -> track object). Strategies hand over the
+        # tracks they already fetched; anything else is resolved 50 at a time.
+        self.track_meta: Dict[str, Dict[str, Any]] = {}
+
+        # Device (cached, shared device registry)
+        self.devices = get_registry()
         self.device_id = self._pick_device()
         if not self.device_id:
             raise RuntimeError("No active Spotify device found. Open Spotify on any device and try again.")
@@ -190,30 +205,47 @@ class QueuePlayer:
 
     # ---------- Spotify helpers ----------
     def _devices(self):
-        return self.sp.devices().get("devices", [])
+        return self.devices.devices(self.sp)
 
     def _pick_device(self) -> Optional[str]:
-        devs = self._devices()
-        for d in devs:
-            if d.get("is_active"): return d["id"]
-        return devs[0]["id"] if devs else None
+        return self.devices.active_device_id(self.sp)
 
-    def _transfer_and_play_single(self, track_id: str):
+    def _transfer_and_play(self, track_ids: List[str]) -> dict:
         try:
-            self.sp.transfer_playback(self.device_id, force_play=True)
+            self.devices.transfer(self.sp, self.device_id, force_play=True)
             time.sleep(0.2)
         except SpotifyException:
             pass
-        self.sp.start_playback(device_id=self.device_id, uris=[f"spotify:track:{track_id}"], position_ms=0)
-
-    def _add_to_queue(self, track_id: str):
-        self.sp.add_to_queue(uri=f"spotify:track:{track_id}", device_id=self.device_id)
-
-    def _current_playback(self):
-        try:
-            return self.sp.current_playback()
-        except SpotifyException:
-            return None
+        # whole batch in one start (see Models/playback_start.py)
+        return start_tracks(self.sp, self.device_id, [f"spotify:track:{t}" for t in track_ids], label="fina recom")
+
+    # ---------- Track metadata ----------
+    def _remember(self, track: Optional[Dict[str, Any]]):
+        if not track or not track.get("id") or not track.get("artists"):
+            return
+        known = self.track_meta.get(track["id"])
+        # don't let a simplified object (album_tracks) replace a full one
+        if known is None or (track.get("album") and not known.get("album")):
+            self.track_meta[track["id"]] = track
+
+    def _ensure_meta(self, track_ids: List[str]):
+        missing = list(dict.fromkeys(t for t in track_ids if t and t not in self.track_meta))
+        for i in range(0, len(missing), TRACKS_BULK_MAX):
+            chunk = missing[i:i + TRACKS_BULK_MAX]
+            for tr in self.sp.tracks(chunk, market=MARKET).get("tracks", []) or []:
+                self._remember(tr)
+
+    def _artist_ref(self, artist_id: str) -> Dict[str, Any]:
+        # the profile already has long-term artist names; only unknown ids hit the API
+        for a in self.long_artists:
+            if a.get("id") == artist_id and a.get("name"):
+                return a
+        return self.sp.artist(artist_id)
+
+    def _track(self, track_id: str) -> Optional[Dict[str, Any]]:
+        if track_id not in self.track_meta:
+            self._ensure_meta([track_id])
+        return self.track_meta.get(track_id)
 
     # ---------- Utility ----------
     def _pick_weighted(self, items_with_weights: List[Tuple[Any, float]]):
@@ -228,7 +260,7 @@ class QueuePlayer:
     # ---------- Core Strategies ----------
     def strategy_artist_top_tracks(self):
         aid = self._pick_weighted(self.artist_weights)
-        art = self.sp.artist(aid)
+        art = self._artist_ref(aid)
         tops = self.sp.artist_top_tracks(aid, country=MARKET).get("tracks", [])
         if not tops:
             res = self.sp.search(q=f'artist:"{art["name"]}"', type="track", market=MARKET, limit=20)
@@ -237,11 +269,11 @@ class QueuePlayer:
         win = ALBUM_TOP_N + (0 if self.mode=="comfort" else 2 if self.mode=="balanced" else 5)
         picks = tops[:max(1, min(win, len(tops)))]
         t = random.choice(picks)
-        return t["id"], Reason("artist_top_tracks", f"Weighted long-term artist -> {art['name']}")
+        return t, Reason("artist_top_tracks", f"Weighted long-term artist -> {art['name']}")
 
     def strategy_artist_album_pick(self):
         aid = self._pick_weighted(self.artist_weights)
-        art = self.sp.artist(aid)
+        art = self._artist_ref(aid)
         albums = self.sp.artist_albums(aid, album_type="album,single", country=MARKET, limit=50).get("items", [])
         if not albums: return self.strategy_artist_top_tracks()
         def parse_date(d):
@@ -253,7 +285,9 @@ class QueuePlayer:
         if not tracks: return self.strategy_artist_top_tracks()
         win = ALBUM_TOP_N + (0 if self.mode=="comfort" else 3 if self.mode=="balanced" else 7)
         t = random.choice(tracks[:max(1, min(win, len(tracks)))])
-        return t["id"], Reason("artist_album_pick", f"{art['name']} -> album {chosen['name']}")
+        # album_tracks items are simplified (no album); attach the one we picked from
+        t = dict(t, album={k: chosen.get(k) for k in ("id", "name", "release_date")})
+        return t, Reason("artist_album_pick", f"{art['name']} -> album {chosen['name']}")
 
     def strategy_era_year_bias(self):
         if self.decade_weights:
@@ -270,7 +304,7 @@ class QueuePlayer:
         exp = 1.5 if self.mode=="comfort" else 1.2 if self.mode=="balanced" else 0.8
         pops = [max(1, (t.get("popularity") or 50) ** exp) for t in tracks]
         t = random.choices(tracks, weights=pops, k=1)[0]
-        return t["id"], Reason("era_year_bias", f"Favored year {year} ({(year//10)*10}s)")
+        return t, Reason("era_year_bias", f"Favored year {year} ({(year//10)*10}s)")
 
     def strategy_genre_explore(self):
         """ALL-TIME genres only (top_genres_all_time)."""
@@ -295,7 +329,7 @@ class QueuePlayer:
                 if tops:
                     win = RELATED_MAX + (0 if self.mode=="comfort" else 2 if self.mode=="balanced" else 5)
                     t = random.choice(tops[:max(1, min(win, len(tops)))])
-                    return t["id"], Reason("genre_explore", f"All-time genre '{genre}' -> {pick_artist['name']}")
+                    return t, Reason("genre_explore", f"All-time genre '{genre}' -> {pick_artist['name']}")
             # Final fallback: a top track from a long-term artist
             return self.strategy_artist_top_tracks()
 
@@ -306,7 +340,7 @@ class QueuePlayer:
             return self.strategy_artist_top_tracks()
         win = RELATED_MAX + (0 if self.mode=="comfort" else 2 if self.mode=="balanced" else 5)
         t = random.choice(tops[:max(1, min(win, len(tops)))])
-        return t["id"], Reason("genre_explore", f"All-time genre '{genre}' -> {pick_a['name']}")
+        return t, Reason("genre_explore", f"All-time genre '{genre}' -> {pick_a['name']}")
 
     def strategy_favorite_throwback(self):
         if not self.favs:
@@ -318,10 +352,11 @@ class QueuePlayer:
             pool = self.favs[:25]
         else:
             pool = self.favs
+        # profile favorites carry no artist ids: resolve the whole pool in one bulk call (once per session)
+        self._ensure_meta([f["id"] for f in pool])
         pick = random.choice(pool)
-        tid = pick["id"]
-        tr = self.sp.track(tid)
-        return tid, Reason("favorite_throwback", f"Top-tracks throwback -> {tr['name']}")
+        tr = self.track_meta.get(pick["id"]) or {"id": pick["id"]}
+        return tr, Reason("favorite_throwback", f"Top-tracks throwback -> {pick.get('name') or tr.get('name')}")
 
     # ---------- New Strategies (short/medium & playlist-driven) ----------
     def strategy_short_term_boost(self):
@@ -332,7 +367,7 @@ class QueuePlayer:
         if not tops:
             return self.strategy_artist_top_tracks()
         t = random.choice(tops[:max(1, min(ALBUM_TOP_N+2, len(tops)))])
-        return t["id"], Reason("short_term_boost", f"Recent favorite artist -> {a['name']}")
+        return t, Reason("short_term_boost", f"Recent favorite artist -> {a['name']}")
 
     def strategy_medium_term_boost(self):
         if not self.medium_artists:
@@ -342,7 +377,7 @@ class QueuePlayer:
         if not tops:
             return self.strategy_artist_top_tracks()
         t = random.choice(tops[:max(1, min(ALBUM_TOP_N+3, len(tops)))])
-        return t["id"], Reason("medium_term_boost", f"Mid-term favorite artist -> {a['name']}")
+        return t, Reason("medium_term_boost", f"Mid-term favorite artist -> {a['name']}")
 
     def strategy_playlist_artist(self):
         if not self.playlist_artists:
@@ -354,7 +389,7 @@ class QueuePlayer:
         if not tops:
             return self.strategy_artist_top_tracks()
         t = random.choice(tops[:max(1, min(RELATED_MAX, len(tops)))])
-        return t["id"], Reason("playlist_artist", f"Playlist-heavy artist -> {a.get('name','(unknown)')}")
+        return t, Reason("playlist_artist", f"Playlist-heavy artist -> {a.get('name','(unknown)')}")
 
     def strategy_playlist_genre(self):
         """PLAYLIST genres only (from playlists_summary.top_genres)."""
@@ -375,18 +410,18 @@ class QueuePlayer:
             tops = self.sp.artist_top_tracks(aid, country=MARKET).get("tracks", [])
             if tops:
                 t = random.choice(tops[:max(1, min(RELATED_MAX+2, len(tops)))])
-                return t["id"], Reason("playlist_genre", f"Playlist genre '{genre}' -> {a.get('name','(artist)')}")
+                return t, Reason("playlist_genre", f"Playlist genre '{genre}' -> {a.get('name','(artist)')}")
 
         # Fallback: search tracks loosely by text (not perfect, but works broadly)
         res = self.sp.search(q=genre, type="track", market=MARKET, limit=20)
         picks = res.get("tracks", {}).get("items", [])
         if picks:
             t = random.choice(picks)
-            return t["id"], Reason("playlist_genre", f"Playlist genre '{genre}' -> text search pick")
+            return t, Reason("playlist_genre", f"Playlist genre '{genre}' -> text search pick")
         return self.strategy_artist_top_tracks()
 
     # ---------- Orchestrator ----------
-    def _generate_one(self) -> Tuple[str, Reason]:
+    def _generate_one(self) -> Tuple[Dict[str, Any], Reason]:
         strat = self._choose_strategy()
         if strat == "artist_top_tracks":   return self.strategy_artist_top_tracks()
         if strat == "artist_album_pick":   return self.strategy_artist_album_pick()
@@ -406,11 +441,12 @@ class QueuePlayer:
         while len(out) < n and attempts < n * 15:
             attempts += 1
             try:
-                tid, reason = self._generate_one()
+                track, reason = self._generate_one()
+                tid = track["id"]
                 if tid in self.queued_or_played:
                     continue
-                tr = self.sp.track(tid)
-                artist_id = tr["artists"][0]["id"] if tr.get("artists") else None
+                self._remember(track)
+                artist_id = self._get_artist_of_track(tid)
                 # avoid consecutive same artist
                 if (out and artist_id == self._get_artist_of_track(out[-1][0])) or (not out and artist_id == self.last_artist_id):
                     continue
@@ -421,8 +457,8 @@ class QueuePlayer:
 
     def _get_artist_of_track(self, track_id: str) -> Optional[str]:
         try:
-            tr = self.sp.track(track_id)
-            return tr["artists"][0]["id"] if tr.get("artists") else None
+            tr = self._track(track_id)
+            return tr["artists"][0]["id"] if tr and tr.get("artists") else None
         except Exception:
             return None
 
@@ -437,16 +473,15 @@ class QueuePlayer:
         first_batch = self._build_batch(INITIAL_COUNT)
         if not first_batch:
             raise RuntimeError("Could not build initial queue.")
-        # play 1st, queue rest
+        # the whole batch starts as one context
         first_track, first_reason = first_batch[0]
-        self._transfer_and_play_single(first_track)
+        self._transfer_and_play([tid for tid, _ in first_batch])
         self.queued_or_played.add(first_track)
         self.last_artist_id = self._get_artist_of_track(first_track)
         print("\nNow playing:")
         self._print_entry(first_track, first_reason)
 
         for tid, r in first_batch[1:]:
-            self._add_to_queue(tid)
             self.queued_or_played.add(tid)
             self._print_entry(tid, r, queued=True)
 
@@ -461,35 +496,42 @@ class QueuePlayer:
             print("\nBye.")
 
     def _watch_and_append(self):
-        while True:
-            try:
-                cur = self._current_playback()
-                if not cur or not cur.get("item"):
-                    time.sleep(3); continue
-                tid = cur["item"]["id"]
-                if tid and tid != self.last_track_id:
+        # appends run at background priority; track changes come from the shared playback watcher
+        set_thread_lane("background")
+        # the next append is prebuilt in the background, ahead of the play that triggers it
+        nxt = NextBatch(lambda: self._build_batch(APPEND_BATCH), label="fina recom")
+        with get_watcher(self.sp).subscribe(types=("track_changed", "skipped")) as changes:
+            while True:
+                ev = changes.get()
+                tid = ev.item.get("id")
+                if not tid or tid == self.last_track_id:
+                    continue
+                try:
                     # track advanced
                     self.tracks_played_since_append += 1
                     self.last_track_id = tid
                     self.queued_or_played.add(tid)
+                    self._remember(ev.item)
                     self.last_artist_id = self._get_artist_of_track(tid)
                     print(f"(Played: {self.tracks_played_since_append}/{APPEND_EVERY_N})")
                     if self.tracks_played_since_append >= APPEND_EVERY_N:
-                        more = self._build_batch(APPEND_BATCH)
+                        more = nxt.take()
+                        append_tracks(self.sp, self.device_id, [f"spotify:track:{t}" for t, _ in more],
+                                      label="fina recom top-up")
                         for tid2, r2 in more:
-                            self._add_to_queue(tid2)
                             self.queued_or_played.add(tid2)
                             self._print_entry(tid2, r2, queued=True)
                         self.tracks_played_since_append = 0
-                time.sleep(3)
-            except Exception:
-                time.sleep(5)
+                        publish("fina", "top_up", added=len(more), mode=self.mode)
+                    nxt.plan_from(ev.playback, APPEND_EVERY_N - self.tracks_played_since_append)
+                except Exception:
+                    time.sleep(5)
 
     def _print_entry(self, tid: str, reason: Reason, queued: bool=False):
-        tr = self.sp.track(tid)
+        tr = self._track(tid) or {"name": tid}
         name = tr["name"]
         artist = ", ".join([a["name"] for a in tr.get("artists", [])])
-        album = tr.get("album", {}).get("name", "")
+        album = (tr.get("album") or {}).get("name", "")
         prefix = "Queued" if queued else "Playing"
         print(f"  - {prefix}: {name} - {artist} | {album}")
         print(f"    Reason: [{reason.strategy}] {reason.details}")
@@ -195,7 +195,8 @@ class UnifiedGestureController {
         if (!video.srcObject) return;
         
         try {
-            // Capture frame from video
+            // Capture frame from video (timestamps feed backend latency metrics)
+            const capturedAt = Date.now();
             const canvas = document.createElement('canvas');
             canvas.width = video.videoWidth;
             canvas.height = video.videoHeight;
@@ -204,6 +205,7 @@ class UnifiedGestureController {
             
             // Convert to base64
             const imageData = canvas.toDataURL('image/jpeg', 0.8);
+            const encodeMs = Date.now() - capturedAt;
             
             // Send to backend for gesture recognition
             const response = await fetch(`${this.options.backendUrl}/api/gesture/predict`, {
@@ -211,7 +213,12 @@ class UnifiedGestureController {
                 headers: {
                     'Content-Type': 'application/json'
                 },
-                body: JSON.stringify({ image: imageData })
+                body: JSON.stringify({
+                    image: imageData,
+                    captured_at: capturedAt,
+                    client_encode_ms: encodeMs,
+                    sent_at: Date.now()
+                })
             });
             
             if (response.ok) {
@@ -219,7 +226,7 @@ class UnifiedGestureController {
                 
                 if (result.gesture && result.gesture !== 'none' && result.confidence >= this.options.gestureThreshold) {
                     console.log('📹 Camera gesture detected:', result.gesture, result.confidence);
-                    this.handleGesture(result.gesture);
+                    this.handleGesture(result.gesture, capturedAt);
                 }
             }
         } catch (error) {
@@ -227,7 +234,7 @@ class UnifiedGestureController {
         }
     }
     
-    async handleGesture(gesture) {
+    async handleGesture(gesture, gestureTs = null) {
         console.log('🎭 Gesture handler called with:', gesture);
         
         // Check cooldown
@@ -252,14 +259,17 @@ class UnifiedGestureController {
             return;
         }
         
-        await this.executeSpotifyAction(action, gesture);
+        await this.executeSpotifyAction(action, gesture, gestureTs);
     }
     
-    async executeSpotifyAction(action, gesture) {
+    async executeSpotifyAction(action, gesture, gestureTs = null) {
         console.log('🎵 Executing Spotify action:', action);
         try {
             let endpoint = '/api/spotify/control';
             let body = { ...action };
+            if (gestureTs) {
+                body.gesture_ts = gestureTs;
+            }
             
             // Handle special actions
             if (action.action === 'play_pause') {
@@ -293,6 +303,9 @@ class UnifiedGestureController {
             
             if (result.ok) {
                 console.log('✅ Spotify action executed:', body.action);
+                if (result.e2e_ms != null) {
+                    console.log(`⏱️ Gesture → Spotify ack: ${result.e2e_ms} ms`);
+                }
                 this.showGestureFeedback(gesture, true);
                 
                 // Update track info after action
@@ -365,19 +378,33 @@ class UnifiedGestureController {
         try {
             const response = await fetch(`${this.options.backendUrl}/api/spotify/current`);
             const data = await response.json();
-            
-            if (data.ok && data.playing) {
-                this.currentTrack = data;
-                this.updateTrackUI(data);
-            } else {
-                this.currentTrack = null;
-                this.updateTrackUI(null);
-            }
+            this.applyNowPlaying(data);
         } catch (error) {
             console.error('Failed to update current track:', error);
         }
     }
     
+    applyNowPlaying(data) {
+        if (data.ok && data.playing) {
+            this.currentTrack = data;
+            this.updateTrackUI(data);
+        } else {
+            this.currentTrack = null;
+            this.updateTrackUI(null);
+        }
+    }
+    
+    applyProgress(tick) {
+        // Local progress tick from the event stream; no request needed
+        if (!this.currentTrack) return;
+        this.currentTrack.playback.progress_ms = tick.progress_ms;
+        this.currentTrack.playback.is_playing = tick.is_playing;
+        const progressBar = document.getElementById('progress-bar');
+        if (progressBar && tick.duration_ms) {
+            progressBar.style.width = `${(tick.progress_ms / tick.duration_ms) * 100}%`;
+        }
+    }
+    
     updateTrackUI(trackData) {
         // Update track info display
         const trackTitle = document.getElementById('current-track-title');
@@ -415,8 +442,32 @@ class UnifiedGestureController {
     }
     
     startTrackUpdates() {
+        // Prefer the server-sent event stream: the backend pushes track changes
+        // and progress ticks, and all tabs share one upstream poll
+        if (window.EventSource) {
+            this.eventSource = new EventSource(`${this.options.backendUrl}/api/spotify/events`);
+            this.eventSource.addEventListener('now_playing', (e) => this.applyNowPlaying(JSON.parse(e.data)));
+            this.eventSource.addEventListener('progress', (e) => this.applyProgress(JSON.parse(e.data)));
+            this.eventSource.addEventListener('session', (e) => {
+                window.dispatchEvent(new CustomEvent('spotify-session', { detail: JSON.parse(e.data) }));
+            });
+            this.eventSource.onerror = () => {
+                // EventSource reconnects on its own; a CLOSED stream (e.g. 401) will not
+                if (this.eventSource.readyState === EventSource.CLOSED) {
+                    console.warn('Track event stream closed, falling back to polling');
+                    this.eventSource = null;
+                    this.startTrackPolling();
+                }
+            };
+            return;
+        }
+        this.startTrackPolling();
+    }
+    
+    startTrackPolling() {
+        if (this.trackUpdateInterval) return;
         // Update track info every 2 seconds
-        setInterval(() => {
+        this.trackUpdateInterval = setInterval(() => {
             this.updateCurrentTrack();
         }, 2000);
         
@@ -456,6 +507,12 @@ class UnifiedGestureController {
         if (this.gestureRecognitionInterval) {
             clearInterval(this.gestureRecognitionInterval);
         }
+        if (this.eventSource) {
+            this.eventSource.close();
+        }
+        if (this.trackUpdateInterval) {
+            clearInterval(this.trackUpdateInterval);
+        }
     }
 }
 